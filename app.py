@@ -1,21 +1,57 @@
+import os
+
 from flask import Flask, request, jsonify
 from werkzeug.exceptions import BadRequest
 from flask_restful import Api, NotFound
-from dto import ValidationResult
-from models import Project
-from services import OptimizationService
+from dto import OptimizationOptions, ValidationResult
+from models import Optimization, Project, valid_identifier
+from services import OptimizationService, QueueFullError
+from scheduler import OptimizationScheduler, SchedulingPolicy
 from flask_cors import cross_origin
+from topopt import kernels
 
 app = Flask(__name__)
 api = Api(app)
 
-service = OptimizationService()
+kernels.set_backend(os.environ.get('GAUDI_KERNELS', 'numpy'))
+
+max_running_jobs = int(os.environ.get('GAUDI_MAX_RUNNING_JOBS', 4))
+
+# Every running job may keep solver_processes worker processes for domain
+# decomposition or the designs of a robust optimization, so by default the
+# running jobs split the cores between them
+Optimization.solver_processes = int(os.environ.get(
+    'GAUDI_SOLVER_PROCESSES', max(1, (os.cpu_count() or 1) // max_running_jobs)))
+Optimization.linear_solver = os.environ.get(
+    'GAUDI_LINEAR_SOLVER', Optimization.linear_solver)
+Optimization.mixed_precision = os.environ.get(
+    'GAUDI_MIXED_PRECISION', '0').lower() in ('1', 'true', 'yes')
+
+scheduler_workers = int(os.environ.get('GAUDI_SCHEDULER_WORKERS', 0))
+
+if scheduler_workers > 0:
+    scheduler = OptimizationScheduler(scheduler_workers, SchedulingPolicy(
+        os.environ.get('GAUDI_SCHEDULER_POLICY', SchedulingPolicy.ROUND_ROBIN.value)))
+else:
+    scheduler = None
+
+service = OptimizationService(scheduler=scheduler,
+                              max_running_jobs=max_running_jobs,
+                              max_queued_jobs=int(os.environ.get(
+                                  'GAUDI_MAX_QUEUED_JOBS', 32)),
+                              max_running_cost=float(os.environ.get(
+                                  'GAUDI_MAX_RUNNING_COST', 4e9)),
+                              job_memory_limit=float(os.environ.get('GAUDI_JOB_MEMORY_LIMIT', 2e9)))
 
 
 @app.route('/result', methods=['GET'])
 @cross_origin()
 def get_result():
     optimization_id = request.args.get('id', type=str)
+
+    if not valid_identifier(optimization_id):
+        return invalid_identifier()
+
     result = service.get_result(optimization_id)
 
     if result is None:
@@ -30,6 +66,7 @@ def get_result():
 @cross_origin()
 def optimize():
     project = Project.from_json(request.json['project'])
+    options = optimization_options()
 
     validations = []
     project.validate(validations)
@@ -37,21 +74,96 @@ def optimize():
     if len(validations) > 0:
         return invalid_project(validations)
 
-    identifier = service.start_optimization(project)
+    options.validate(project, validations)
+
+    if len(validations) > 0:
+        return invalid_project(validations)
+
+    estimate = service.estimate(project, options)
+
+    if request.args.get('dryRun', default=False, type=parse_bool):
+        return jsonify(estimate.serialize())
+
+    service.validate_estimate(estimate, validations)
+
+    if len(validations) > 0:
+        return invalid_project(validations)
+
+    priority = request.args.get('priority', default=0, type=int)
+
+    identifier = service.start_optimization(project, priority, options)
 
     return jsonify(ValidationResult(identifier).serialize())
 
 
+def parse_bool(value: str) -> bool:
+    return value.lower() == 'true'
+
+
+def optimization_options() -> OptimizationOptions:
+    # Stresses come with every stressInterval-th result and the final one,
+    # with the final result only when it is 0
+    return OptimizationOptions(levels=request.args.get('levels', default=0, type=int),
+                               adaptive=request.args.get('adaptive', default=False, type=parse_bool),
+                               void_iterations=request.args.get('voidIterations', default=0, type=int),
+                               stress_interval=request.args.get('stressInterval', default=None, type=int),
+                               robust=request.args.get('robust', default=False, type=parse_bool),
+                               projection=request.args.get('projection', default=False, type=parse_bool),
+                               continuation=request.args.get('continuation', default=False, type=parse_bool))
+
+
+@app.route('/optimization/pause', methods=['POST'])
+@cross_origin()
+def pause_optimization():
+    optimization_id = request.args.get('id', type=str)
+
+    if not valid_identifier(optimization_id):
+        return invalid_identifier()
+
+    if not service.pause_optimization(optimization_id):
+        raise NotFound
+
+    return optimization_id
+
+
+@app.route('/optimization/resume', methods=['POST'])
+@cross_origin()
+def resume_optimization():
+    optimization_id = request.args.get('id', type=str)
+
+    if not valid_identifier(optimization_id):
+        return invalid_identifier()
+
+    priority = request.args.get('priority', default=0, type=int)
+
+    if not service.resume_optimization(optimization_id, priority):
+        raise NotFound
+
+    return optimization_id
+
+
 @app.route('/optimization', methods=['DELETE'])
 @cross_origin()
 def delete_optimization():
     optimization_id = request.args.get('id', type=str)
 
+    if not valid_identifier(optimization_id):
+        return invalid_identifier()
+
     service.end_optimization(optimization_id)
 
     return optimization_id
 
 
+def invalid_identifier():
+    return invalid_project(['Identificador de otimização ausente ou inválido'])
+
+
+@app.errorhandler(QueueFullError)
+def queue_full(error: QueueFullError):
+    return jsonify({'retryAfter': error.retry_after}), 429, {'Retry-After': str(error.retry_after)}
+
+
 @app.errorhandler(BadRequest)
 def invalid_project(validations):
     return jsonify(ValidationResult(validation_results=validations).serialize()), 400
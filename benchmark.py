@@ -0,0 +1,1109 @@
+"""
+Benchmark suite for the optimization pipeline.
+
+Runs the example projects and MBB beams of increasing size, each case in a
+fresh process so peak memory is measured per case.
+
+    python benchmark.py resources [--solver cholmod] [--calibrate]
+    python benchmark.py sensitivities [--case mbb-600x300]
+    python benchmark.py kernels [--case mbb-600x300]
+    python benchmark.py multiresolution [--case mbb-600x300] [--levels 2]
+    python benchmark.py adaptive [--case mbb-600x300] [--levels 0]
+    python benchmark.py elimination [--case mbb-600x300] [--void-iterations 5]
+    python benchmark.py symmetry [--case full-mbb-480x160]
+    python benchmark.py decomposition [--case mbb-600x300] [--subdomains 4]
+    python benchmark.py inexact [--case mbb-300x150] [--tolerance 1e-8]
+    python benchmark.py reanalysis [--case mbb-300x150] [--void-iterations 0]
+    python benchmark.py precision [--case mbb-600x300] [--maxeval 20]
+    python benchmark.py harmonic [--case mbb-300x150] [--band 0.8] [--samples 16]
+    python benchmark.py eigenfrequency [--case mbb-300x150] [--maxeval 30]
+    python benchmark.py robust [--case mbb-300x150] [--processes 3]
+    python benchmark.py projection [--case mbb-120x40] [--gray 0.05]
+    python benchmark.py continuation [--cases beam l-shape mbb-beam] [--step 1]
+    python benchmark.py stochastic [--case mbb-300x150] [--samples 8 32 128]
+    python benchmark.py newton [--cases beam l-shape mbb-beam mbb-240x80]
+"""
+import argparse
+import json
+import multiprocessing
+import os
+import resource
+import time
+import tracemalloc
+
+import numpy
+import scipy.sparse.linalg
+import cvxopt
+import cvxopt.cholmod
+
+from dto import *
+from models import GaudiNewtonSolver, GaudiSolver, Optimization, CustomBoundaryConditions
+from resources import ResourceEstimator
+from topopt import kernels
+from topopt.filters import gray_level
+from topopt.linear_solvers import CholmodSolver, DomainDecompositionSolver, IterativeSolver, LinearSolver, \
+    ParallelCholmodSolver, ProcessPoolSolver
+from topopt.problems import ComplianceProblem, EigenfrequencyProblem
+from topopt.utils import xy_to_id
+
+examples = ['beam', 'l-shape', 'mbb-beam']
+mbb_sizes = [(60, 20), (120, 40), (240, 80), (300, 150), (600, 300)]
+
+
+def mbb_beam(nelx: int, nely: int, filter_radius: float = 5.4) -> Project:
+    # Same layout as project-example-mbb-beam.json at any resolution
+    supports = [Support(Position(0, 0), SupportType.MOBILE, 0, Dimensions(1, nely)),
+                Support(Position(nelx, nely), SupportType.MOBILE, 1)]
+    forces = [Force(-1, 1, Position(0, 0))]
+    domain = Domain(MaterialProperties(0.3, 1), Dimensions(nelx, nely), 0.4)
+
+    return Project(domain, BoundaryConditions(supports, forces, []), 3.0, filter_radius)
+
+
+def full_mbb_beam(nelx: int, nely: int, filter_radius: float = 5.4) -> Project:
+    # Both halves of the MBB beam, symmetric about the vertical middle line
+    supports = [Support(Position(0, nely), SupportType.FIXED, 0),
+                Support(Position(nelx, nely), SupportType.FIXED, 0)]
+    forces = [Force(-1, 1, Position(nelx // 2, 0))]
+    domain = Domain(MaterialProperties(0.3, 1), Dimensions(nelx, nely), 0.4)
+
+    return Project(domain, BoundaryConditions(supports, forces, []), 3.0, filter_radius)
+
+
+def pinched_plate(size: int, filter_radius: float = 5.4) -> Project:
+    # Plate clamped on both sides and pinched in the middle by two load cases.
+    # Each case maps onto the other across the horizontal middle line, so
+    # only the vertical one is a symmetry
+    supports = [Support(Position(0, 0), SupportType.FIXED, 0, Dimensions(1, size)),
+                Support(Position(size, 0), SupportType.FIXED, 0, Dimensions(1, size))]
+    forces = [Force(1, 1, Position(size // 2, 0)), Force(-1, 1, Position(size // 2, size))]
+    domain = Domain(MaterialProperties(0.3, 1), Dimensions(size, size), 0.3)
+
+    return Project(domain, BoundaryConditions(supports, forces, []), 3.0, filter_radius)
+
+
+def symmetric_suite() -> list:
+    return [('full-mbb-240x80', full_mbb_beam(240, 80)),
+            ('full-mbb-480x160', full_mbb_beam(480, 160)),
+            ('pinched-plate-200', pinched_plate(200))]
+
+
+def suite() -> list:
+    cases = []
+
+    for example in examples:
+        with open(f'project-example-{example}.json') as file:
+            cases.append((example, Project.from_json(json.load(file))))
+
+    for nelx, nely in mbb_sizes:
+        cases.append((f'mbb-{nelx}x{nely}', mbb_beam(nelx, nely)))
+
+    return cases
+
+
+def measure_resources(project_json: dict, solver: str, iterations: int, queue) -> None:
+    project = Project.from_json(project_json)
+    initial_rss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+
+    if solver == 'decomposition':
+        # Each case runs in its own process, the strips are forced for this
+        # one only whatever the size and the number of cores
+        Optimization.solver_processes = 4
+        Optimization.domain_decomposition_dofs = 0
+
+    start = time.perf_counter()
+    optimization = Optimization(project, options=OptimizationOptions(
+        linear_solver=solver if solver in ('iterative', 'reanalysis') else None))
+    setup_time = time.perf_counter() - start
+
+    if Optimization.estimator_solver(optimization.problem.linear_solver) != solver:
+        raise ValueError(f'The project is not solved by {solver}')
+
+    solver = optimization.solver
+    linear_solver = optimization.problem.linear_solver
+    x = Optimization.initial_design(project) * project.domain.volume_fraction
+    dobj = numpy.empty(x.shape)
+
+    # Worker processes start once per optimization, not every iteration
+    if isinstance(linear_solver, ProcessPoolSolver):
+        linear_solver.start()
+
+    # Nearby designs, so the iterative solvers warm start as they do from
+    # one iteration to the next instead of from the solution itself
+    designs = numpy.random.default_rng(0).uniform(0.9, 1.1, (iterations, x.size)) * x
+
+    start = time.perf_counter()
+    for design in designs:
+        solver.objective_function(design, dobj)
+    iteration_time = (time.perf_counter() - start) / iterations
+
+    # Before the factor counted below adds to the peak
+    memory = (resource.getrusage(resource.RUSAGE_SELF).ru_maxrss - initial_rss) * 1024
+
+    K = optimization.problem.build_K(solver.xPhys)
+    nonzeros = solver_nonzeros(linear_solver, K, optimization.problem.free)
+    linear_solver.close()
+
+    queue.put({'setup_time': setup_time,
+               'iteration_time': iteration_time,
+               'stiffness_nonzeros': K.nnz,
+               'factor_nonzeros': nonzeros,
+               'filter_nonzeros': optimization.topopt_filter.H.nnz,
+               'memory': memory})
+
+
+def factor_nonzeros(K: scipy.sparse.spmatrix) -> int:
+    K = K.tocoo()
+    K_cvxopt = cvxopt.spmatrix(K.data, K.row.astype(int), K.col.astype(int))
+    factor = cvxopt.cholmod.symbolic(K_cvxopt)
+    cvxopt.cholmod.numeric(K_cvxopt, factor)
+
+    return len(cvxopt.cholmod.getfactor(factor))
+
+
+def solver_nonzeros(linear_solver: LinearSolver, K: scipy.sparse.coo_matrix, dofs: numpy.ndarray) -> int:
+    # Entries the linear solver keeps while it solves, what the estimator
+    # calls the factor of each solver
+    if isinstance(linear_solver, DomainDecompositionSolver):
+        # The factors of the strip interiors and the dense interface system
+        K = K.tocsr()
+        strips = sum(factor_nonzeros(K[interior][:, interior])
+                     for interior in linear_solver.interiors if interior.size > 0)
+
+        return strips + linear_solver.interface.size ** 2
+
+    if type(linear_solver) is IterativeSolver:
+        if linear_solver.preconditioner != 'amg':
+            return K.shape[0]
+
+        # The operators and transfers of every level of the multigrid
+        import pyamg
+
+        hierarchy = pyamg.smoothed_aggregation_solver(K.tocsr(), B=linear_solver.rigid_body_modes(dofs))
+
+        return sum(level.A.nnz + (level.P.nnz + level.R.nnz if hasattr(level, 'P') else 0)
+                   for level in hierarchy.levels)
+
+    # A Cholesky factor of the whole system, also kept by the reanalysis
+    return factor_nonzeros(K)
+
+
+def isolated(target, args: tuple, queue) -> None:
+    try:
+        target(*args, queue)
+    except BaseException as error:
+        queue.put(error)
+        raise
+
+
+def run_isolated(target, *args) -> dict:
+    context = multiprocessing.get_context('spawn')
+    queue = context.Queue()
+    process = context.Process(target=isolated, args=(target, args, queue))
+    process.start()
+    measurement = queue.get()
+    process.join()
+
+    if isinstance(measurement, BaseException):
+        raise measurement
+
+    return measurement
+
+
+def fit_power_law(x: list, y: list) -> tuple:
+    exponent, logarithm = numpy.polyfit(numpy.log(x), numpy.log(y), 1)
+
+    return float(numpy.exp(logarithm)), float(exponent)
+
+
+def benchmark_resources(solver: str, iterations: int, calibrate: bool) -> None:
+    estimator = ResourceEstimator(solver)
+    rows = []
+
+    print(f'{"case":>14} {"dofs":>8} {"K nnz":>16} {"L nnz":>20} {"H nnz":>20} '
+          f'{"s/iter":>16} {"MB":>14} {"setup s":>8}')
+
+    for name, project in suite():
+        estimate = estimator.estimate(project)
+        measured = run_isolated(
+            measure_resources, project.to_json(), solver, iterations)
+        rows.append((estimate, measured))
+
+        print(f'{name:>14} {estimate.dofs:>8} '
+              f'{measured["stiffness_nonzeros"]:>7}/{estimate.stiffness_nonzeros:<8} '
+              f'{measured["factor_nonzeros"]:>9}/{estimate.factor_nonzeros:<10} '
+              f'{measured["filter_nonzeros"]:>9}/{estimate.filter_nonzeros:<10} '
+              f'{measured["iteration_time"]:>7.3f}/{estimate.iteration_time:<8.3f} '
+              f'{measured["memory"] / 1e6:>6.0f}/{estimate.memory / 1e6:<7.0f} '
+              f'{measured["setup_time"]:>8.2f}')
+
+    print('(measured/estimated)')
+
+    if calibrate:
+        dofs = [estimate.dofs for estimate, _ in rows]
+        factor = fit_power_law(
+            dofs, [measured['factor_nonzeros'] for _, measured in rows])
+        timing = fit_power_law(
+            dofs, [measured['iteration_time'] for _, measured in rows])
+
+        print(f"'factor_coefficient': {factor[0]:.3g},")
+        print(f"'factor_exponent': {factor[1]:.4g},")
+        print(f"'time_coefficient': {timing[0]:.3g},")
+        print(f"'time_exponent': {timing[1]:.4g},")
+
+
+def measure_sensitivities(project_json: dict, iterations: int, queue) -> None:
+    project = Project.from_json(project_json)
+    optimization = Optimization(project)
+    problem = optimization.problem
+    x = Optimization.initial_design(project) * project.domain.volume_fraction
+    dobj = numpy.empty(x.shape)
+
+    start = time.perf_counter()
+    for _ in range(iterations):
+        problem.compute_objective(x, dobj)
+    objective_time = (time.perf_counter() - start) / iterations
+
+    # Time the sensitivities alone on the displacements of the last solve
+    problem.update_displacements = lambda xPhys: None
+
+    start = time.perf_counter()
+    for _ in range(iterations):
+        problem.compute_objective(x, dobj)
+    kernel_time = (time.perf_counter() - start) / iterations
+
+    # Memory the sensitivities allocate on top of what the problem holds
+    tracemalloc.start()
+    held, _ = tracemalloc.get_traced_memory()
+    problem.compute_objective(x, dobj)
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+
+    queue.put({'objective_time': objective_time,
+               'kernel_time': kernel_time,
+               'kernel_temporaries': peak - held})
+
+
+def benchmark_sensitivities(case: str, iterations: int) -> None:
+    project = dict(suite())[case]
+    measured = run_isolated(measure_sensitivities, project.to_json(), iterations)
+
+    print(f'{case}: objective {measured["objective_time"]:.3f} s/iter, '
+          f'sensitivities {measured["kernel_time"] * 1e3:.1f} ms/iter, '
+          f'{measured["kernel_temporaries"] / 1e6:.1f} MB of temporaries')
+
+
+def measure_kernels(project_json: dict, iterations: int, queue) -> None:
+    project = Project.from_json(project_json)
+    optimization = Optimization(project)
+    problem = optimization.problem
+    topopt_filter = optimization.topopt_filter
+    x = Optimization.initial_design(project) * project.domain.volume_fraction
+    problem.update_displacements(x)
+
+    def stiffness():
+        return problem.build_K(x, remove_constrained=False).data
+
+    def energies():
+        return problem.compute_element_energies(problem.KE, numpy.empty(x.size))
+
+    def density_filter():
+        xPhys = numpy.empty(x.size)
+        topopt_filter.filter_variables(x, xPhys)
+        return xPhys
+
+    def sensitivity_filter():
+        dobj = numpy.linspace(-1, 0, x.size)
+        topopt_filter.filter_objective_sensitivities(x, dobj)
+        return dobj
+
+    measurements = {}
+
+    for backend in kernels.available_backends():
+        kernels.set_backend(backend)
+
+        for name, kernel in [('stiffness', stiffness), ('energies', energies),
+                             ('filter', density_filter), ('sensitivity filter', sensitivity_filter)]:
+            kernel()  # compiles the jit kernels on first use
+
+            start = time.perf_counter()
+            for _ in range(iterations):
+                kernel()
+            elapsed = (time.perf_counter() - start) / iterations
+
+            measurements.setdefault(name, {})[backend] = elapsed
+
+    queue.put(measurements)
+
+
+def benchmark_kernels(case: str, iterations: int) -> None:
+    project = dict(suite())[case]
+    measured = run_isolated(measure_kernels, project.to_json(), iterations)
+
+    # The kernels are checked against NumPy by tests/test_kernels.py
+    print(f'{case}')
+    print(f'{"kernel":>20} {"backend":>8} {"ms":>9}')
+
+    for name, backends in measured.items():
+        for backend, elapsed in backends.items():
+            print(f'{name:>20} {backend:>8} {elapsed * 1e3:>9.2f}')
+
+
+def measure_optimization(project_json: dict, options: dict, maxeval: int, queue) -> None:
+    project = Project.from_json(project_json)
+
+    start = time.perf_counter()
+    optimization = Optimization(project, options=OptimizationOptions(**options))
+    optimization.solver.maxeval = maxeval
+    optimization.optimize()
+    elapsed = time.perf_counter() - start
+
+    queue.put({'time': elapsed,
+               'iterations': optimization.solver.iteration,
+               'objective': uniform_compliance(project, optimization),
+               'dofs': optimization.problem.rhs.size[0],
+               'levels': optimization.level_times})
+
+
+def uniform_compliance(project: Project, optimization: Optimization) -> float:
+    # Compare designs by their compliance on the uniform grid, solved exactly
+    dimensions = project.domain.dimensions
+    problem = ComplianceProblem(CustomBoundaryConditions(dimensions.width, dimensions.height,
+                                                         project.boundary_conditions, project.random_loads),
+                                project.penalization,
+                                project.domain.material_properties.young, project.domain.material_properties.poisson)
+
+    return problem.compute_objective(optimization.symmetry.expand(optimization.solver.xPhys),
+                                     numpy.empty(optimization.size))
+
+
+def benchmark_multiresolution(case: str, levels: int, maxeval: int) -> None:
+    project = dict(suite())[case]
+
+    direct = run_isolated(measure_optimization, project.to_json(), {}, maxeval)
+    multiresolution = run_isolated(
+        measure_optimization, project.to_json(), {'levels': levels}, maxeval)
+
+    print(f'{case}')
+    print(f'{"run":>16} {"iterations":>10} {"s":>9} {"objective":>12}')
+
+    for width, height, iterations, elapsed in multiresolution['levels']:
+        print(f'{f"level {width}x{height}":>16} {iterations:>10} {elapsed:>9.1f}')
+
+    for name, run in [('multiresolution', multiresolution), ('direct', direct)]:
+        print(f'{name:>16} {run["iterations"]:>10} {run["time"]:>9.1f} {run["objective"]:>12.4f}')
+
+    saved = direct['time'] - multiresolution['time']
+    print(f'time saved: {saved:.1f} s ({saved / direct["time"]:.0%})')
+
+
+def benchmark_adaptive(case: str, levels: int, maxeval: int) -> None:
+    project = dict(suite())[case]
+
+    uniform = run_isolated(measure_optimization, project.to_json(), {'levels': levels}, maxeval)
+    adaptive = run_isolated(measure_optimization, project.to_json(),
+                            {'levels': levels, 'adaptive': True}, maxeval)
+
+    print(f'{case}')
+    print(f'{"mesh":>9} {"final dofs":>10} {"iterations":>10} {"s":>9} {"objective":>12}')
+
+    for name, run in [('uniform', uniform), ('adaptive', adaptive)]:
+        print(f'{name:>9} {run["dofs"]:>10} {run["iterations"]:>10} {run["time"]:>9.1f} {run["objective"]:>12.4f}')
+
+    print(f'dofs: {adaptive["dofs"] / uniform["dofs"]:.0%} of uniform, '
+          f'time saved: {uniform["time"] - adaptive["time"]:.1f} s, '
+          f'objective: {adaptive["objective"] / uniform["objective"] - 1:+.2%}')
+
+
+def benchmark_elimination(case: str, void_iterations: int, maxeval: int) -> None:
+    project = dict(suite())[case]
+
+    full = run_isolated(measure_optimization, project.to_json(), {}, maxeval)
+    eliminated = run_isolated(measure_optimization, project.to_json(),
+                              {'void_iterations': void_iterations}, maxeval)
+
+    print(f'{case}')
+    print(f'{"system":>10} {"final dofs":>10} {"iterations":>10} {"s":>9} {"objective":>12}')
+
+    for name, run in [('full', full), ('eliminated', eliminated)]:
+        print(f'{name:>10} {run["dofs"]:>10} {run["iterations"]:>10} {run["time"]:>9.1f} {run["objective"]:>12.4f}')
+
+    print(f'dofs: {eliminated["dofs"] / full["dofs"]:.0%} of full, '
+          f'time saved: {full["time"] - eliminated["time"]:.1f} s, '
+          f'objective: {eliminated["objective"] / full["objective"] - 1:+.2%}')
+
+
+def benchmark_symmetry(case: str, maxeval: int) -> None:
+    project = dict(symmetric_suite())[case]
+
+    full = run_isolated(measure_optimization, project.to_json(), {'symmetry': False}, maxeval)
+    reduced = run_isolated(measure_optimization, project.to_json(), {}, maxeval)
+
+    print(f'{case}')
+    print(f'{"domain":>8} {"dofs":>8} {"iterations":>10} {"s":>9} {"objective":>12}')
+
+    for name, run in [('full', full), ('reduced', reduced)]:
+        print(f'{name:>8} {run["dofs"]:>8} {run["iterations"]:>10} {run["time"]:>9.1f} {run["objective"]:>12.4f}')
+
+    print(f'dofs: {reduced["dofs"] / full["dofs"]:.0%} of full, '
+          f'speedup: {full["time"] / reduced["time"]:.1f}x, '
+          f'objective: {reduced["objective"] / full["objective"] - 1:+.2%}')
+
+
+def measure_decomposition(project_json: dict, subdomains: int, iterations: int, queue) -> None:
+    project = Project.from_json(project_json)
+    problem = Optimization(project).problem
+    x = Optimization.initial_design(project) * project.domain.volume_fraction
+    dimensions = project.domain.dimensions
+
+    measurements = {}
+
+    for solver in [CholmodSolver(), DomainDecompositionSolver(dimensions.width, dimensions.height, subdomains)]:
+        problem.linear_solver = solver
+        u = problem.compute_displacements(x)  # starts the workers
+
+        start = time.perf_counter()
+        for _ in range(iterations):
+            problem.compute_displacements(x, u)
+        elapsed = (time.perf_counter() - start) / iterations
+
+        solver.close()
+        measurements[str(solver)] = elapsed
+
+    queue.put({'dofs': problem.free.size, 'solvers': measurements})
+
+
+def benchmark_decomposition(case: str, subdomains: int, iterations: int) -> None:
+    project = dict(suite())[case]
+    measured = run_isolated(measure_decomposition, project.to_json(), subdomains, iterations)
+
+    print(f'{case}: {measured["dofs"]} dofs, {os.cpu_count()} cores')
+    print(f'{"solver":>40} {"s/solve":>9}')
+
+    for name, elapsed in measured['solvers'].items():
+        print(f'{name:>40} {elapsed:>9.2f}')
+
+
+def measure_inexact(project_json: dict, fixed_tolerance: float, maxeval: int, queue) -> None:
+    project = Project.from_json(project_json)
+
+    start = time.perf_counter()
+    optimization = Optimization(project, options=OptimizationOptions(linear_solver='iterative'))
+    solver = optimization.problem.linear_solver
+
+    if fixed_tolerance is not None:
+        solver.tolerance = solver.min_tolerance = solver.max_tolerance = fixed_tolerance
+
+    optimization.solver.maxeval = maxeval
+    optimization.optimize()
+    elapsed = time.perf_counter() - start
+
+    queue.put({'time': elapsed,
+               'iterations': optimization.solver.iteration,
+               'objective': uniform_compliance(project, optimization),
+               'krylov_iterations': solver.iterations,
+               'refinements': solver.refinements,
+               'preconditioner': solver.preconditioner})
+
+
+def benchmark_inexact(case: str, tolerance: float, maxeval: int) -> None:
+    project = dict(suite())[case]
+
+    direct = run_isolated(measure_optimization, project.to_json(), {}, maxeval)
+    fixed = run_isolated(measure_inexact, project.to_json(), tolerance, maxeval)
+    adaptive = run_isolated(measure_inexact, project.to_json(), None, maxeval)
+
+    print(f'{case}, {adaptive["preconditioner"]} preconditioner')
+    print(f'{"solve":>10} {"iterations":>10} {"krylov":>8} {"s":>9} {"objective":>12}')
+    print(f'{"direct":>10} {direct["iterations"]:>10} {0:>8} {direct["time"]:>9.1f} {direct["objective"]:>12.4f}')
+
+    for name, run in [(f'{tolerance:g}', fixed), ('adaptive', adaptive)]:
+        print(f'{name:>10} {run["iterations"]:>10} {run["krylov_iterations"]:>8} {run["time"]:>9.1f} '
+              f'{run["objective"]:>12.4f}')
+
+    print(f'krylov iterations: {adaptive["krylov_iterations"] / fixed["krylov_iterations"]:.0%} of the fixed '
+          f'tolerance, {adaptive["refinements"]} refined solves, '
+          f'objective: {adaptive["objective"] / fixed["objective"] - 1:+.2%}')
+
+
+def measure_reanalysis(project_json: dict, linear_solver: str, void_iterations: int, maxeval: int, queue) -> None:
+    project = Project.from_json(project_json)
+
+    start = time.perf_counter()
+    optimization = Optimization(project, options=OptimizationOptions(void_iterations=void_iterations,
+                                                                     linear_solver=linear_solver))
+    solver = optimization.problem.linear_solver
+
+    optimization.solver.maxeval = maxeval
+    optimization.optimize()
+    elapsed = time.perf_counter() - start
+
+    queue.put({'time': elapsed,
+               'iterations': optimization.solver.iteration,
+               'objective': uniform_compliance(project, optimization),
+               'factorizations': getattr(solver, 'factorizations', optimization.solver.iteration),
+               'krylov_iterations': solver.iterations})
+
+
+def benchmark_reanalysis(case: str, void_iterations: int, maxeval: int) -> None:
+    project = dict(suite())[case]
+
+    runs = [(name, run_isolated(measure_reanalysis, project.to_json(), name, void_iterations, maxeval))
+            for name in ['direct', 'reanalysis']]
+
+    print(case)
+    print(f'{"solve":>10} {"iterations":>10} {"factors":>8} {"krylov":>8} {"s":>9} {"objective":>12}')
+
+    for name, run in runs:
+        print(f'{name:>10} {run["iterations"]:>10} {run["factorizations"]:>8} {run["krylov_iterations"]:>8} '
+              f'{run["time"]:>9.1f} {run["objective"]:>12.4f}')
+
+    direct, reanalysis = runs[0][1], runs[1][1]
+    print(f'factorizations: {reanalysis["factorizations"] / direct["factorizations"]:.0%} of the direct solves, '
+          f'time: {reanalysis["time"] / direct["time"]:.0%}, '
+          f'objective: {reanalysis["objective"] / direct["objective"] - 1:+.2%}')
+
+
+def measure_precision(project_json: dict, mixed_precision: bool, maxeval: int, queue) -> None:
+    project = Project.from_json(project_json)
+    initial_rss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+
+    start = time.perf_counter()
+    optimization = Optimization(project, options=OptimizationOptions(mixed_precision=mixed_precision))
+    optimization.solver.maxeval = maxeval
+    optimization.optimize()
+    elapsed = time.perf_counter() - start
+
+    queue.put({'time': elapsed,
+               'iterations': optimization.solver.iteration,
+               'objective': optimization.solver.last_result.obj * optimization.symmetry.factor,
+               'exact_objective': uniform_compliance(project, optimization),
+               'refinements': optimization.problem.refinements,
+               'mixed_precision': optimization.problem.mixed_precision,
+               'memory': (resource.getrusage(resource.RUSAGE_SELF).ru_maxrss - initial_rss) * 1024})
+
+
+def benchmark_precision(case: str, maxeval: int) -> None:
+    project = dict(suite())[case]
+
+    runs = [(name, run_isolated(measure_precision, project.to_json(), mixed, maxeval))
+            for name, mixed in [('double', False), ('mixed', True)]]
+
+    print(case)
+    print(f'{"precision":>10} {"iterations":>10} {"refined":>8} {"s":>9} {"MB":>8} {"objective":>12} '
+          f'{"error":>9}')
+
+    for name, run in runs:
+        error = run['objective'] / run['exact_objective'] - 1
+        print(f'{name:>10} {run["iterations"]:>10} {run["refinements"]:>8} {run["time"]:>9.1f} '
+              f'{run["memory"] / 1e6:>8.0f} {run["objective"]:>12.4f} {error:>9.1e}')
+
+    double, mixed = runs[0][1], runs[1][1]
+    print(f'memory: {mixed["memory"] / double["memory"]:.0%} of double precision, '
+          f'time: {mixed["time"] / double["time"]:.0%}, '
+          f'{mixed["refinements"] / mixed["iterations"]:.1f} corrections per solve')
+
+    if not mixed['mixed_precision']:
+        print('mixed precision switched to double precision during the run')
+
+
+def first_frequency(project: Project) -> float:
+    # Lowest angular frequency of the uniform starting design
+    optimization = Optimization(project)
+    problem = optimization.problem
+    x = numpy.full(problem.nel, project.domain.volume_fraction)
+    K = problem.assemble(problem.KE, problem.compute_young_moduli(x))
+    M = problem.assemble(problem.ME, problem.compute_masses(x))
+
+    return float(numpy.sqrt(scipy.sparse.linalg.eigsh(K, 1, M, sigma=0)[0][0]))
+
+
+def measure_harmonic(project_json: dict, sweep: bool, maxeval: int, queue) -> None:
+    project = Project.from_json(project_json)
+
+    start = time.perf_counter()
+    optimization = Optimization(project)
+    optimization.problem.sweep = sweep
+    optimization.solver.maxeval = maxeval
+    optimization.optimize()
+    elapsed = time.perf_counter() - start
+
+    queue.put({'time': elapsed,
+               'iterations': optimization.solver.iteration,
+               'objective': optimization.solver.last_result.obj,
+               'factorizations': optimization.problem.factorizations,
+               'basis_size': optimization.problem.basis_size})
+
+
+def benchmark_harmonic(case: str, band: float, samples: int, maxeval: int) -> None:
+    project = dict(suite())[case]
+    project.excitation = Excitation(0.0)
+    project.excitation = Excitation(0.0, band * first_frequency(project), samples)
+
+    runs = [(name, run_isolated(measure_harmonic, project.to_json(), sweep, maxeval))
+            for name, sweep in [('direct', False), ('sweep', True)]]
+
+    print(f'{case}, {samples} frequencies up to {project.excitation.max_frequency:.4g} rad/s')
+    print(f'{"solve":>10} {"iterations":>10} {"factors":>8} {"basis":>6} {"s":>9} {"objective":>12}')
+
+    for name, run in runs:
+        print(f'{name:>10} {run["iterations"]:>10} {run["factorizations"]:>8} {run["basis_size"]:>6} '
+              f'{run["time"]:>9.1f} {run["objective"]:>12.4f}')
+
+    direct, sweep = runs[0][1], runs[1][1]
+    print(f'time: {sweep["time"] / direct["time"]:.0%} of one factorization per frequency, '
+          f'objective: {sweep["objective"] / direct["objective"] - 1:+.2e}')
+
+
+def measure_eigenfrequency(project_json: dict, method: str, maxeval: int, queue) -> None:
+    project = Project.from_json(project_json)
+
+    start = time.perf_counter()
+    optimization = Optimization(project, options=OptimizationOptions(symmetry=False))
+    if method == 'compliance':
+        problem = optimization.problem
+        solver = optimization.solver
+    else:
+        material = project.domain.material_properties
+        problem = EigenfrequencyProblem(optimization.problem.bc, project.penalization,
+                                        material.young, material.poisson)
+        problem.warm_start = method == 'lobpcg'
+        solver = GaudiSolver(problem, project.domain.volume_fraction,
+                             optimization.topopt_filter, optimization.gui)
+    solver.maxeval = maxeval
+    solver.optimize(numpy.full(problem.nel, project.domain.volume_fraction))
+    elapsed = time.perf_counter() - start
+
+    queue.put({'time': elapsed,
+               'iterations': solver.iteration,
+               'objective': solver.last_result.obj,
+               'factorizations': getattr(problem, 'factorizations', solver.iteration),
+               'eigen_iterations': getattr(problem, 'eigen_iterations', 0)})
+
+
+def benchmark_eigenfrequency(case: str, maxeval: int) -> None:
+    project = dict(suite())[case]
+
+    runs = [(method, run_isolated(measure_eigenfrequency, project.to_json(), method, maxeval))
+            for method in ['compliance', 'eigsh', 'lobpcg']]
+
+    print(f'{case}, fundamental eigenvalue')
+    print(f'{"solve":>10} {"iterations":>10} {"factors":>8} {"lobpcg":>7} {"s":>9} {"s/it":>7} {"objective":>12}')
+
+    for name, run in runs:
+        print(f'{name:>10} {run["iterations"]:>10} {run["factorizations"]:>8} {run["eigen_iterations"]:>7} '
+              f'{run["time"]:>9.1f} {run["time"] / run["iterations"]:>7.2f} {run["objective"]:>12.6g}')
+
+    compliance, eigsh, lobpcg = (run for _, run in runs)
+    print(f'time per iteration: {lobpcg["time"] / lobpcg["iterations"] / (eigsh["time"] / eigsh["iterations"]):.0%} '
+          f'of shift-invert Lanczos, '
+          f'{lobpcg["time"] / lobpcg["iterations"] / (compliance["time"] / compliance["iterations"]):.0%} '
+          f'of a compliance iteration')
+
+
+class SeparateSolves(CholmodSolver):
+    # Factorizes every system of a batch from scratch
+    solve_batch = LinearSolver.solve_batch
+
+
+def measure_robust(project_json: dict, processes: int, iterations: int, queue) -> None:
+    project = Project.from_json(project_json)
+    optimization = Optimization(project)
+    solver, problem = optimization.solver, optimization.problem
+    x = solver.symmetry.reduce(Optimization.initial_design(project) * project.domain.volume_fraction)
+    dobj = numpy.empty(x.size)
+
+    measurements = {}
+
+    for name, robust, linear_solver in [('nominal', False, CholmodSolver()),
+                                        ('robust, separate solves', True, SeparateSolves()),
+                                        ('robust, shared analysis', True, CholmodSolver()),
+                                        (f'robust, {processes} processes', True, ParallelCholmodSolver(processes))]:
+        if robust:
+            solver.set_robust()
+        problem.linear_solver = linear_solver
+        obj = solver.objective_function(x, dobj)  # starts the workers
+
+        start = time.perf_counter()
+        for _ in range(iterations):
+            solver.objective_function(x, dobj)
+        elapsed = (time.perf_counter() - start) / iterations
+
+        linear_solver.close()
+        measurements[name] = (elapsed, obj)
+
+    queue.put({'dofs': problem.free.size, 'runs': measurements})
+
+
+def benchmark_robust(case: str, processes: int, iterations: int) -> None:
+    project = dict(suite())[case]
+    measured = run_isolated(measure_robust, project.to_json(), processes, iterations)
+
+    print(f'{case}: {measured["dofs"]} dofs, {os.cpu_count()} cores')
+    print(f'{"formulation":>28} {"s/it":>8} {"objective":>12}')
+
+    nominal = measured['runs']['nominal'][0]
+    for name, (elapsed, obj) in measured['runs'].items():
+        print(f'{name:>28} {elapsed:>8.2f} {obj:>12.4f}')
+
+    fastest = min(elapsed for name, (elapsed, _) in measured['runs'].items() if name != 'nominal')
+    print(f'fastest robust iteration: {fastest / nominal:.1f}x the nominal one')
+
+
+def measure_projection(project_json: dict, projection: bool, target: float, maxeval: int, queue) -> None:
+    project = Project.from_json(project_json)
+
+    start = time.perf_counter()
+    optimization = Optimization(project, options=OptimizationOptions(projection=projection))
+    solver = optimization.solver
+    solver.maxeval = maxeval
+    crisp = None
+
+    def record() -> None:
+        nonlocal crisp
+        if gray_level(solver.xPhys) > target:
+            crisp = None
+        elif crisp is None:
+            crisp = solver.iteration
+
+    # The checkpoint hook runs before every evaluation, so it sees the
+    # densities of the previous one. The solid initial design is crisp too,
+    # so the count is the evaluation after which the design stays crisp
+    solver.checkpoint_interval = 1
+    solver.on_checkpoint = record
+    optimization.optimize()
+    elapsed = time.perf_counter() - start
+    record()
+
+    queue.put({'time': elapsed,
+               'iterations': solver.iteration,
+               'crisp': crisp,
+               'gray': gray_level(solver.xPhys),
+               'objective': uniform_compliance(project, optimization)})
+
+
+def benchmark_projection(case: str, target: float, maxeval: int) -> None:
+    project = dict(suite())[case]
+
+    runs = [(name, run_isolated(measure_projection, project.to_json(), projection, target, maxeval))
+            for name, projection in [('density', False), ('projection', True)]]
+
+    print(case)
+    print(f'{"filter":>10} {"iterations":>10} {f"gray<={target:g}":>12} {"gray":>8} {"s":>9} {"objective":>12}')
+
+    for name, run in runs:
+        crisp = '-' if run['crisp'] is None else run['crisp']
+        print(f'{name:>10} {run["iterations"]:>10} {crisp:>12} {run["gray"]:>8.3f} {run["time"]:>9.1f} '
+              f'{run["objective"]:>12.4f}')
+
+    density, projection = runs[0][1], runs[1][1]
+    print(f'gray level: {projection["gray"]:.3f} against {density["gray"]:.3f}, '
+          f'objective: {projection["objective"] / density["objective"] - 1:+.2%}')
+
+
+def measure_continuation(project_json: dict, step: float, stage_ftol: float, maxeval: int, queue) -> None:
+    project = Project.from_json(project_json)
+    # Each case runs in its own process, the schedule is set for this one only
+    Optimization.continuation_step = step
+    Optimization.continuation_stage_ftol = stage_ftol
+
+    start = time.perf_counter()
+    optimization = Optimization(project, options=OptimizationOptions(continuation=step is not None))
+    solver = optimization.solver
+    solver.maxeval = maxeval
+    optimization.optimize()
+    elapsed = time.perf_counter() - start
+
+    queue.put({'time': elapsed,
+               'iterations': solver.iteration,
+               'stages': solver.stage_iterations,
+               'objective': uniform_compliance(project, optimization)})
+
+
+def benchmark_continuation(cases: list, step: float, stage_ftol: float, maxeval: int) -> None:
+    projects = dict(suite())
+
+    print(f'{"case":>12} {"penalty":>12} {"iterations":>10} {"s":>9} {"objective":>12}  stages')
+
+    for case in cases:
+        project = projects[case]
+
+        fixed = run_isolated(measure_continuation, project.to_json(), None, None, maxeval)
+        continued = run_isolated(measure_continuation, project.to_json(), step, stage_ftol, maxeval)
+
+        for name, run in [('fixed', fixed), (f'1:{step:g}:{project.penalization:g}', continued)]:
+            stages = ' '.join(str(iterations) for iterations in run['stages'])
+            print(f'{case:>12} {name:>12} {run["iterations"]:>10} {run["time"]:>9.1f} '
+                  f'{run["objective"]:>12.4f}  {stages}')
+
+        print(f'{case:>12} iterations: {continued["iterations"] / fixed["iterations"]:.0%} of the fixed penalty, '
+              f'objective: {continued["objective"] / fixed["objective"] - 1:+.2%}')
+
+
+def random_loads(project: Project, samples: int, points: int = 4, seed: int = 0) -> Project:
+    # The project's loads replaced by unit loads on points along the top
+    # edge, their directions and magnitudes scattered around straight down
+    rng = numpy.random.default_rng(seed)
+    width = project.domain.dimensions.width
+    positions = [Position(i * width // points, 0) for i in range(points)]
+
+    angles = rng.normal(0, 0.3, (samples, points))
+    magnitudes = rng.normal(1, 0.2, (samples, points))
+    sampled = numpy.stack([magnitudes * numpy.sin(angles), -magnitudes * numpy.cos(angles)], axis=2)
+
+    conditions = BoundaryConditions(project.boundary_conditions.supports, [], [])
+
+    return Project(project.domain, conditions, project.penalization, project.filter_radius,
+                   random_loads=RandomLoads(positions, samples=sampled.tolist()))
+
+
+class SampledLoads(CustomBoundaryConditions):
+    # Every sample of the random loads as a load case of its own, scaled so
+    # that their compliances add up to the sample average
+    def __init__(self, nelx: int, nely: int, boundary_conditions: BoundaryConditions, loads: RandomLoads):
+        super().__init__(nelx, nely, boundary_conditions)
+
+        samples = numpy.array(loads.samples, dtype=float).reshape(len(loads.samples), -1)
+        nodes = numpy.array([xy_to_id(position.x, position.y, nelx, nely) for position in loads.positions])
+        dofs = (2 * nodes[:, numpy.newaxis] + numpy.arange(2)).ravel()
+
+        sampled = scipy.sparse.csc_matrix(
+            (samples.ravel() / numpy.sqrt(len(samples)),
+             (numpy.tile(dofs, len(samples)), numpy.repeat(numpy.arange(len(samples)), dofs.size))),
+            shape=(self.ndof, len(samples)))
+        self.force_matrix = scipy.sparse.hstack([self.force_matrix, sampled]).tocsc()
+
+    @property
+    def load_cases(self):
+        return len(self.boundary_conditions.forces) + 1
+
+
+def measure_stochastic(project_json: dict, iterations: int, queue) -> None:
+    project = Project.from_json(project_json)
+    dimensions = project.domain.dimensions
+    material = project.domain.material_properties
+
+    measurements = {}
+
+    for name, conditions in [('samples', SampledLoads(dimensions.width, dimensions.height,
+                                                      project.boundary_conditions, project.random_loads)),
+                             ('low rank', CustomBoundaryConditions(dimensions.width, dimensions.height,
+                                                                   project.boundary_conditions,
+                                                                   project.random_loads))]:
+        problem = ComplianceProblem(conditions, project.penalization, material.young, material.poisson)
+        x = numpy.full(problem.nel, project.domain.volume_fraction)
+        dobj = numpy.empty(problem.nel)
+        obj = problem.compute_objective(x, dobj)
+
+        start = time.perf_counter()
+        for _ in range(iterations):
+            problem.compute_objective(x, dobj)
+        elapsed = (time.perf_counter() - start) / iterations
+
+        measurements[name] = (problem.nloads, elapsed, obj)
+
+    queue.put({'runs': measurements})
+
+
+def benchmark_stochastic(case: str, samples: list, iterations: int) -> None:
+    project = dict(suite())[case]
+
+    print(f'{case}: 4 random loads')
+    print(f'{"samples":>8} {"solver":>9} {"loads":>6} {"s/it":>8} {"objective":>14}')
+
+    for count in samples:
+        measured = run_isolated(measure_stochastic, random_loads(project, count).to_json(), iterations)
+
+        for name, (nloads, elapsed, obj) in measured['runs'].items():
+            print(f'{count:>8} {name:>9} {nloads:>6} {elapsed:>8.3f} {obj:>14.6f}')
+
+
+def measure_newton(project_json: dict, algorithm: str, maxeval: int, queue) -> None:
+    project = Project.from_json(project_json)
+
+    start = time.perf_counter()
+    optimization = Optimization(project, algorithm=algorithm)
+    solver = optimization.solver
+    solver.maxeval = maxeval
+    optimization.optimize()
+    elapsed = time.perf_counter() - start
+
+    # Every evaluation factorizes, the Hessian products only solve again
+    queue.put({'time': elapsed,
+               'factorizations': solver.iteration,
+               'solves': solver.iteration + getattr(solver, 'hessian_products', 0),
+               'objective': uniform_compliance(project, optimization)})
+
+
+def benchmark_newton(cases: list, maxeval: int) -> None:
+    projects = dict(suite())
+
+    print(f'{"case":>12} {"algorithm":>9} {"factorizations":>14} {"solves":>7} {"s":>9} {"objective":>12}')
+
+    for case in cases:
+        project = projects[case]
+
+        mma = run_isolated(measure_newton, project.to_json(), GaudiSolver.algorithm, maxeval)
+        newton = run_isolated(measure_newton, project.to_json(), GaudiNewtonSolver.algorithm, maxeval)
+
+        for name, run in [(GaudiSolver.algorithm, mma), (GaudiNewtonSolver.algorithm, newton)]:
+            print(f'{case:>12} {name:>9} {run["factorizations"]:>14} {run["solves"]:>7} {run["time"]:>9.1f} '
+                  f'{run["objective"]:>12.4f}')
+
+        print(f'{case:>12} factorizations: {newton["factorizations"] / mma["factorizations"]:.0%} of MMA, '
+              f'time: {newton["time"] / mma["time"]:.0%}, '
+              f'objective: {newton["objective"] / mma["objective"] - 1:+.2%}')
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='Gaudi benchmark suite')
+    subparsers = parser.add_subparsers(dest='benchmark', required=True)
+
+    resources_parser = subparsers.add_parser(
+        'resources', help='compare measured resources with the estimator')
+    resources_parser.add_argument('--solver', default='cholmod', choices=list(ResourceEstimator.calibrations),
+                                  help='linear solver to measure and calibrate')
+    resources_parser.add_argument('--iterations', type=int, default=3)
+    resources_parser.add_argument('--calibrate', action='store_true',
+                                  help='fit the estimator constants')
+
+    sensitivities_parser = subparsers.add_parser(
+        'sensitivities', help='time the compliance sensitivity kernel')
+    sensitivities_parser.add_argument('--case', default='mbb-600x300')
+    sensitivities_parser.add_argument('--iterations', type=int, default=3)
+
+    kernels_parser = subparsers.add_parser(
+        'kernels', help='compare the numpy and compiled kernels')
+    kernels_parser.add_argument('--case', default='mbb-600x300')
+    kernels_parser.add_argument('--iterations', type=int, default=10)
+
+    multiresolution_parser = subparsers.add_parser(
+        'multiresolution', help='compare coarse-to-fine with a direct run')
+    multiresolution_parser.add_argument('--case', default='mbb-600x300')
+    multiresolution_parser.add_argument('--levels', type=int, default=2)
+    multiresolution_parser.add_argument('--maxeval', type=int, default=2000)
+
+    adaptive_parser = subparsers.add_parser(
+        'adaptive', help='compare the quadtree mesh with the uniform grid')
+    adaptive_parser.add_argument('--case', default='mbb-600x300')
+    adaptive_parser.add_argument('--levels', type=int, default=0)
+    adaptive_parser.add_argument('--maxeval', type=int, default=2000)
+
+    elimination_parser = subparsers.add_parser(
+        'elimination', help='compare eliminating void elements with the full system')
+    elimination_parser.add_argument('--case', default='mbb-600x300')
+    elimination_parser.add_argument('--void-iterations', type=int, default=5)
+    elimination_parser.add_argument('--maxeval', type=int, default=2000)
+
+    symmetry_parser = subparsers.add_parser(
+        'symmetry', help='compare solving the mirrored part with the whole domain')
+    symmetry_parser.add_argument('--case', default='full-mbb-480x160')
+    symmetry_parser.add_argument('--maxeval', type=int, default=2000)
+
+    decomposition_parser = subparsers.add_parser(
+        'decomposition', help='compare the domain decomposition solver with one factorization')
+    decomposition_parser.add_argument('--case', default='mbb-600x300')
+    decomposition_parser.add_argument('--subdomains', type=int, default=max(2, os.cpu_count() or 1))
+    decomposition_parser.add_argument('--iterations', type=int, default=3)
+
+    inexact_parser = subparsers.add_parser(
+        'inexact', help='compare adaptive tolerance iterative solves with fixed tolerance ones')
+    inexact_parser.add_argument('--case', default='mbb-300x150')
+    inexact_parser.add_argument('--tolerance', type=float, default=1e-8)
+    inexact_parser.add_argument('--maxeval', type=int, default=2000)
+
+    reanalysis_parser = subparsers.add_parser(
+        'reanalysis', help='compare reusing factorizations as preconditioners with direct solves')
+    reanalysis_parser.add_argument('--case', default='mbb-300x150')
+    reanalysis_parser.add_argument('--void-iterations', type=int, default=0)
+    reanalysis_parser.add_argument('--maxeval', type=int, default=2000)
+
+    precision_parser = subparsers.add_parser(
+        'precision', help='compare mixed precision with double precision')
+    precision_parser.add_argument('--case', default='mbb-600x300')
+    precision_parser.add_argument('--maxeval', type=int, default=20)
+
+    harmonic_parser = subparsers.add_parser(
+        'harmonic', help='compare sweeping a frequency band with one factorization per frequency')
+    harmonic_parser.add_argument('--case', default='mbb-300x150')
+    harmonic_parser.add_argument('--band', type=float, default=0.8,
+                                 help='highest frequency, relative to the first natural frequency')
+    harmonic_parser.add_argument('--samples', type=int, default=16)
+    harmonic_parser.add_argument('--maxeval', type=int, default=20)
+
+    eigenfrequency_parser = subparsers.add_parser(
+        'eigenfrequency', help='compare warm started LOBPCG with shift-invert Lanczos')
+    eigenfrequency_parser.add_argument('--case', default='mbb-300x150')
+    eigenfrequency_parser.add_argument('--maxeval', type=int, default=30)
+
+    robust_parser = subparsers.add_parser(
+        'robust', help='compare the robust formulation solves with a nominal iteration')
+    robust_parser.add_argument('--case', default='mbb-300x150')
+    robust_parser.add_argument('--processes', type=int, default=3)
+    robust_parser.add_argument('--iterations', type=int, default=3)
+
+    projection_parser = subparsers.add_parser(
+        'projection', help='compare Heaviside projection continuation with the density filter')
+    projection_parser.add_argument('--case', default='mbb-120x40')
+    projection_parser.add_argument('--gray', type=float, default=0.05,
+                                   help='gray level counted as a crisp design')
+    projection_parser.add_argument('--maxeval', type=int, default=2000)
+
+    continuation_parser = subparsers.add_parser(
+        'continuation', help='compare a penalty continuation with the fixed penalty')
+    continuation_parser.add_argument('--cases', nargs='+', default=examples)
+    continuation_parser.add_argument('--step', type=float, default=Optimization.continuation_step,
+                                     help='penalty increase between stages')
+    continuation_parser.add_argument('--stage-ftol', type=float, default=Optimization.continuation_stage_ftol,
+                                     help='relative tolerance of the stages before the final one')
+    continuation_parser.add_argument('--maxeval', type=int, default=2000)
+
+    stochastic_parser = subparsers.add_parser(
+        'stochastic', help='compare the low rank random loads with one load case per sample')
+    stochastic_parser.add_argument('--case', default='mbb-300x150')
+    stochastic_parser.add_argument('--samples', type=int, nargs='+', default=[8, 32, 128])
+    stochastic_parser.add_argument('--iterations', type=int, default=3)
+
+    newton_parser = subparsers.add_parser(
+        'newton', help='compare the trust region Newton solver with MMA')
+    newton_parser.add_argument('--cases', nargs='+', default=examples + ['mbb-240x80'])
+    newton_parser.add_argument('--maxeval', type=int, default=2000)
+
+    args = parser.parse_args()
+
+    if args.benchmark == 'resources':
+        benchmark_resources(args.solver, args.iterations, args.calibrate)
+    elif args.benchmark == 'sensitivities':
+        benchmark_sensitivities(args.case, args.iterations)
+    elif args.benchmark == 'kernels':
+        benchmark_kernels(args.case, args.iterations)
+    elif args.benchmark == 'multiresolution':
+        benchmark_multiresolution(args.case, args.levels, args.maxeval)
+    elif args.benchmark == 'adaptive':
+        benchmark_adaptive(args.case, args.levels, args.maxeval)
+    elif args.benchmark == 'elimination':
+        benchmark_elimination(args.case, args.void_iterations, args.maxeval)
+    elif args.benchmark == 'symmetry':
+        benchmark_symmetry(args.case, args.maxeval)
+    elif args.benchmark == 'decomposition':
+        benchmark_decomposition(args.case, args.subdomains, args.iterations)
+    elif args.benchmark == 'inexact':
+        benchmark_inexact(args.case, args.tolerance, args.maxeval)
+    elif args.benchmark == 'reanalysis':
+        benchmark_reanalysis(args.case, args.void_iterations, args.maxeval)
+    elif args.benchmark == 'precision':
+        benchmark_precision(args.case, args.maxeval)
+    elif args.benchmark == 'harmonic':
+        benchmark_harmonic(args.case, args.band, args.samples, args.maxeval)
+    elif args.benchmark == 'eigenfrequency':
+        benchmark_eigenfrequency(args.case, args.maxeval)
+    elif args.benchmark == 'robust':
+        benchmark_robust(args.case, args.processes, args.iterations)
+    elif args.benchmark == 'projection':
+        benchmark_projection(args.case, args.gray, args.maxeval)
+    elif args.benchmark == 'continuation':
+        benchmark_continuation(args.cases, args.step, args.stage_ftol, args.maxeval)
+    elif args.benchmark == 'stochastic':
+        benchmark_stochastic(args.case, args.samples, args.iterations)
+    elif args.benchmark == 'newton':
+        benchmark_newton(args.cases, args.maxeval)
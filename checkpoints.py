@@ -0,0 +1,93 @@
+import json
+import os
+
+import numpy
+
+from dto import OptimizationOptions, Project
+
+
+class Checkpoint:
+    """
+    Snapshot of a running optimization that can be written to local disk and
+    restored on any worker.
+
+    A checkpoint is a single ``.npz`` file holding the design variables ``x``,
+    the physical densities ``xPhys``, the iteration count, the last objective
+    value, the optimizer state, the serialized project and the options it is
+    optimized with.
+    """
+
+    x: numpy.ndarray
+    xPhys: numpy.ndarray
+    iteration: int
+    obj: float
+    optimizer_state: dict
+    project: Project
+    options: OptimizationOptions
+
+    def __init__(self, identifier: str, project: Project, x: numpy.ndarray, xPhys: numpy.ndarray,
+                 iteration: int, obj: float, optimizer_state: dict = None,
+                 options: OptimizationOptions = None) -> None:
+        self.identifier = identifier
+        self.project = project
+        self.x = x
+        self.xPhys = xPhys
+        self.iteration = iteration
+        self.obj = obj
+        self.optimizer_state = optimizer_state if optimizer_state is not None else {}
+        self.options = options if options is not None else OptimizationOptions()
+
+    @staticmethod
+    def path(directory: str, identifier: str) -> str:
+        # A checkpoint never leaves its directory, whatever the identifier
+        if not identifier or os.path.basename(identifier) != identifier or identifier in ('.', '..'):
+            raise ValueError(f'Invalid checkpoint identifier {identifier!r}')
+
+        return os.path.join(directory, f'{identifier}.npz')
+
+    @staticmethod
+    def exists(directory: str, identifier: str) -> bool:
+        return os.path.isfile(Checkpoint.path(directory, identifier))
+
+    def save(self, directory: str) -> str:
+        os.makedirs(directory, exist_ok=True)
+
+        path = Checkpoint.path(directory, self.identifier)
+        temporary_path = path + '.tmp'
+
+        # Write to a temporary file first so a crash mid-write never leaves a
+        # truncated checkpoint behind
+        with open(temporary_path, 'wb') as file:
+            numpy.savez(file,
+                        x=self.x,
+                        xPhys=self.xPhys,
+                        iteration=self.iteration,
+                        obj=self.obj,
+                        optimizer_state=json.dumps(self.optimizer_state),
+                        project=json.dumps(self.project.to_json()),
+                        options=json.dumps(self.options.to_json()))
+
+        os.replace(temporary_path, path)
+
+        return path
+
+    @staticmethod
+    def load(directory: str, identifier: str):
+        with numpy.load(Checkpoint.path(directory, identifier)) as data:
+            project = Project.from_json(json.loads(str(data['project'])))
+
+            return Checkpoint(identifier,
+                              project,
+                              data['x'].copy(),
+                              data['xPhys'].copy(),
+                              int(data['iteration']),
+                              float(data['obj']),
+                              json.loads(str(data['optimizer_state'])),
+                              OptimizationOptions.from_json(json.loads(str(data['options']))))
+
+    @staticmethod
+    def delete(directory: str, identifier: str) -> None:
+        path = Checkpoint.path(directory, identifier)
+
+        if os.path.isfile(path):
+            os.remove(path)
@@ -27,6 +27,9 @@ class Dimensions:
 
         return Dimensions(width, height)
 
+    def to_json(self) -> dict:
+        return {'width': self.width, 'height': self.height}
+
     def is_valid(self):
         return self.width >= 1 and self.height >= 1
 
@@ -45,6 +48,9 @@ class Position:
 
         return Position(x, y)
 
+    def to_json(self) -> dict:
+        return {'x': self.x, 'y': self.y}
+
     def is_valid(self, max_width: int, max_height: int):
         return self.x >= 0 and self.x <= max_width and self.y >= 0 and self. y <= max_height
 
@@ -66,6 +72,11 @@ class ConstantRegion:
 
         return ConstantRegion(position, dimensions, type)
 
+    def to_json(self) -> dict:
+        return {'position': self.position.to_json(),
+                'dimensions': self.dimensions.to_json(),
+                'type': self.type.value}
+
     def validate(self, max_width, max_height, validations: List[str]):
         if not self.dimensions.is_valid():
             validations.append(
@@ -104,6 +115,12 @@ class Force:
 
         return Force(load, orientation, position, size)
 
+    def to_json(self) -> dict:
+        return {'load': self.load,
+                'orientation': self.orientation,
+                'position': self.position.to_json(),
+                'size': self.size}
+
     def validate(self, max_width, max_height, validations: List[str]):
         if self.load == 0:
             validations.append('Força com carga igual a zero')
@@ -142,6 +159,16 @@ class Support:
 
         return Support(position, SupportType(type), direction, dimensions)
 
+    def to_json(self) -> dict:
+        data = {'position': self.position.to_json(),
+                'type': self.type.value,
+                'direction': self.direction}
+
+        if self.dimensions is not None:
+            data['dimensions'] = self.dimensions.to_json()
+
+        return data
+
     def validate(self, max_width, max_height, validations: List[str]):
         if not self.position.is_valid(max_width, max_height):
             validations.append(
@@ -182,9 +209,17 @@ class BoundaryConditions:
 
         return BoundaryConditions(supports, forces, constant_regions)
 
-    def validate(self, dimensions, validations: List[str]):
+    def to_json(self) -> dict:
+        return {'supports': [support.to_json() for support in self.supports],
+                'forces': [force.to_json() for force in self.forces],
+                'constantRegions': [constant_region.to_json() for constant_region in self.constant_regions]}
+
+    def validate(self, dimensions, validations: List[str], forces_required: bool = True):
         self.validate_supports(dimensions, validations)
-        self.validate_forces(dimensions, validations)
+
+        if forces_required:
+            self.validate_forces(dimensions, validations)
+
         self.validate_constant_regions(dimensions, validations)
 
     def validate_supports(self, dimensions: Dimensions, validations: List[str]):
@@ -237,6 +272,9 @@ class MaterialProperties:
     def from_json(json: dict):
         return MaterialProperties(json['poisson'], json['young'])
 
+    def to_json(self) -> dict:
+        return {'poisson': self.poisson, 'young': self.young}
+
     def validate(self, validations: List[str]):
         if self.poisson == 0:
             validations.append(
@@ -264,6 +302,11 @@ class Domain:
 
         return Domain(mp, dimensions, vc)
 
+    def to_json(self) -> dict:
+        return {'materialProperties': self.material_properties.to_json(),
+                'dimensions': self.dimensions.to_json(),
+                'volumeFraction': self.volume_fraction}
+
     def validate(self, validations: List[str]):
         self.material_properties.validate(validations)
 
@@ -276,17 +319,258 @@ class Domain:
                 f'Domínio com dimensão inválida: Largura = {self.dimensions.width} Altura = {self.dimensions.height}')
 
 
+class Excitation:
+    # Angular frequency of harmonic loads, or the band from frequency to
+    # max_frequency sampled at evenly spaced frequencies
+    frequency: float
+    max_frequency: Optional[float]
+    samples: int
+
+    def __init__(self, frequency: float, max_frequency: Optional[float] = None, samples: int = 8) -> None:
+        self.frequency = frequency
+        self.max_frequency = max_frequency
+        self.samples = samples
+
+    def from_json(json: dict):
+        frequency = float(json['frequency'])
+
+        if json.get('maxFrequency') is not None:
+            max_frequency = float(json['maxFrequency'])
+        else:
+            max_frequency = None
+
+        samples = int(json.get('samples', 8))
+
+        return Excitation(frequency, max_frequency, samples)
+
+    def to_json(self) -> dict:
+        return {'frequency': self.frequency,
+                'maxFrequency': self.max_frequency,
+                'samples': self.samples}
+
+    def frequencies(self) -> numpy.ndarray:
+        if self.max_frequency is None:
+            return numpy.array([self.frequency])
+
+        return numpy.linspace(self.frequency, self.max_frequency, self.samples)
+
+    def validate(self, validations: List[str]):
+        if self.frequency < 0:
+            validations.append(
+                'A frequência de excitação deve ser maior ou igual a 0')
+
+        if self.max_frequency is not None:
+            if self.max_frequency <= self.frequency:
+                validations.append(
+                    'A frequência máxima deve ser maior que a frequência de excitação')
+
+            if self.samples < 2:
+                validations.append(
+                    'Uma faixa de frequências deve ter pelo menos 2 amostras')
+
+
+class Mechanism:
+    # Compliant mechanism driven by the input force, moving the output port
+    # as far as it can in the direction of the output load. The springs on
+    # the ports stand for the actuator and the workpiece
+    input: Force
+    output: Force
+    input_stiffness: float
+    output_stiffness: float
+
+    def __init__(self, input: Force, output: Force, input_stiffness: float = 0.1,
+                 output_stiffness: float = 0.1) -> None:
+        self.input = input
+        self.output = output
+        self.input_stiffness = input_stiffness
+        self.output_stiffness = output_stiffness
+
+    def from_json(json: dict):
+        input = Force.from_json(json['input'])
+        output = Force.from_json(json['output'])
+        input_stiffness = float(json.get('inputStiffness', 0.1))
+        output_stiffness = float(json.get('outputStiffness', 0.1))
+
+        return Mechanism(input, output, input_stiffness, output_stiffness)
+
+    def to_json(self) -> dict:
+        return {'input': self.input.to_json(),
+                'output': self.output.to_json(),
+                'inputStiffness': self.input_stiffness,
+                'outputStiffness': self.output_stiffness}
+
+    def loads(self) -> List[Force]:
+        # The input force and the negated output load, whose displacements
+        # are the adjoint of the output displacement
+        output = self.output
+
+        return [self.input, Force(-output.load, output.orientation, output.position, output.size)]
+
+    def validate(self, max_width, max_height, validations: List[str]):
+        self.input.validate(max_width, max_height, validations)
+        self.output.validate(max_width, max_height, validations)
+
+        if self.input_stiffness < 0 or self.output_stiffness < 0:
+            validations.append(
+                'A rigidez das molas do mecanismo não pode ser negativa')
+
+
+class RandomLoads:
+    # Point loads of uncertain magnitude and direction. The x and y
+    # components of the loads on all positions are jointly distributed, given
+    # by their mean and covariance or by samples of them. The expected
+    # compliance is the compliance of the mean load plus trace(K^-1 C), and
+    # each eigenvector of the covariance scaled by the root of its eigenvalue
+    # adds one load case to that sum. So the cost grows with the rank of the
+    # covariance, at most twice the number of positions, and not with the
+    # number of samples. A rank keeps only the largest modes
+    positions: List[Position]
+    mean: Optional[List[List[float]]]
+    covariance: Optional[List[List[float]]]
+    samples: Optional[List[List[List[float]]]]
+    rank: Optional[int]
+
+    # Eigenvalues below this fraction of the largest are dropped
+    rank_tolerance = 1e-12
+
+    def __init__(self, positions: List[Position], mean: Optional[List[List[float]]] = None,
+                 covariance: Optional[List[List[float]]] = None, samples: Optional[List[List[List[float]]]] = None,
+                 rank: Optional[int] = None) -> None:
+        self.positions = positions
+        self.mean = mean
+        self.covariance = covariance
+        self.samples = samples
+        self.rank = rank
+
+    def from_json(json: dict):
+        positions = [Position.from_json(position) for position in json['positions']]
+        mean = json.get('mean')
+        covariance = json.get('covariance')
+        samples = json.get('samples')
+        rank = int(json['rank']) if json.get('rank') is not None else None
+
+        return RandomLoads(positions, mean, covariance, samples, rank)
+
+    def to_json(self) -> dict:
+        return {'positions': [position.to_json() for position in self.positions],
+                'mean': self.mean,
+                'covariance': self.covariance,
+                'samples': self.samples,
+                'rank': self.rank}
+
+    def moments(self) -> tuple:
+        # Mean and covariance of the components (x0, y0, x1, y1, ...). Samples
+        # are weighted equally, so the expected compliance is exactly the
+        # average compliance of the sampled loads
+        size = 2 * len(self.positions)
+
+        if self.samples is not None:
+            samples = numpy.array(self.samples, dtype=float).reshape(len(self.samples), size)
+            mean = samples.mean(axis=0)
+            deviations = samples - mean
+
+            return mean, deviations.T @ deviations / len(samples)
+
+        mean = numpy.array(self.mean, dtype=float).ravel() if self.mean is not None else numpy.zeros(size)
+
+        return mean, numpy.array(self.covariance, dtype=float).reshape(size, size)
+
+    def load_cases(self) -> numpy.ndarray:
+        # Deterministic load cases, one per column, whose compliances add up
+        # to the expected compliance
+        mean, covariance = self.moments()
+        values, vectors = numpy.linalg.eigh(covariance)
+
+        order = numpy.argsort(values)[::-1]
+        values, vectors = values[order], vectors[:, order]
+
+        kept = values > self.rank_tolerance * max(values[0], 0)
+        if self.rank is not None:
+            kept[self.rank:] = False
+
+        cases = vectors[:, kept] * numpy.sqrt(values[kept])
+
+        if numpy.any(mean != 0):
+            cases = numpy.column_stack([mean, cases])
+
+        return cases
+
+    def validate(self, max_width, max_height, validations: List[str]):
+        if len(self.positions) < 1:
+            validations.append('As cargas aleatórias devem ter no mínimo uma posição')
+            return
+
+        for position in self.positions:
+            if not position.is_valid(max_width, max_height):
+                validations.append(
+                    f'Carga aleatória com posição inválida: X = {position.x} Y = {position.y}')
+
+        def shape(value) -> tuple:
+            # Ragged lists have no shape
+            try:
+                return numpy.shape(value)
+            except ValueError:
+                return None
+
+        if (self.covariance is None) == (self.samples is None):
+            validations.append('As cargas aleatórias devem ter uma covariância ou amostras, mas não ambas')
+            return
+
+        if self.samples is not None:
+            if self.mean is not None:
+                validations.append('A média das cargas aleatórias é calculada das amostras')
+
+            if len(self.samples) < 2:
+                validations.append('As cargas aleatórias devem ter no mínimo 2 amostras')
+                return
+
+            if any(shape(sample) != (len(self.positions), 2) for sample in self.samples):
+                validations.append('Cada amostra deve ter as componentes x e y de cada posição')
+                return
+        else:
+            if self.mean is not None and shape(self.mean) != (len(self.positions), 2):
+                validations.append('A média deve ter as componentes x e y de cada posição')
+                return
+
+            size = 2 * len(self.positions)
+
+            if shape(self.covariance) != (size, size):
+                validations.append(f'A covariância das cargas aleatórias deve ser uma matriz {size}x{size}')
+                return
+
+            covariance = numpy.array(self.covariance, dtype=float)
+            values = numpy.linalg.eigvalsh(0.5 * (covariance + covariance.T))
+
+            if not numpy.allclose(covariance, covariance.T) or values[0] < -1e-9 * max(abs(values[-1]), 1e-300):
+                validations.append('A covariância das cargas aleatórias deve ser simétrica e semidefinida positiva')
+                return
+
+        if self.rank is not None and self.rank < 1:
+            validations.append('O posto das cargas aleatórias deve ser maior que 0')
+
+        if self.load_cases().shape[1] == 0:
+            validations.append('As cargas aleatórias não podem ser todas nulas')
+
+
 class Project:
     domain: Domain
     boundary_conditions: BoundaryConditions
     penalization: float
     filter_radius: float
+    excitation: Optional[Excitation]
+    mechanism: Optional[Mechanism]
+    random_loads: Optional[RandomLoads]
 
-    def __init__(self, domain: Domain, boundary_conditions: BoundaryConditions, penalization: float = 3.0, filter_radius: float = 1.4) -> None:
+    def __init__(self, domain: Domain, boundary_conditions: BoundaryConditions, penalization: float = 3.0,
+                 filter_radius: float = 1.4, excitation: Optional[Excitation] = None,
+                 mechanism: Optional[Mechanism] = None, random_loads: Optional[RandomLoads] = None) -> None:
         self.domain = domain
         self.boundary_conditions = boundary_conditions
         self.penalization = penalization
         self.filter_radius = filter_radius
+        self.excitation = excitation
+        self.mechanism = mechanism
+        self.random_loads = random_loads
 
     def from_json(json: dict):
         domain = Domain.from_json(json['domain'])
@@ -294,7 +578,43 @@ class Project:
         penalization = float(json['penalization'])
         filter_radius = float(json['filterRadius'])
 
-        return Project(domain, bc, penalization, filter_radius)
+        # Projects without an excitation are loaded statically
+        if json.get('excitation') is not None:
+            excitation = Excitation.from_json(json['excitation'])
+        else:
+            excitation = None
+
+        # Mechanisms are loaded through their ports instead of forces
+        if json.get('mechanism') is not None:
+            mechanism = Mechanism.from_json(json['mechanism'])
+        else:
+            mechanism = None
+
+        # Random loads are optimized for their expected compliance, added to
+        # the compliance of the forces
+        if json.get('randomLoads') is not None:
+            random_loads = RandomLoads.from_json(json['randomLoads'])
+        else:
+            random_loads = None
+
+        return Project(domain, bc, penalization, filter_radius, excitation, mechanism, random_loads)
+
+    def to_json(self) -> dict:
+        json = {'domain': self.domain.to_json(),
+                'boundaryConditions': self.boundary_conditions.to_json(),
+                'penalization': self.penalization,
+                'filterRadius': self.filter_radius}
+
+        if self.excitation is not None:
+            json['excitation'] = self.excitation.to_json()
+
+        if self.mechanism is not None:
+            json['mechanism'] = self.mechanism.to_json()
+
+        if self.random_loads is not None:
+            json['randomLoads'] = self.random_loads.to_json()
+
+        return json
 
     def validate(self, validations: List[str]):
         if self.penalization <= 1:
@@ -307,25 +627,224 @@ class Project:
 
         self.domain.validate(validations)
 
-        self.boundary_conditions.validate(self.domain.dimensions, validations)
+        self.boundary_conditions.validate(self.domain.dimensions, validations,
+                                          self.mechanism is None and self.random_loads is None)
+
+        if self.excitation is not None:
+            self.excitation.validate(validations)
+
+        if self.mechanism is not None:
+            self.mechanism.validate(self.domain.dimensions.width, self.domain.dimensions.height, validations)
+
+            if self.boundary_conditions.forces:
+                validations.append(
+                    'Um mecanismo é carregado apenas pelas suas portas de entrada e saída')
+
+            if self.excitation is not None:
+                validations.append(
+                    'Um mecanismo não pode ter excitação harmônica')
+
+        if self.random_loads is not None:
+            self.random_loads.validate(self.domain.dimensions.width, self.domain.dimensions.height, validations)
+
+            if self.mechanism is not None:
+                validations.append(
+                    'Um mecanismo é carregado apenas pelas suas portas de entrada e saída')
+
+            if self.excitation is not None:
+                validations.append(
+                    'Cargas aleatórias não podem ter excitação harmônica')
+
+
+class OptimizationOptions:
+    # How a project is optimized, chosen when it is submitted and saved with
+    # its checkpoints so a resumed optimization continues the same way
+    levels: int
+    adaptive: bool
+    void_iterations: int
+    stress_interval: Optional[int]
+    robust: bool
+    projection: bool
+    continuation: bool
+    symmetry: bool
+    linear_solver: Optional[str]
+    mixed_precision: Optional[bool]
+
+    def __init__(self, levels: int = 0, adaptive: bool = False, void_iterations: int = 0,
+                 stress_interval: Optional[int] = None, robust: bool = False, projection: bool = False,
+                 continuation: bool = False, symmetry: bool = True, linear_solver: Optional[str] = None,
+                 mixed_precision: Optional[bool] = None) -> None:
+        # Coarse grids solved first to settle the layout
+        self.levels = levels
+        # Analyse the design on a quadtree mesh
+        self.adaptive = adaptive
+        # Iterations an element stays void before it leaves the system
+        self.void_iterations = void_iterations
+        # Stresses come with every stress_interval-th result and the final
+        # one, with the final one only when it is 0 and never when it is None
+        self.stress_interval = stress_interval
+        # Design for an eroded, the intermediate and a dilated design
+        self.robust = robust
+        # Project the filtered densities onto crisp designs
+        self.projection = projection
+        # Raise the penalty from 1 towards the project's penalization
+        self.continuation = continuation
+        # Solve mirror symmetric projects on the part below the mirror lines
+        self.symmetry = symmetry
+        # The linear solver, the service's default when None
+        self.linear_solver = linear_solver
+        # Single precision stiffness values, element energies and filter
+        # weights, the service's default when None
+        self.mixed_precision = mixed_precision
+
+    def from_json(json: dict):
+        stress_interval = json.get('stressInterval')
+
+        return OptimizationOptions(int(json.get('levels', 0)),
+                                   bool(json.get('adaptive', False)),
+                                   int(json.get('voidIterations', 0)),
+                                   int(stress_interval) if stress_interval is not None else None,
+                                   bool(json.get('robust', False)),
+                                   bool(json.get('projection', False)),
+                                   bool(json.get('continuation', False)),
+                                   bool(json.get('symmetry', True)),
+                                   json.get('linearSolver'),
+                                   json.get('mixedPrecision'))
+
+    def to_json(self) -> dict:
+        return {'levels': self.levels,
+                'adaptive': self.adaptive,
+                'voidIterations': self.void_iterations,
+                'stressInterval': self.stress_interval,
+                'robust': self.robust,
+                'projection': self.projection,
+                'continuation': self.continuation,
+                'symmetry': self.symmetry,
+                'linearSolver': self.linear_solver,
+                'mixedPrecision': self.mixed_precision}
+
+    def validate(self, project: Project, validations: List[str]):
+        if self.levels < 0:
+            validations.append(
+                'O número de níveis deve ser maior ou igual a 0')
+
+        if self.void_iterations < 0:
+            validations.append(
+                'O número de iterações para remover elementos vazios deve ser maior ou igual a 0')
+
+        if self.stress_interval is not None and self.stress_interval < 0:
+            validations.append(
+                'O intervalo de cálculo das tensões deve ser maior ou igual a 0')
+
+        if self.robust and self.projection:
+            validations.append(
+                'A otimização robusta já projeta as densidades, sem a projeção adicional')
+
+        # The quadtree mesh only analyses the compliance of static loads,
+        # and has no element stresses nor void elements to drop
+        if self.adaptive:
+            if project.mechanism is not None:
+                validations.append(
+                    'A malha adaptativa não pode ser usada em mecanismos')
+
+            if project.excitation is not None:
+                validations.append(
+                    'A malha adaptativa não pode ser usada com excitação harmônica')
+
+            if self.stress_interval is not None:
+                validations.append(
+                    'A malha adaptativa não calcula tensões')
+
+            if self.void_iterations > 0:
+                validations.append(
+                    'A malha adaptativa não remove elementos vazios do sistema')
 
 
 class Result():
-    def __init__(self, x: numpy.ndarray, volume: float, obj: float, finished: bool = False):
+    def __init__(self, x: numpy.ndarray, volume: float, obj: float, finished: bool = False, paused: bool = False,
+                 stresses: numpy.ndarray = None, stages: list = None):
         self.densities = x.tolist()
         self.volume = volume
         self.obj = obj
         self.finished = finished
+        self.paused = paused
+        # Von Mises, largest and smallest principal stress of each element
+        self.stresses = stresses.tolist() if stresses is not None else None
+        # Iterations of each continuation stage, sent with the final result
+        self.stages = stages
 
     def serialize(self) -> dict():
         data = dict()
         if self.finished:
             data['finished'] = self.finished
 
+        if self.paused:
+            data['paused'] = self.paused
+
         data['densities'] = [round(d, 5) for d in self.densities]
         data['volume'] = self.volume
         data['objective'] = self.obj
 
+        if self.stresses is not None:
+            von_mises, largest, smallest = self.stresses
+
+            data['vonMisesStress'] = [float(f'{s:.5g}') for s in von_mises]
+            data['principalStresses'] = [[float(f'{s:.5g}') for s in largest],
+                                         [float(f'{s:.5g}') for s in smallest]]
+
+        if self.stages is not None:
+            data['stageIterations'] = self.stages
+
+        return data
+
+
+class FailedResult():
+    def __init__(self, error: str):
+        self.error = error
+        self.finished = True
+
+    def serialize(self) -> dict():
+        data = dict()
+
+        data['finished'] = self.finished
+        data['error'] = self.error
+
+        return data
+
+
+class QueueResult():
+    def __init__(self, position: int):
+        self.position = position
+
+    def serialize(self) -> dict():
+        data = dict()
+
+        data['queued'] = True
+        data['queuePosition'] = self.position
+
+        return data
+
+
+class ResourceEstimate():
+    def __init__(self, dofs: int, stiffness_nonzeros: int, factor_nonzeros: int, filter_nonzeros: int,
+                 iteration_time: float, memory: int):
+        self.dofs = dofs
+        self.stiffness_nonzeros = stiffness_nonzeros
+        self.factor_nonzeros = factor_nonzeros
+        self.filter_nonzeros = filter_nonzeros
+        self.iteration_time = iteration_time
+        self.memory = memory
+
+    def serialize(self) -> dict():
+        data = dict()
+
+        data['dofs'] = self.dofs
+        data['stiffnessNonzeros'] = self.stiffness_nonzeros
+        data['factorNonzeros'] = self.factor_nonzeros
+        data['filterNonzeros'] = self.filter_nonzeros
+        data['iterationTime'] = self.iteration_time
+        data['memory'] = self.memory
+
         return data
 
 
@@ -1,96 +1,188 @@
-
-
 import numpy
+import nlopt
+import scipy.sparse
 from topopt.boundary_conditions import BoundaryConditions as bc
 from topopt.filters import Filter
 from topopt.guis import GUI
-from topopt.problems import Problem, ComplianceProblem
+from topopt.problems import Problem, ComplianceProblem, AdaptiveComplianceProblem, HarmonicLoadsProblem
+from topopt.mechanisms.problems import MechanismSynthesisProblem
 from topopt.utils import xy_to_id
-from topopt.solvers import TopOptSolver
-from topopt.filters import DensityBasedFilter
+from topopt.solvers import TopOptSolver, OCSolver, TrustRegionSolver
+from topopt.von_mises_stress import VonMisesStressCalculator
+from topopt.filters import DensityBasedFilter, ProjectionFilter
+from topopt.linear_solvers import CholmodSolver, DomainDecompositionSolver, IterativeSolver, LinearSolver, \
+    ParallelCholmodSolver, ReanalysisSolver
 from dto import *
+from checkpoints import Checkpoint
+from resources import ResourceEstimator
 
+import copy
+import logging
+import math
+import os
+import re
 from queue import SimpleQueue
+from threading import Event
 import time
+import uuid
+
+
+class Symmetry:
+    # Mirror lines through the middle of a grid, and the map between the whole
+    # grid and the part below the mirror lines that is actually solved
+    def __init__(self, nelx: int, nely: int, mirror_x: bool = False, mirror_y: bool = False):
+        self.nelx = nelx
+        self.nely = nely
+        self.mirror_x = mirror_x
+        self.mirror_y = mirror_y
+
+        self.reduced_nelx = nelx // 2 if mirror_x else nelx
+        self.reduced_nely = nely // 2 if mirror_y else nely
+
+        # Number of copies of the solved part that make up the whole grid
+        self.factor = (2 if mirror_x else 1) * (2 if mirror_y else 1)
+
+    @property
+    def reduced(self) -> bool:
+        return self.factor > 1
+
+    def reduce(self, x: numpy.ndarray) -> numpy.ndarray:
+        if not self.reduced:
+            return x
+
+        return x.reshape(self.nelx, self.nely)[:self.reduced_nelx, :self.reduced_nely].ravel()
+
+    def expand(self, x: numpy.ndarray) -> numpy.ndarray:
+        if not self.reduced:
+            return x
+
+        x = x.reshape(self.reduced_nelx, self.reduced_nely)
+
+        if self.mirror_x:
+            x = numpy.concatenate([x, x[::-1]], axis=0)
+
+        if self.mirror_y:
+            x = numpy.concatenate([x, x[:, ::-1]], axis=1)
+
+        return x.ravel()
 
 
 class CustomBoundaryConditions(bc):
-    def __init__(self, nelx, nely, boundary_conditions: BoundaryConditions):
+    def __init__(self, nelx, nely, boundary_conditions: BoundaryConditions, random_loads: RandomLoads = None):
         self.boundary_conditions = boundary_conditions
+        self.random_loads = random_loads
         super().__init__(nelx, nely)
 
-    @property
-    def fixed_nodes(self):
-        fixed = None
+        self.rasterize()
+
+    def rasterize(self):
+        # Paint supports, forces and constant regions onto boolean masks of
+        # the grid in a single pass, the properties below only read the cache
+        fixed = numpy.zeros((self.nelx + 1, self.nely + 1, 2), dtype=bool)
+        nodes = fixed.reshape(-1, 2)
 
         for support in self.boundary_conditions.supports:
-            if support.dimensions is not None and support.dimensions.width + support.dimensions.height > 0:
-                supp_points = None
-                # add support for multidimensional supports
-                for i in range(support.dimensions.width):
-                    func = numpy.vectorize(lambda y: xy_to_id(
-                        support.position.x + i, y, self.nelx, self.nely))
-                    begin = support.position.y
-
-                    ids = 2 * func(range(begin, begin +
-                                   support.dimensions.height + 1))
-
-                    if support.type == SupportType.FIXED:
-                        ids = [ids, ids + 1]
-                    else:
-                        ids += support.direction
-
-                    if supp_points is not None:
-                        supp_points = numpy.union1d(supp_points, ids)
-                    else:
-                        supp_points = ids
+            if support.type == SupportType.FIXED:
+                directions = slice(0, 2)
+            else:
+                directions = support.direction
 
+            if support.dimensions is not None and support.dimensions.width + support.dimensions.height > 0:
+                fixed[support.position.x: support.position.x + support.dimensions.width,
+                      support.position.y: support.position.y + support.dimensions.height + 1,
+                      directions] = True
             else:
-                index = 2 * (xy_to_id(support.position.x,
-                                      support.position.y, self.nelx, self.nely) - 1)
+                # point supports are anchored on the node before their position
+                node = xy_to_id(support.position.x,
+                                support.position.y, self.nelx, self.nely) - 1
 
-                if support.type == SupportType.FIXED:
-                    supp_points = [index, index + 1]
-                else:
-                    supp_points = [index + support.direction]
+                if node >= 0:
+                    nodes[node, directions] = True
+
+        self.fixed_mask = fixed.ravel()
+        self.fixed_dofs = numpy.flatnonzero(self.fixed_mask)
+
+        rows, columns, loads = [numpy.empty(0, dtype=int)], [
+            numpy.empty(0, dtype=int)], [numpy.empty(0)]
 
-            if fixed is not None:
-                fixed = numpy.union1d(fixed, supp_points)
+        for i, force in enumerate(self.boundary_conditions.forces):
+            if force.size > 0:
+                # distributed forces are applied on the node ids of the line
+                if force.orientation == 0:
+                    ids = xy_to_id(numpy.arange(force.position.x, force.position.x + force.size),
+                                   force.position.y, self.nelx, self.nely)
+                else:
+                    ids = xy_to_id(force.position.x, numpy.arange(force.position.y, force.position.y + force.size),
+                                   self.nelx, self.nely)
             else:
-                fixed = supp_points
+                ids = numpy.array([2 * xy_to_id(force.position.x,
+                                                force.position.y, self.nelx, self.nely) + force.orientation])
 
-        return fixed
+            rows.append(ids)
+            columns.append(numpy.full(ids.size, i))
+            loads.append(numpy.full(ids.size, float(force.load)))
 
-    @property
-    def forces(self):
+        ncases = len(self.boundary_conditions.forces)
 
-        forces_length = len(self.boundary_conditions.forces)
+        # Random loads follow the forces, one load case per column of their
+        # low rank factorization, all solved with the same factor
+        if self.random_loads is not None:
+            cases = self.random_loads.load_cases()
+            nodes = numpy.array([xy_to_id(position.x, position.y, self.nelx, self.nely)
+                                 for position in self.random_loads.positions])
+            dofs = (2 * nodes[:, numpy.newaxis] + numpy.arange(2)).ravel()
 
-        f = numpy.zeros((self.ndof, forces_length))
+            rows.append(numpy.tile(dofs, cases.shape[1]))
+            columns.append(numpy.repeat(ncases + numpy.arange(cases.shape[1]), dofs.size))
+            loads.append(cases.T.ravel())
+            ncases += cases.shape[1]
 
-        for i in range(forces_length):
-            force = self.boundary_conditions.forces[i]
+        self.force_matrix = scipy.sparse.csc_matrix(
+            (numpy.concatenate(loads), (numpy.concatenate(rows), numpy.concatenate(columns))),
+            shape=(self.ndof, ncases))
 
-            if force.size > 0:
-                if force.orientation == 0:
-                    func = numpy.vectorize(lambda x: xy_to_id(
-                        x, force.position.y, self.nelx, self.nely))
-                    begin = force.position.x
-                else:
-                    func = numpy.vectorize(lambda y: xy_to_id(
-                        force.position.x, y, self.nelx, self.nely))
-                    begin = force.position.y
-                ids = func(range(begin, begin + force.size))
-                f[ids, i] = force.load
+        self.region_masks = {}
+        self.region_elements = {}
 
-            else:
-                index = 2 * xy_to_id(force.position.x,
-                                     force.position.y, self.nelx, self.nely) + force.orientation
-                ids = numpy.arange(index, index + 1)
+        for region_type in RegionType:
+            mask = numpy.zeros((self.nelx, self.nely), dtype=bool)
+
+            for region in self.boundary_conditions.constant_regions:
+                if region.type == region_type:
+                    mask[region.position.x: region.position.x + region.dimensions.width,
+                         region.position.y: region.position.y + region.dimensions.height] = True
+
+            self.region_masks[region_type] = mask.ravel()
+            self.region_elements[region_type] = numpy.flatnonzero(mask)
+
+    @property
+    def fixed_nodes(self):
+        return self.fixed_dofs
+
+    @property
+    def forces(self):
+        return self.force_matrix.toarray()
+
+    @property
+    def sparse_forces(self):
+        return self.force_matrix
+
+    @property
+    def load_cases(self):
+        # The columns of the random loads add up to the expected compliance
+        # of a single load case
+        return len(self.boundary_conditions.forces) + (self.random_loads is not None)
+
+    @property
+    def stress_cases(self):
+        # Only the forces and the mean of the random loads are physical loads,
+        # the other random load columns are scaled covariance eigenvectors
+        cases = numpy.arange(len(self.boundary_conditions.forces))
 
-            f[ids, i] = force.load
+        if self.random_loads is not None and numpy.any(self.random_loads.moments()[0] != 0):
+            cases = numpy.append(cases, cases.size)
 
-        return f
+        return cases
 
     @property
     def passive_elements(self):
@@ -100,50 +192,246 @@ class CustomBoundaryConditions(bc):
     def active_elements(self):
         return self.get_constant_region(RegionType.MATERIAL)
 
+    @property
+    def passive_mask(self):
+        return self.region_masks[RegionType.VOID]
+
+    @property
+    def active_mask(self):
+        return self.region_masks[RegionType.MATERIAL]
+
     def get_constant_region(self, region_type: RegionType):
+        return self.region_elements[region_type]
 
-        X, Y = None, None
+    def symmetry(self) -> Symmetry:
+        return Symmetry(self.nelx, self.nely, self.is_mirrored(0), self.is_mirrored(1))
 
-        for region in self.boundary_conditions.constant_regions:
-            if region.type != region_type:
-                continue
+    def is_mirrored(self, axis: int) -> bool:
+        # Compares the rasterized conditions, so whatever the supports and
+        # forces paint onto the grid is what has to be symmetric
+        size = (self.nelx, self.nely)[axis]
 
-            X_t, Y_t = numpy.mgrid[region.position.x: region.position.x + region.dimensions.width,
-                                   region.position.y: region.position.y + region.dimensions.height]
+        # The mirror line must run along grid nodes
+        if size % 2 == 1:
+            return False
 
-            if X is None:
-                X, Y = X_t.ravel(), Y_t.ravel()
-            else:
-                X = numpy.append(X.ravel(), X_t.ravel())
-                Y = numpy.append(Y.ravel(), Y_t.ravel())
+        fixed = self.fixed_mask.reshape(self.nelx + 1, self.nely + 1, 2)
+
+        if not numpy.array_equal(fixed, numpy.flip(fixed, axis)):
+            return False
+
+        for mask in self.region_masks.values():
+            mask = mask.reshape(self.nelx, self.nely)
+
+            if not numpy.array_equal(mask, numpy.flip(mask, axis)):
+                return False
+
+        # Mirrored loads keep their component along the mirror line and flip
+        # the one across it
+        dofs = numpy.arange(self.ndof).reshape(self.nelx + 1, self.nely + 1, 2)
+        sign = numpy.ones(dofs.shape)
+        sign[..., axis] = -1
 
-        if X is None:
-            return numpy.array([])
+        forces = self.force_matrix.tocsr()
+        mirrored = scipy.sparse.diags(sign.ravel()) @ forces[numpy.flip(dofs, axis).ravel()]
 
-        pairs = numpy.vstack([X.ravel(), Y.ravel()]).T
+        difference = abs(forces - mirrored)
+
+        return difference.nnz == 0 or difference.max() <= 1e-12 * abs(forces).max()
+
+    @staticmethod
+    def coarsen(boundary_conditions: BoundaryConditions, fine: Dimensions, coarse: Dimensions) -> BoundaryConditions:
+        # Rescale the boundary conditions of a fine grid onto a coarser one,
+        # keeping the total load of distributed forces
+        scale_x = coarse.width / fine.width
+        scale_y = coarse.height / fine.height
+
+        def node(position: Position) -> Position:
+            return Position(min(round(position.x * scale_x), coarse.width),
+                            min(round(position.y * scale_y), coarse.height))
+
+        supports = []
+
+        for support in boundary_conditions.supports:
+            position = node(support.position)
+            dimensions = None
+
+            if support.dimensions is not None and support.dimensions.width + support.dimensions.height > 0:
+                width = max(1, round(support.dimensions.width * scale_x)
+                            ) if support.dimensions.width > 0 else 0
+                height = max(1, round(support.dimensions.height * scale_y)
+                             ) if support.dimensions.height > 0 else 0
 
-        to_id = numpy.vectorize(lambda xy: xy_to_id(
-            *xy, nelx=self.nelx - 1, nely=self.nely - 1), signature="(m)->()")
+                dimensions = Dimensions(min(width, coarse.width + 1 - position.x),
+                                        min(height, coarse.height - position.y))
 
-        return to_id(pairs)
+            supports.append(Support(position, support.type,
+                            support.direction, dimensions))
+
+        forces = []
+
+        for force in boundary_conditions.forces:
+            size = force.size
+            load = force.load
+
+            if force.size > 0:
+                scale = scale_x if force.orientation == 0 else scale_y
+                size = max(1, round(force.size * scale))
+                load = force.load * force.size / size
+
+            forces.append(Force(load, force.orientation,
+                          node(force.position), size))
+
+        regions = []
+
+        for region in boundary_conditions.constant_regions:
+            x = int(region.position.x * scale_x)
+            y = int(region.position.y * scale_y)
+            end_x = math.ceil((region.position.x + region.dimensions.width) * scale_x)
+            end_y = math.ceil((region.position.y + region.dimensions.height) * scale_y)
+
+            regions.append(ConstantRegion(Position(x, y), Dimensions(
+                end_x - x, end_y - y), region.type))
+
+        return BoundaryConditions(supports, forces, regions)
+
+
+class MirroredBoundaryConditions(CustomBoundaryConditions):
+    # The part of a mirror symmetric problem below its mirror lines. Nodes on a
+    # mirror line may not move across it, and take half of the loads there
+    def __init__(self, full: CustomBoundaryConditions, symmetry: Symmetry):
+        self.full = full
+        self.symmetry = symmetry
+        self.boundary_conditions = full.boundary_conditions
+        self.random_loads = full.random_loads
+        bc.__init__(self, symmetry.reduced_nelx, symmetry.reduced_nely)
+
+        self.rasterize()
+
+    def rasterize(self):
+        full = self.full
+        fixed = full.fixed_mask.reshape(
+            full.nelx + 1, full.nely + 1, 2)[:self.nelx + 1, :self.nely + 1].copy()
+        share = numpy.ones((self.nelx + 1, self.nely + 1))
+
+        if self.symmetry.mirror_x:
+            fixed[self.nelx, :, 0] = True
+            share[self.nelx, :] /= 2
+
+        if self.symmetry.mirror_y:
+            fixed[:, self.nely, 1] = True
+            share[:, self.nely] /= 2
+
+        self.fixed_mask = fixed.ravel()
+        self.fixed_dofs = numpy.flatnonzero(self.fixed_mask)
+
+        x, y = numpy.meshgrid(numpy.arange(self.nelx + 1),
+                              numpy.arange(self.nely + 1), indexing='ij')
+        nodes = xy_to_id(x, y, full.nelx, full.nely).ravel()
+        dofs = numpy.stack([2 * nodes, 2 * nodes + 1], axis=1).ravel()
+
+        self.force_matrix = (scipy.sparse.diags(share.repeat(2)) @
+                             full.force_matrix.tocsr()[dofs]).tocsc()
+
+        self.region_masks = {}
+        self.region_elements = {}
+
+        for region_type, mask in full.region_masks.items():
+            mask = mask.reshape(full.nelx, full.nely)[:self.nelx, :self.nely].ravel()
+
+            self.region_masks[region_type] = mask
+            self.region_elements[region_type] = numpy.flatnonzero(mask)
 
 
 class GaudiSolver(TopOptSolver):
+    algorithm = 'mma'
+
     def __init__(self, problem: Problem, volfrac: float, filter: Filter, gui: GUI, maxeval=2000, ftol_rel=0.001):
         super().__init__(problem, volfrac, filter, gui, maxeval, ftol_rel)
         self.results = SimpleQueue()
         self.last_result: Result = None
+        self.finished = False
+
+        self.total_maxeval = maxeval
+
+        # Next design to be evaluated, the point a checkpoint resumes from
+        self.x: numpy.ndarray = None
+
+        # Results always cover the whole grid, also when the solver only sees
+        # the part below the mirror lines of a symmetric project
+        self.symmetry = Symmetry(problem.nelx, problem.nely)
+
+        self.pause_requested = Event()
+        self.checkpoint_interval = 0
+        self.on_checkpoint = None
+        self.on_finished = None
+
+        # Per-job memory cap in bytes, and the memory held outside of Python
+        # objects (the linear solver's factor) that counts towards it
+        self.memory_limit = None
+        self.external_memory = 0
+
+        # Stresses are sent with the result every stress_interval iterations
+        # and with the final one, only with the final one when it is 0 and
+        # never when it is None
+        self.stress_interval: int = None
+        self.stress_calculator: VonMisesStressCalculator = None
 
     def objective_function(self, x: numpy.ndarray, dobj: numpy.ndarray) -> float:
+        self.x = x.copy()
+
+        if self.pause_requested.is_set():
+            raise nlopt.ForcedStop
+
+        if self.on_checkpoint is not None and self.checkpoint_interval > 0 and \
+                self.iteration > 0 and self.iteration % self.checkpoint_interval == 0:
+            self.on_checkpoint()
+
         obj = super().objective_function(x, dobj)
 
-        result = Result(x, x.sum(), obj)
+        stresses = None
+
+        if self.stress_interval and self.iteration % self.stress_interval == 0:
+            stresses = self.stresses()
+
+        result = self.result(x, obj, stresses)
 
         self.results.put(result)
         self.last_result = result
 
+        if self.memory_limit is not None and self.memory_usage() > self.memory_limit:
+            raise MemoryError(
+                f'A otimização excedeu o limite de memória de {self.memory_limit / 1e6:.0f} MB')
+
         return obj
 
+    def result(self, x: numpy.ndarray, obj: float, stresses: numpy.ndarray = None) -> Result:
+        x = self.symmetry.expand(x)
+
+        return Result(x, x.sum(), obj * self.symmetry.factor, stresses=stresses)
+
+    def stresses(self) -> numpy.ndarray:
+        # Post-processes the displacements of the last objective evaluation,
+        # the von Mises and principal stresses do not change when mirrored
+        if self.stress_calculator is None:
+            self.stress_calculator = VonMisesStressCalculator(self.problem)
+
+        stresses = self.stress_calculator.stress_field(
+            self.xPhys, self.problem.displacements[:, self.problem.bc.stress_cases])
+
+        return numpy.array([self.symmetry.expand(s) for s in stresses])
+
+    def memory_usage(self) -> int:
+        problem = self.problem
+        arrays = [problem.iK, problem.jK, problem.edofMat, problem.u, numpy.asarray(problem.rhs),
+                  problem.f.data, problem.f.indices, problem.f.indptr, problem.uT, problem.ue, problem.KEue,
+                  self.filter.H.data, self.filter.H.indices, self.filter.H.indptr]
+
+        # Results not yet read by the client hold one list of densities each
+        backlog = self.results.qsize() * self.xPhys.size * 32
+
+        return sum(array.nbytes for array in arrays) + backlog + self.external_memory
+
     def get_result(self) -> Result:
         result = self.results.get()
 
@@ -152,15 +440,118 @@ class GaudiSolver(TopOptSolver):
 
         return result
 
-    def optimize(self, x: numpy.ndarray) -> numpy.ndarray:
-        final = super().optimize(x)
+    def pause(self) -> None:
+        self.pause_requested.set()
+
+    def optimizer_state(self) -> dict:
+        # nlopt does not expose the MMA asymptotes or dual variables, so the
+        # restorable state is the design itself plus the evaluation budget
+        return {'algorithm': self.algorithm,
+                'maxeval': self.total_maxeval,
+                'ftol_rel': self.ftol_rel,
+                'penalty': self.problem.penalty,
+                'penalties': list(self.penalties),
+                'final_ftol_rel': self.final_ftol_rel,
+                'stages': list(self.stage_starts)}
+
+    def restore(self, checkpoint: Checkpoint) -> None:
+        state = checkpoint.optimizer_state
+
+        self.total_maxeval = state.get('maxeval', self.total_maxeval)
+        self.ftol_rel = state.get('ftol_rel', self.ftol_rel)
+        self.iteration = checkpoint.iteration
+        self.maxeval = max(1, self.total_maxeval - self.iteration)
+
+        self.problem.penalty = state.get('penalty', self.problem.penalty)
+        self.penalties = list(state.get('penalties', self.penalties))
+        self.stage_starts = list(state.get('stages', self.stage_starts))
+        self.final_ftol_rel = state.get('final_ftol_rel', self.final_ftol_rel)
+
+        self.x = self.symmetry.reduce(checkpoint.x).copy()
+        self.xPhys[:] = self.symmetry.reduce(checkpoint.xPhys)
+
+        result = Result(checkpoint.x, checkpoint.x.sum(), checkpoint.obj)
+
+        self.results.put(result)
+        self.last_result = result
+
+    def fail(self, error: str) -> None:
+        self.finished = True
+        self.results.put(FailedResult(error))
+
+    def finish(self, final: numpy.ndarray) -> None:
+        self.finished = True
+
+        stresses = self.stresses() if self.stress_interval is not None else None
+
+        # Continuations report how long each stage took to converge
+        stages = self.stage_iterations if len(self.stage_starts) > 1 else None
 
         self.results.put(
-            Result(final, self.last_result.volume, self.last_result.obj, True))
+            Result(self.symmetry.expand(final), self.last_result.volume, self.last_result.obj, True,
+                   stresses=stresses, stages=stages))
+
+        if self.on_finished is not None:
+            self.on_finished()
+
+    def optimize(self, x: numpy.ndarray) -> numpy.ndarray:
+        try:
+            final = super().optimize(x)
+        except nlopt.ForcedStop:
+            last = self.last_result if self.last_result is not None else self.result(self.x, 0.0)
+
+            self.results.put(
+                Result(self.symmetry.expand(self.x), last.volume, last.obj, paused=True))
+
+            return self.x
+
+        self.finish(final)
 
         return final
 
 
+class GaudiOCSolver(GaudiSolver, OCSolver):
+    algorithm = 'oc'
+
+    def optimizer_state(self) -> dict:
+        state = super().optimizer_state()
+        state['move'] = self.move
+
+        return state
+
+    def restore(self, checkpoint: Checkpoint) -> None:
+        super().restore(checkpoint)
+
+        # The optimality criteria state is explicit, so the resumed run
+        # follows exactly the same path as an uninterrupted one
+        self.maxeval = self.total_maxeval
+        self.move = checkpoint.optimizer_state.get('move', self.move)
+        self.obj = checkpoint.obj if checkpoint.iteration > 0 else None
+
+
+class GaudiNewtonSolver(GaudiSolver, TrustRegionSolver):
+    algorithm = 'newton'
+
+    def optimizer_state(self) -> dict:
+        state = super().optimizer_state()
+        state['radius'] = self.radius
+
+        return state
+
+    def restore(self, checkpoint: Checkpoint) -> None:
+        super().restore(checkpoint)
+
+        # The resumed run analyses the checkpointed design again before its
+        # next step, with the trust region it had reached
+        self.maxeval = self.total_maxeval
+        self.radius = checkpoint.optimizer_state.get('radius', self.radius)
+
+
+solvers = {GaudiSolver.algorithm: GaudiSolver,
+           GaudiOCSolver.algorithm: GaudiOCSolver,
+           GaudiNewtonSolver.algorithm: GaudiNewtonSolver}
+
+
 class GaudiMockedGUI(GUI):
     def update(self, xPhys, title=None):
         pass
@@ -169,32 +560,554 @@ class GaudiMockedGUI(GUI):
         pass
 
 
+def new_identifier() -> str:
+    # Random, so jobs submitted within the same millisecond never share one
+    return uuid.uuid4().hex
+
+
+def valid_identifier(identifier: str) -> bool:
+    # Identifiers name checkpoint files, so only the hexadecimal ones
+    # new_identifier hands out are accepted from clients
+    return identifier is not None and re.fullmatch('[0-9a-f]{1,32}', identifier) is not None
+
+
 class Optimization:
-    def __init__(self, project: Project):
+    checkpoint_interval = 10
+
+    # Smallest side, in elements, of the coarsest multiresolution grid
+    min_level_size = 10
+
+    # A prolongated design starts close to a stationary point, where the
+    # first steps change the objective less than a cold start's tolerance
+    continuation_ftol_scale = 0.1
+
+    # Grids with at least this many dofs are cut into strips solved by
+    # domain decomposition, one worker process per strip
+    domain_decomposition_dofs = 1000000
+    solver_processes = os.cpu_count() or 1
+
+    # 'direct' factorizes every system, 'iterative' solves them inexactly by
+    # preconditioned conjugate gradients to a tolerance that tightens as the
+    # objective settles, and 'reanalysis' does the same preconditioned by
+    # the factorization of an earlier iteration
+    linear_solver = 'direct'
+
+    # Store the stiffness values and filter weights in single precision,
+    # refining the displacements in double
+    mixed_precision = False
+
+    # Penalty continuations raise the penalty by continuation_step, moving
+    # on once a stage changes the objective by less than
+    # continuation_stage_ftol. On the example projects this converges in
+    # about as many iterations as the fixed penalty, to designs as stiff
+    continuation_step = 1.0
+    continuation_stage_ftol = 0.03
+
+    # Optimality criteria settings of mechanism projects
+    mechanism_move = 0.1
+    mechanism_damping = 0.3
+    mechanism_min_density = 1e-3
+    mechanism_min_sensitivity = 1e-10
+
+    def __init__(self, project: Project, identifier: str = None, checkpoint_directory: str = None,
+                 algorithm: str = GaudiSolver.algorithm, memory_limit: int = None,
+                 options: OptimizationOptions = None):
         self.project = project
 
-        self.problem = ComplianceProblem(CustomBoundaryConditions(self.project.domain.dimensions.width,  self.project.domain.dimensions.height, self.project.boundary_conditions),
-                                         self.project.penalization,
-                                         self.project.domain.material_properties.young,
-                                         self.project.domain.material_properties.poisson)
+        if options is None:
+            options = OptimizationOptions()
+
+        # Checkpoints keep the linear solver and precision the optimization
+        # started with
+        if options.linear_solver is None or options.mixed_precision is None:
+            options = copy.copy(options)
+
+            if options.linear_solver is None:
+                options.linear_solver = self.linear_solver
+
+            if options.mixed_precision is None:
+                options.mixed_precision = self.mixed_precision
+
+        self.options = options
+        self.linear_solver = options.linear_solver
+        self.mixed_precision = options.mixed_precision
+
+        if self.linear_solver not in ('direct', 'iterative', 'reanalysis'):
+            raise ValueError(f'Unknown linear solver {self.linear_solver}')
+
+        # Adaptive optimizations analyse the design on a quadtree mesh that
+        # only keeps full resolution around material boundaries
+        self.adaptive = adaptive = options.adaptive
+        # With void_iterations > 0, elements that stay void that long are
+        # dropped from the finite element system until they gain material
+        self.void_iterations = void_iterations = options.void_iterations
+        # Robust optimizations design for the worst of an eroded, the
+        # intermediate and a dilated version of the design. They project the
+        # filtered densities themselves, so only the others are projected
+        # onto crisp designs with a sharpening projection
+        self.robust = robust = options.robust
+        self.projection = options.projection and not robust
+        # Continuations start at a penalty of 1, where the problem is convex,
+        # and raise it towards the project's penalization stage by stage
+        self.continuation = continuation = options.continuation
+
+        if adaptive and (project.excitation is not None or project.mechanism is not None):
+            raise ValueError('The adaptive mesh only analyses the compliance of static loads')
+
+        conditions = self.project.boundary_conditions
+
+        # The ports of a mechanism are its two load cases, the input force
+        # and the load whose displacements are the output's adjoint
+        if project.mechanism is not None:
+            conditions = BoundaryConditions(conditions.supports, project.mechanism.loads(),
+                                            conditions.constant_regions)
+
+        boundary_conditions = CustomBoundaryConditions(self.project.domain.dimensions.width,
+                                                       self.project.domain.dimensions.height,
+                                                       conditions, project.random_loads)
+
+        # Mirror symmetric projects are solved on the part below their mirror
+        # lines, a half or a quarter of the grid. The element mass of
+        # harmonic loads scales with the grid and the springs of mechanisms
+        # are not split on the mirror lines, so those are solved whole
+        if options.symmetry and project.excitation is None and project.mechanism is None:
+            self.symmetry = boundary_conditions.symmetry()
+        else:
+            self.symmetry = Symmetry(boundary_conditions.nelx, boundary_conditions.nely)
+
+        if self.symmetry.reduced:
+            boundary_conditions = MirroredBoundaryConditions(boundary_conditions, self.symmetry)
+
+        if project.excitation is not None:
+            self.problem = HarmonicLoadsProblem(boundary_conditions,
+                                                self.project.penalization,
+                                                self.project.domain.material_properties.young,
+                                                self.project.domain.material_properties.poisson,
+                                                project.excitation.frequencies())
+        elif project.mechanism is not None:
+            self.problem = MechanismSynthesisProblem(boundary_conditions,
+                                                     self.project.penalization,
+                                                     self.project.domain.material_properties.young,
+                                                     self.project.domain.material_properties.poisson,
+                                                     (project.mechanism.input_stiffness,
+                                                      project.mechanism.output_stiffness))
+        elif adaptive:
+            self.problem = AdaptiveComplianceProblem(boundary_conditions,
+                                                     self.project.penalization,
+                                                     self.project.domain.material_properties.young,
+                                                     self.project.domain.material_properties.poisson)
+        else:
+            self.problem = ComplianceProblem(boundary_conditions,
+                                             self.project.penalization,
+                                             self.project.domain.material_properties.young,
+                                             self.project.domain.material_properties.poisson,
+                                             void_iterations)
+
+        # The trust region solver multiplies by the Hessian of compliance with
+        # the factor of the last analysis, which needs a linear filter and the
+        # uniform grid
+        newton = algorithm == GaudiNewtonSolver.algorithm
+
+        if newton and (type(self.problem) is not ComplianceProblem or robust or self.projection):
+            raise ValueError('The newton algorithm only optimizes the compliance of the uniform grid '
+                             'with the density filter')
+
+        # A single factorization is mostly serial, so very large grids are
+        # split across the cores instead. The quadtree mesh is never split,
+        # its leaves would couple elements across the strip boundaries, and
+        # harmonic loads sweep their frequencies on their own factors
+        if project.excitation is not None:
+            pass
+        elif newton:
+            self.problem.linear_solver.keep_factor = True
+        elif self.linear_solver == 'iterative':
+            self.problem.linear_solver = IterativeSolver(boundary_conditions.nelx, boundary_conditions.nely)
+        elif self.linear_solver == 'reanalysis':
+            self.problem.linear_solver = ReanalysisSolver(boundary_conditions.nelx, boundary_conditions.nely)
+        elif adaptive:
+            pass
+        elif self.solver_processes > 1 and self.problem.ndof >= self.domain_decomposition_dofs:
+            self.problem.linear_solver = DomainDecompositionSolver(
+                boundary_conditions.nelx, boundary_conditions.nely, self.solver_processes)
+        elif robust and self.solver_processes > 1:
+            # The three designs of a robust optimization factorize at once
+            self.problem.linear_solver = ParallelCholmodSolver(min(3, self.solver_processes))
 
         self.gui = GaudiMockedGUI(self.problem, None)
 
-        self.topopt_filter = DensityBasedFilter(
-            self.project.domain.dimensions.width, self.project.domain.dimensions.height, project.filter_radius)
+        self.topopt_filter = DensityBasedFilter(boundary_conditions.nelx, boundary_conditions.nely,
+                                                project.filter_radius, self.symmetry.mirror_x,
+                                                self.symmetry.mirror_y)
+
+        if self.projection:
+            self.topopt_filter = ProjectionFilter(self.topopt_filter)
+
+        # Only the direct solver refines with the factor it already has, the
+        # quadtree mesh, harmonic loads, the batched solves of robust
+        # optimizations, the trust region solver and the other solvers keep K
+        # in double precision
+        if self.mixed_precision and not newton:
+            self.topopt_filter.set_precision(numpy.float32)
 
-        self.solver = GaudiSolver(
+            if type(self.problem) is ComplianceProblem and type(self.problem.linear_solver) is CholmodSolver \
+                    and not robust:
+                self.problem.set_precision(numpy.float32)
+
+        # MMA and the plain optimality criteria both fall into the trivial
+        # mechanism that disconnects the output, mechanisms are optimized
+        # with the damped update and small move limits of compliant
+        # mechanism design, never letting elements vanish for good
+        if project.mechanism is not None:
+            algorithm = GaudiOCSolver.algorithm
+
+        self.solver = solvers[algorithm](
             self.problem, self.project.domain.volume_fraction, self.topopt_filter, self.gui)
 
-        self.identifier = hex(int(time.time() * 1000))[2:]
+        if project.mechanism is not None:
+            self.solver.move = self.mechanism_move
+            self.solver.damping = self.mechanism_damping
+            self.solver.min_density = self.mechanism_min_density
+            self.solver.min_sensitivity = self.mechanism_min_sensitivity
+        self.solver.symmetry = self.symmetry
+
+        if robust:
+            self.solver.set_robust()
+
+        # The quadtree mesh has no element stresses on the regular grid
+        self.stress_interval = options.stress_interval if not adaptive else None
+        self.solver.stress_interval = self.stress_interval
+
+        self.identifier = identifier if identifier is not None else new_identifier()
+
+        self.checkpoint_directory = checkpoint_directory
+        self.initial_x: numpy.ndarray = None
+        self.started = False
+
+        # Coarse grids solved first, each halving the resolution of the next,
+        # to settle the layout before the full grid is optimized
+        self.levels = min(options.levels, self.max_levels(project))
+        self.level_times = []
+
+        # The level being solved when the coarse grids are stepped, with the
+        # design and grid of the level before it
+        self.coarse: Optimization = None
+        self.coarse_level = self.levels
+        self.coarse_x: numpy.ndarray = None
+        self.coarse_dimensions: Dimensions = None
+        self.coarse_time = 0.0
+
+        # Only the coarsest level runs the penalty continuation, the finer
+        # ones start from its design at the final penalty
+        if continuation and self.levels == 0:
+            self.solver.set_penalty_continuation(self.project.penalization, step=self.continuation_step,
+                                                 ftol_rel=self.continuation_stage_ftol)
+
+        if self.checkpoint_directory is not None:
+            self.solver.checkpoint_interval = self.checkpoint_interval
+            self.solver.on_checkpoint = self.save_checkpoint
+            self.solver.on_finished = self.delete_checkpoint
+
+        if memory_limit is not None:
+            estimate = ResourceEstimator(self.estimator_solver(self.problem.linear_solver)).estimate(
+                project, self.options)
+
+            self.solver.memory_limit = memory_limit
+            self.solver.external_memory = estimate.factor_nonzeros * \
+                ResourceEstimator.factor_bytes
+
+    @staticmethod
+    def estimator_solver(linear_solver: LinearSolver) -> str:
+        # Calibration of the resource estimator for a linear solver, the
+        # other solvers all factorize the whole system
+        if isinstance(linear_solver, DomainDecompositionSolver):
+            return 'decomposition'
+        if isinstance(linear_solver, ReanalysisSolver):
+            return 'reanalysis'
+        if isinstance(linear_solver, IterativeSolver):
+            return 'iterative'
+
+        return 'cholmod'
+
+    @classmethod
+    def estimate_resources(cls, project: Project, options: OptimizationOptions = None) -> ResourceEstimate:
+        # Estimate before the optimization exists, with the linear solver
+        # the constructor picks for the project and options
+        if options is None:
+            options = OptimizationOptions()
+
+        linear_solver = options.linear_solver if options.linear_solver is not None else cls.linear_solver
+
+        dimensions = project.domain.dimensions
+        dofs = 2 * (dimensions.width + 1) * (dimensions.height + 1)
+
+        if project.excitation is not None:
+            solver = 'cholmod'
+        elif linear_solver != 'direct':
+            solver = linear_solver
+        elif not options.adaptive and cls.solver_processes > 1 and dofs >= cls.domain_decomposition_dofs:
+            solver = 'decomposition'
+        else:
+            solver = 'cholmod'
+
+        return ResourceEstimator(solver).estimate(project, options)
+
+    @staticmethod
+    def from_checkpoint(checkpoint: Checkpoint, checkpoint_directory: str = None, algorithm: str = None,
+                        memory_limit: int = None):
+        if algorithm is None:
+            algorithm = checkpoint.optimizer_state.get(
+                'algorithm', GaudiSolver.algorithm)
+
+        optimization = Optimization(checkpoint.project, checkpoint.identifier, checkpoint_directory, algorithm,
+                                    memory_limit, checkpoint.options)
+
+        if optimization.projection:
+            optimization.topopt_filter.beta = checkpoint.optimizer_state.get(
+                'beta', optimization.topopt_filter.beta)
+
+        optimization.solver.restore(checkpoint)
+        optimization.initial_x = checkpoint.x.copy()
+
+        return optimization
+
+    @property
+    def finished(self) -> bool:
+        return self.solver.finished
+
+    @property
+    def size(self) -> int:
+        return self.project.domain.dimensions.width * self.project.domain.dimensions.height
 
     def get_result(self) -> Result:
         return self.solver.get_result()
 
+    def checkpoint(self) -> Checkpoint:
+        # Checkpoints hold the whole grid whatever part of it is solved
+        x = self.symmetry.expand(self.solver.x) if self.solver.x is not None else \
+            self.initial_design(self.project, self.robust)
+        obj = self.solver.last_result.obj if self.solver.last_result is not None else 0.0
+
+        state = self.solver.optimizer_state()
+
+        if self.projection:
+            state['beta'] = self.topopt_filter.beta
+
+        return Checkpoint(self.identifier,
+                          self.project,
+                          x,
+                          self.symmetry.expand(self.solver.xPhys).copy(),
+                          self.solver.iteration,
+                          obj,
+                          state,
+                          self.options)
+
+    def save_checkpoint(self) -> str:
+        return self.checkpoint().save(self.checkpoint_directory)
+
+    def delete_checkpoint(self) -> None:
+        # A completed optimization is never resumed
+        Checkpoint.delete(self.checkpoint_directory, self.identifier)
+
+    def pause(self) -> None:
+        self.solver.pause()
+
+    @staticmethod
+    def initial_design(project: Project, robust: bool = False) -> numpy.ndarray:
+        # A solid domain is already a stiff mechanism, moving the output with
+        # the input, and thinning it out only disconnects the output. So
+        # mechanisms start uniformly at the volume fraction instead, as do
+        # robust optimizations, whose projections are flat at full density
+        uniform = project.mechanism is not None or robust
+        fill_value = project.domain.volume_fraction if uniform else 1
+
+        return numpy.full(shape=project.domain.dimensions.width *
+                          project.domain.dimensions.height,
+                          fill_value=fill_value,
+                          dtype=float)
+
+    def start_design(self) -> numpy.ndarray:
+        if self.initial_x is None and self.levels > 0:
+            self.initial_x = self.coarse_design()
+
+        x = self.initial_x if self.initial_x is not None else self.initial_design(self.project, self.robust)
+
+        return self.symmetry.reduce(x)
+
+    @staticmethod
+    def max_levels(project: Project) -> int:
+        size = min(project.domain.dimensions.width,
+                   project.domain.dimensions.height)
+
+        return max(0, int(math.log2(size / Optimization.min_level_size)))
+
+    @staticmethod
+    def coarsen(project: Project, factor: int) -> Project:
+        fine = project.domain.dimensions
+        coarse = Dimensions(max(1, fine.width // factor),
+                            max(1, fine.height // factor))
+
+        domain = Domain(project.domain.material_properties,
+                        coarse, project.domain.volume_fraction)
+        boundary_conditions = CustomBoundaryConditions.coarsen(
+            project.boundary_conditions, fine, coarse)
+        # The radius shrinks with the grid, but coarse levels still need a
+        # filter wider than one element to stay free of checkerboards
+        filter_radius = max(1.5, project.filter_radius * coarse.width / fine.width)
+
+        mechanism = project.mechanism
+
+        if mechanism is not None:
+            ports = CustomBoundaryConditions.coarsen(
+                BoundaryConditions([], [mechanism.input, mechanism.output], []), fine, coarse).forces
+            mechanism = Mechanism(ports[0], ports[1], mechanism.input_stiffness, mechanism.output_stiffness)
+
+        random_loads = project.random_loads
+
+        if random_loads is not None:
+            points = [Force(1, 0, position) for position in random_loads.positions]
+            positions = [force.position for force in CustomBoundaryConditions.coarsen(
+                BoundaryConditions([], points, []), fine, coarse).forces]
+            random_loads = RandomLoads(positions, random_loads.mean, random_loads.covariance,
+                                       random_loads.samples, random_loads.rank)
+
+        return Project(domain, boundary_conditions, project.penalization, filter_radius, project.excitation,
+                       mechanism, random_loads)
+
+    @staticmethod
+    def prolongate(x: numpy.ndarray, coarse: Dimensions, fine: Dimensions) -> numpy.ndarray:
+        # Every fine element takes the density of the coarse element over it
+        columns = numpy.arange(fine.width) * coarse.width // fine.width
+        rows = numpy.arange(fine.height) * coarse.height // fine.height
+
+        return x.reshape(coarse.width, coarse.height)[numpy.ix_(columns, rows)].ravel()
+
+    def coarse_optimization(self, level: int, x: numpy.ndarray, dimensions: Dimensions) -> 'Optimization':
+        project = self.coarsen(self.project, 2 ** level)
+        options = OptimizationOptions(adaptive=self.adaptive, void_iterations=self.void_iterations,
+                                      robust=self.robust, continuation=self.continuation and x is None,
+                                      linear_solver=self.linear_solver, mixed_precision=self.mixed_precision)
+        optimization = Optimization(project, self.identifier, algorithm=self.solver.algorithm, options=options)
+        optimization.solver.pause_requested = self.solver.pause_requested
+
+        if x is not None:
+            optimization.initial_x = self.prolongate(
+                x, dimensions, project.domain.dimensions)
+            optimization.solver.ftol_rel *= self.continuation_ftol_scale
+
+        return optimization
+
+    def coarse_design(self) -> numpy.ndarray:
+        x, dimensions, result = None, None, None
+
+        for level in range(self.levels, 0, -1):
+            start = time.perf_counter()
+
+            optimization = self.coarse_optimization(level, x, dimensions)
+
+            x = optimization.symmetry.expand(
+                optimization.solver.optimize(optimization.start_design()))
+            dimensions = optimization.project.domain.dimensions
+            result = optimization.solver.last_result
+
+            self.level_times.append((dimensions.width, dimensions.height,
+                                     optimization.solver.iteration, time.perf_counter() - start))
+
+            if self.solver.pause_requested.is_set():
+                break
+
+        return self.publish_coarse_design(x, dimensions, result)
+
+    def step_coarse_design(self) -> None:
+        # One evaluation of the current coarse level, so the scheduler slices
+        # the coarse grids like the full one. The prolongated design of the
+        # finest level becomes the initial design
+        start = time.perf_counter()
+
+        if self.coarse is None:
+            self.coarse = self.coarse_optimization(self.coarse_level, self.coarse_x, self.coarse_dimensions)
+            self.coarse.solver.start(self.coarse.start_design())
+            self.coarse_time = 0.0
+
+        coarse = self.coarse
+        converged = coarse.solver.step()
+        self.coarse_time += time.perf_counter() - start
+
+        if not converged:
+            return
+
+        coarse.problem.linear_solver.close()
+
+        self.coarse = None
+        self.coarse_x = coarse.symmetry.expand(coarse.solver.x)
+        self.coarse_dimensions = coarse.project.domain.dimensions
+        self.coarse_level -= 1
+
+        self.level_times.append((self.coarse_dimensions.width, self.coarse_dimensions.height,
+                                 coarse.solver.iteration, self.coarse_time))
+
+        if self.coarse_level == 0:
+            self.initial_x = self.publish_coarse_design(self.coarse_x, self.coarse_dimensions,
+                                                        coarse.solver.last_result)
+
+    def publish_coarse_design(self, x: numpy.ndarray, dimensions: Dimensions, result: Result) -> numpy.ndarray:
+        x = self.prolongate(x, dimensions, self.project.domain.dimensions)
+
+        self.solver.ftol_rel *= self.continuation_ftol_scale
+        self.solver.x = self.symmetry.reduce(x).copy()
+
+        # Publish the prolongated design as progress of this optimization,
+        # unless a pause came before the first coarse evaluation
+        if result is not None:
+            self.solver.last_result = Result(x, x.sum(), result.obj)
+            self.solver.results.put(self.solver.last_result)
+
+        return x
+
+    def step(self) -> bool:
+        try:
+            if not self.started:
+                if self.initial_x is None and self.levels > 0:
+                    self.step_coarse_design()
+                    return False
+
+                self.solver.start(self.start_design())
+                self.started = True
+
+            converged = self.solver.step()
+
+            if converged:
+                self.solver.finish(self.solver.x)
+        except MemoryError as error:
+            self.fail(str(error) or 'Memória insuficiente para a otimização')
+            return True
+        except Exception:
+            logging.exception(f'Optimization {self.identifier} failed')
+            self.fail('Erro inesperado durante a otimização')
+            return True
+
+        if converged:
+            self.problem.linear_solver.close()
+
+        return converged
+
     def optimize(self):
-        x = numpy.full(shape=self.project.domain.dimensions.width *
-                       self.project.domain.dimensions.height,
-                       fill_value=1,
-                       dtype=float)
+        self.started = True
+
+        try:
+            self.solver.optimize(self.start_design())
+        except MemoryError as error:
+            self.solver.fail(str(error) or 'Memória insuficiente para a otimização')
+        except Exception:
+            logging.exception(f'Optimization {self.identifier} failed')
+            self.solver.fail('Erro inesperado durante a otimização')
+        finally:
+            # Worker processes are started again if the optimization resumes
+            self.problem.linear_solver.close()
+
+    def fail(self, error: str) -> None:
+        # Clients polling the optimization get a final result either way
+        self.solver.fail(error)
+        self.problem.linear_solver.close()
 
-        self.solver.optimize(x)
+        if self.coarse is not None:
+            self.coarse.problem.linear_solver.close()
@@ -0,0 +1,131 @@
+import math
+
+from dto import OptimizationOptions, Project, ResourceEstimate
+
+
+class ResourceEstimator:
+    """
+    Predict the size and cost of an optimization from the project alone,
+    before anything is allocated.
+
+    The fill of the Cholesky factor and the time per iteration are power laws
+    in the number of degrees of freedom, fitted per linear solver with
+    ``python benchmark.py resources --solver <solver> --calibrate``. For the
+    solvers that do not factorize the whole system, the factor stands for
+    what the solver keeps instead.
+    """
+
+    calibrations = {
+        'cholmod': {
+            'factor_coefficient': 9.72,
+            'factor_exponent': 1.195,
+            'time_coefficient': 3.11e-07,
+            'time_exponent': 1.271,
+        },
+        # Keeps a factor as large, solving with it until the design moved on
+        'reanalysis': {
+            'factor_coefficient': 9.72,
+            'factor_exponent': 1.195,
+            'time_coefficient': 8.42e-07,
+            'time_exponent': 1.148,
+        },
+        # The factor is the multigrid hierarchy, linear in the dofs
+        'iterative': {
+            'factor_coefficient': 37.5,
+            'factor_exponent': 1.007,
+            'time_coefficient': 7.53e-06,
+            'time_exponent': 1.001,
+        },
+        # The factors of the strip interiors and the dense interface, held by
+        # the worker processes. Fitted with four strips on a single core
+        'decomposition': {
+            'factor_coefficient': 8.67,
+            'factor_exponent': 1.19,
+            'time_coefficient': 0.00532,
+            'time_exponent': 0.5474,
+        },
+    }
+
+    # Bytes held per stored entry of the structures a job allocates
+    triplet_bytes = 3 * 8
+    sparse_bytes = 8 + 4
+    cvxopt_bytes = 8 + 8
+    factor_bytes = 8 + 4
+    # Interpreter, modules and the per-job objects that do not scale
+    base_bytes = 8e6
+
+    def __init__(self, solver: str = 'cholmod') -> None:
+        if solver not in self.calibrations:
+            raise ValueError(f'No calibration for linear solver {solver}')
+
+        self.solver = solver
+        self.calibration = self.calibrations[solver]
+
+    @staticmethod
+    def window(n: int, radius: float) -> int:
+        # Number of (element, neighbour) pairs along one axis of the filter
+        # stencil, clipped at the domain boundary as in Filter.__init__
+        reach = math.ceil(radius)
+
+        return sum(min(i + reach, n) - max(i - reach + 1, 0) for i in range(n))
+
+    def estimate(self, project: Project, options: OptimizationOptions = None) -> ResourceEstimate:
+        if options is None:
+            options = OptimizationOptions()
+
+        nelx = project.domain.dimensions.width
+        nely = project.domain.dimensions.height
+        if project.mechanism is not None:
+            nloads = len(project.mechanism.loads())
+        else:
+            nloads = len(project.boundary_conditions.forces)
+
+            if project.random_loads is not None:
+                nloads += project.random_loads.load_cases().shape[1]
+
+            nloads = max(1, nloads)
+
+        nel = nelx * nely
+        dofs = 2 * (nelx + 1) * (nely + 1)
+
+        # Every node couples with itself and up to 8 neighbours, 2x2 dofs each
+        stiffness_nonzeros = 4 * (3 * (nelx + 1) - 2) * (3 * (nely + 1) - 2)
+        factor_nonzeros = int(self.calibration['factor_coefficient'] *
+                              dofs ** self.calibration['factor_exponent'])
+        filter_nonzeros = self.window(nelx, project.filter_radius) * \
+            self.window(nely, project.filter_radius)
+        iteration_time = self.calibration['time_coefficient'] * \
+            dofs ** self.calibration['time_exponent']
+
+        # Robust optimizations analyse an eroded, the intermediate and a
+        # dilated design every iteration, each with its own K and factor
+        designs = 3 if options.robust else 1
+        # Harmonic loads keep the displacements of every sampled frequency
+        frequencies = project.excitation.frequencies().size if project.excitation is not None else 1
+
+        memory = (self.base_bytes
+                  # element dof map and the stiffness triplets
+                  + 8 * 8 * nel + 64 * nel * self.triplet_bytes
+                  # assembled, reduced and cvxopt copies of K
+                  + designs * stiffness_nonzeros * (3 * self.sparse_bytes + self.cvxopt_bytes)
+                  + designs * factor_nonzeros * self.factor_bytes
+                  # filter triplets during assembly and the csc matrix
+                  + filter_nonzeros * (self.triplet_bytes + 2 * self.sparse_bytes)
+                  # displacements, the right-hand side and the gathered
+                  # element displacements of the sensitivity kernel
+                  + designs * (3 * 8 * dofs * frequencies * nloads + 2 * 64 * nel * nloads))
+
+        if project.excitation is not None:
+            # The element mass triplets and the assembled and reduced mass
+            # matrix, of the sparsity of K
+            memory += 64 * nel * self.triplet_bytes + stiffness_nonzeros * 2 * self.sparse_bytes
+
+        if options.adaptive:
+            # The quadtree is estimated at full resolution, with the hanging
+            # node constraints and the leaf averaging on top
+            memory += (2 * dofs + 2 * nel) * self.sparse_bytes
+
+        iteration_time *= designs
+
+        return ResourceEstimate(dofs, stiffness_nonzeros, designs * factor_nonzeros,
+                                filter_nonzeros, iteration_time, int(memory))
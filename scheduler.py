@@ -0,0 +1,144 @@
+import heapq
+import itertools
+import logging
+from enum import Enum
+from threading import Condition, Thread
+
+from models import Optimization
+
+
+class SchedulingPolicy(Enum):
+    # Every ready job gets one iteration in turn
+    ROUND_ROBIN = 'roundRobin'
+    # Jobs are charged their grid size per iteration, so small jobs run many
+    # iterations for each iteration of a large one and finish first, while
+    # large jobs keep progressing
+    SHORTEST_JOB_FIRST = 'shortestJobFirst'
+    # Higher priority jobs always run first, round-robin within a priority
+    PRIORITY = 'priority'
+
+
+class ScheduledJob:
+    def __init__(self, optimization: Optimization, priority: int) -> None:
+        self.optimization = optimization
+        self.priority = priority
+        self.virtual_time = 0
+        self.running = False
+        self.cancelled = False
+
+
+class OptimizationScheduler:
+    """
+    Cooperative scheduler that advances many optimizations one iteration at a
+    time on a fixed pool of worker threads.
+    """
+
+    jobs: dict[str, ScheduledJob]
+
+    def __init__(self, workers: int, policy: SchedulingPolicy = SchedulingPolicy.ROUND_ROBIN) -> None:
+        self.policy = policy
+        self.jobs = {}
+        self.ready = []
+        self.sequence = itertools.count()
+        self.virtual_time = 0
+        self.condition = Condition()
+
+        # Called with the identifier of every job that finishes
+        self.on_finished = None
+
+        self.workers = [Thread(target=self.work, daemon=True)
+                        for _ in range(workers)]
+
+        for worker in self.workers:
+            worker.start()
+
+    def key(self, job: ScheduledJob) -> tuple:
+        if self.policy == SchedulingPolicy.SHORTEST_JOB_FIRST:
+            return (job.virtual_time,)
+
+        if self.policy == SchedulingPolicy.PRIORITY:
+            return (-job.priority,)
+
+        return ()
+
+    def enqueue(self, identifier: str, job: ScheduledJob) -> None:
+        heapq.heappush(
+            self.ready, (self.key(job), next(self.sequence), identifier))
+        self.condition.notify_all()
+
+    def submit(self, optimization: Optimization, priority: int = 0) -> None:
+        job = ScheduledJob(optimization, priority)
+
+        with self.condition:
+            # New jobs start at the current virtual time so they cannot
+            # monopolize the workers against jobs that already ran
+            job.virtual_time = self.virtual_time
+
+            self.jobs[optimization.identifier] = job
+            self.enqueue(optimization.identifier, job)
+
+    def remove(self, identifier: str) -> bool:
+        """
+        Remove a job from the scheduler, waiting for its current iteration to
+        complete.
+        """
+        with self.condition:
+            if identifier not in self.jobs:
+                return False
+
+            job = self.jobs.pop(identifier)
+            job.cancelled = True
+
+            while job.running:
+                self.condition.wait()
+
+        return True
+
+    def next_job(self) -> tuple:
+        with self.condition:
+            while True:
+                while len(self.ready) == 0:
+                    self.condition.wait()
+
+                _, _, identifier = heapq.heappop(self.ready)
+                job = self.jobs.get(identifier)
+
+                # Removed jobs are dropped lazily from the ready heap
+                if job is not None and not job.cancelled:
+                    job.running = True
+                    self.virtual_time = max(
+                        self.virtual_time, job.virtual_time)
+
+                    return identifier, job
+
+    def work(self) -> None:
+        while True:
+            identifier, job = self.next_job()
+
+            try:
+                finished = job.optimization.step()
+            except Exception:
+                logging.exception(f'Optimization {identifier} failed')
+                finished = True
+
+                if not job.optimization.finished:
+                    job.optimization.fail('Erro inesperado durante a otimização')
+
+            with self.condition:
+                job.running = False
+                job.virtual_time += job.optimization.size
+
+                if finished:
+                    if self.jobs.get(identifier) is job:
+                        self.jobs.pop(identifier)
+                elif not job.cancelled:
+                    self.enqueue(identifier, job)
+
+                self.condition.notify_all()
+
+            # Failed jobs release their admission slot like finished ones
+            if finished and self.on_finished is not None:
+                try:
+                    self.on_finished(identifier)
+                except Exception:
+                    logging.exception(f'Completion of optimization {identifier} failed')
@@ -1,40 +1,290 @@
-from models import Optimization
-from threading import Thread
-from dto import Project, Result
+import math
+import os
+import time
+from collections import deque
+from threading import RLock, Thread
+
+from models import Optimization, GaudiOCSolver, new_identifier
+from scheduler import OptimizationScheduler
+from typing import List
+from dto import OptimizationOptions, Project, Result, QueueResult, ResourceEstimate
+from checkpoints import Checkpoint
+
+
+class QueueFullError(Exception):
+    def __init__(self, retry_after: int) -> None:
+        super().__init__(f'Optimization queue is full, retry in {retry_after} seconds')
+        self.retry_after = retry_after
+
+
+class PendingOptimization:
+    def __init__(self, identifier: str, project: Project, priority: int, cost: float,
+                 checkpoint: Checkpoint = None, options: OptimizationOptions = None) -> None:
+        self.identifier = identifier
+        self.project = project
+        self.priority = priority
+        self.cost = cost
+        self.checkpoint = checkpoint
+        self.options = options if options is not None else OptimizationOptions()
 
 
 class OptimizationService():
     optimizations: dict[str, Optimization]
     threads: dict[str, Thread]
+    queues: dict[int, deque]
+    running: dict[str, float]
 
-    def __init__(self) -> None:
+    # Seconds suggested to rejected clients before any job has completed
+    default_retry_after = 30
+
+    def __init__(self, checkpoint_directory: str = None, scheduler: OptimizationScheduler = None,
+                 max_running_jobs: int = 4, max_queued_jobs: int = 32, max_running_cost: float = 4e9,
+                 job_memory_limit: float = 2e9) -> None:
         self.optimizations = {}
         self.threads = {}
 
-    def start_optimization(self, project: Project) -> str:
-        optimization = Optimization(project)
+        if checkpoint_directory is None:
+            checkpoint_directory = os.environ.get(
+                'GAUDI_CHECKPOINT_DIR', 'checkpoints')
+
+        self.checkpoint_directory = checkpoint_directory
+
+        # Without a scheduler every optimization runs in its own thread,
+        # with one they are time-sliced on the scheduler's worker pool
+        self.scheduler = scheduler
+
+        if self.scheduler is not None:
+            self.scheduler.on_finished = self.complete
+
+        # Admission control: jobs start while both the number of running jobs
+        # and their summed estimated memory stay within the limits, the rest
+        # wait in one FIFO queue per priority
+        self.job_memory_limit = job_memory_limit
+        self.max_running_jobs = max_running_jobs
+        self.max_queued_jobs = max_queued_jobs
+        self.max_running_cost = max_running_cost
+
+        self.queues = {}
+        self.running = {}
+        self.started_at = {}
+        self.average_duration = None
+        self.lock = RLock()
+
+    def estimate(self, project: Project, options: OptimizationOptions = None) -> ResourceEstimate:
+        return Optimization.estimate_resources(project, options)
+
+    def cost(self, project: Project, options: OptimizationOptions = None) -> float:
+        return self.estimate(project, options).memory
+
+    def validate_estimate(self, estimate: ResourceEstimate, validations: List[str]) -> None:
+        if estimate.memory > self.job_memory_limit:
+            validations.append(
+                f'O projeto excede o limite de memória por otimização: estimado {estimate.memory / 1e6:.0f} MB, '
+                f'limite {self.job_memory_limit / 1e6:.0f} MB')
+
+    def start_optimization(self, project: Project, priority: int = 0, options: OptimizationOptions = None) -> str:
+        pending = PendingOptimization(new_identifier(), project, priority, self.cost(project, options),
+                                      options=options)
+
+        self.admit(pending)
+
+        return pending.identifier
+
+    def admit(self, pending: PendingOptimization) -> None:
+        with self.lock:
+            if self.queued_count() == 0 and self.can_start(pending.cost):
+                self.start(pending)
+                return
+
+            if self.queued_count() >= self.max_queued_jobs:
+                raise QueueFullError(self.retry_after())
+
+            self.queues.setdefault(pending.priority, deque()).append(pending)
+
+    def queued_count(self) -> int:
+        return sum(len(queue) for queue in self.queues.values())
+
+    def can_start(self, cost: float) -> bool:
+        if len(self.running) >= self.max_running_jobs:
+            return False
+
+        # A job larger than the whole budget may still run on its own
+        return len(self.running) == 0 or sum(self.running.values()) + cost <= self.max_running_cost
+
+    def retry_after(self) -> int:
+        if self.average_duration is None:
+            return self.default_retry_after
+
+        waves = (self.queued_count() + 1) / max(1, self.max_running_jobs)
+
+        return max(1, math.ceil(self.average_duration * waves))
+
+    def queue_position(self, identifier: str) -> int:
+        position = 1
+
+        for priority in sorted(self.queues, reverse=True):
+            for pending in self.queues[priority]:
+                if pending.identifier == identifier:
+                    return position
+
+                position += 1
+
+        return None
+
+    def start(self, pending: PendingOptimization) -> None:
+        if pending.checkpoint is not None:
+            # Only the optimality criteria solver can be stepped by the scheduler
+            algorithm = GaudiOCSolver.algorithm if self.scheduler is not None else None
+
+            optimization = Optimization.from_checkpoint(
+                pending.checkpoint, self.checkpoint_directory, algorithm, self.job_memory_limit)
+        elif self.scheduler is not None:
+            optimization = Optimization(pending.project, pending.identifier, self.checkpoint_directory,
+                                        GaudiOCSolver.algorithm, self.job_memory_limit, pending.options)
+        else:
+            optimization = Optimization(pending.project, pending.identifier, self.checkpoint_directory,
+                                        memory_limit=self.job_memory_limit, options=pending.options)
 
         self.optimizations[optimization.identifier] = optimization
+        self.running[optimization.identifier] = pending.cost
+        self.started_at[optimization.identifier] = time.time()
+
+        if self.scheduler is not None:
+            self.scheduler.submit(optimization, pending.priority)
+            return
 
-        thread = Thread(target=optimization.optimize)
+        thread = Thread(target=self.execute, args=(optimization,))
         thread.start()
 
         self.threads[optimization.identifier] = thread
 
-        return optimization.identifier
+    def execute(self, optimization: Optimization) -> None:
+        try:
+            optimization.optimize()
+        finally:
+            self.complete(optimization.identifier)
+
+    def complete(self, identifier: str) -> None:
+        with self.lock:
+            if identifier not in self.running:
+                return
+
+            self.running.pop(identifier)
+            duration = time.time() - self.started_at.pop(identifier)
+
+            if self.average_duration is None:
+                self.average_duration = duration
+            else:
+                self.average_duration = 0.8 * self.average_duration + 0.2 * duration
+
+            self.dispatch()
+
+    def dispatch(self) -> None:
+        for priority in sorted(self.queues, reverse=True):
+            queue = self.queues[priority]
+
+            while len(queue) > 0 and self.can_start(queue[0].cost):
+                self.start(queue.popleft())
+
+            # Lower priorities never overtake a blocked higher priority job
+            if len(queue) > 0:
+                return
+
+    def dequeue(self, identifier: str) -> PendingOptimization:
+        with self.lock:
+            for queue in self.queues.values():
+                for pending in queue:
+                    if pending.identifier == identifier:
+                        queue.remove(pending)
+                        return pending
+
+        return None
+
+    def is_running(self, identifier: str) -> bool:
+        if self.scheduler is not None:
+            return identifier in self.scheduler.jobs
+
+        return identifier in self.threads and self.threads[identifier].is_alive()
+
+    def stop(self, identifier: str) -> None:
+        if self.scheduler is not None:
+            self.scheduler.remove(identifier)
+        elif identifier in self.threads:
+            self.threads.pop(identifier).join()
+
+        self.complete(identifier)
 
     def get_result(self, identifier: str) -> Result:
         result = None
 
-        if identifier in self.optimizations:
+        with self.lock:
+            position = self.queue_position(identifier)
+
+        if position is not None:
+            result = QueueResult(position)
+        elif identifier in self.optimizations:
             result = self.optimizations[identifier].get_result()
 
         return result
 
+    def pause_optimization(self, identifier: str) -> bool:
+        pending = self.dequeue(identifier)
+
+        if pending is not None:
+            if pending.checkpoint is None:
+                x = Optimization.initial_design(pending.project, pending.options.robust)
+
+                pending.checkpoint = Checkpoint(
+                    identifier, pending.project, x, x.copy(), 0, 0.0, options=pending.options)
+
+            pending.checkpoint.save(self.checkpoint_directory)
+
+            return True
+
+        if identifier not in self.optimizations:
+            return False
+
+        optimization = self.optimizations[identifier]
+
+        if self.scheduler is None:
+            optimization.pause()
+
+        self.stop(identifier)
+
+        if not optimization.finished:
+            optimization.save_checkpoint()
+
+        return True
+
+    def resume_optimization(self, identifier: str, priority: int = 0) -> bool:
+        # The check and the admission share the lock, so two resumes of one
+        # optimization never both admit it
+        with self.lock:
+            if self.is_running(identifier) or self.queue_position(identifier) is not None:
+                return True
+
+            # Completed optimizations delete their checkpoint, and no finished
+            # one starts over from a checkpoint saved before it ended
+            if identifier in self.optimizations and self.optimizations[identifier].finished:
+                return False
+
+            if not Checkpoint.exists(self.checkpoint_directory, identifier):
+                return False
+
+            checkpoint = Checkpoint.load(self.checkpoint_directory, identifier)
+
+            self.admit(PendingOptimization(identifier, checkpoint.project, priority,
+                                           self.cost(checkpoint.project, checkpoint.options), checkpoint,
+                                           checkpoint.options))
+
+        return True
+
     def end_optimization(self, identifier: str) -> None:
+        self.dequeue(identifier)
+
         if identifier in self.optimizations:
             self.optimizations.pop(identifier)
 
-            thread = self.threads[identifier]
+            self.stop(identifier)
 
-            thread.join()
+        Checkpoint.delete(self.checkpoint_directory, identifier)
@@ -0,0 +1,53 @@
+"""
+Small projects shared by the tests.
+"""
+from dto import Project
+
+
+def beam(random_loads: dict = None, width: int = 30, height: int = 10) -> Project:
+    # The MBB beam: the left side of the half beam slides along its mirror
+    # line, the bottom right corner is held vertically and the load pushes
+    # down at the top left
+    json = {'domain': {'materialProperties': {'poisson': 0.3, 'young': 1},
+                       'dimensions': {'width': width, 'height': height}, 'volumeFraction': 0.4},
+            'boundaryConditions': {'supports': [{'position': {'x': 0, 'y': 0}, 'type': 0,
+                                                 'dimensions': {'width': 1, 'height': height}, 'direction': 0},
+                                                {'position': {'x': width, 'y': height}, 'type': 0,
+                                                 'direction': 1}],
+                                   'forces': [{'load': -1, 'orientation': 1, 'position': {'x': 0, 'y': 0}}]},
+            'penalization': 3, 'filterRadius': 1.5}
+
+    if random_loads is not None:
+        json['randomLoads'] = random_loads
+
+    return Project.from_json(json)
+
+
+def full_beam(width: int = 40, height: int = 10) -> Project:
+    # Both halves of the MBB beam, symmetric about the vertical middle line
+    json = {'domain': {'materialProperties': {'poisson': 0.3, 'young': 1},
+                       'dimensions': {'width': width, 'height': height}, 'volumeFraction': 0.4},
+            'boundaryConditions': {'supports': [{'position': {'x': 0, 'y': height}, 'type': 1, 'direction': 0},
+                                                {'position': {'x': width, 'y': height}, 'type': 1, 'direction': 0}],
+                                   'forces': [{'load': -1, 'orientation': 1, 'position': {'x': width // 2, 'y': 0}}]},
+            'penalization': 3, 'filterRadius': 1.5}
+
+    return Project.from_json(json)
+
+
+def pinched_plate(size: int = 20) -> Project:
+    # A plate clamped on both sides and pinched in the middle by two load
+    # cases. Each case maps onto the other across the horizontal middle line,
+    # so only the vertical one is a symmetry
+    json = {'domain': {'materialProperties': {'poisson': 0.3, 'young': 1},
+                       'dimensions': {'width': size, 'height': size}, 'volumeFraction': 0.3},
+            'boundaryConditions': {'supports': [{'position': {'x': 0, 'y': 0}, 'type': 1, 'direction': 0,
+                                                 'dimensions': {'width': 1, 'height': size}},
+                                                {'position': {'x': size, 'y': 0}, 'type': 1, 'direction': 0,
+                                                 'dimensions': {'width': 1, 'height': size}}],
+                                   'forces': [{'load': 1, 'orientation': 1, 'position': {'x': size // 2, 'y': 0}},
+                                              {'load': -1, 'orientation': 1,
+                                               'position': {'x': size // 2, 'y': size}}]},
+            'penalization': 3, 'filterRadius': 1.5}
+
+    return Project.from_json(json)
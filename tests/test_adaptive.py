@@ -0,0 +1,81 @@
+"""
+Check the compliance analysed on the adaptive quadtree mesh.
+
+    python -m unittest discover tests
+"""
+import unittest
+
+import numpy
+
+from dto import Excitation, OptimizationOptions
+from models import Optimization
+from topopt.boundary_conditions import MBBBeamBoundaryConditions
+from topopt.linear_solvers import IterativeSolver
+from topopt.problems import AdaptiveComplianceProblem, ComplianceProblem
+
+from tests.projects import beam
+
+
+class AdaptiveComplianceTest(unittest.TestCase):
+    def setUp(self) -> None:
+        self.bc = MBBBeamBoundaryConditions(32, 16)
+        self.rng = numpy.random.default_rng(0)
+
+    def test_unit_leaves(self) -> None:
+        # Without merged leaves the mesh is the uniform grid
+        uniform = ComplianceProblem(self.bc, 3.0)
+        adaptive = AdaptiveComplianceProblem(self.bc, 3.0, max_level=0)
+        x = self.rng.uniform(0.1, 1, uniform.nel)
+
+        dobj, adaptive_dobj = numpy.empty(x.size), numpy.empty(x.size)
+        obj = uniform.compute_objective(x, dobj)
+
+        self.assertAlmostEqual(adaptive.compute_objective(x, adaptive_dobj), obj, delta=1e-9 * obj)
+        numpy.testing.assert_allclose(adaptive_dobj, dobj, rtol=1e-8)
+
+    def test_mesh_kept(self) -> None:
+        problem = AdaptiveComplianceProblem(self.bc, 3.0)
+        x = numpy.where(numpy.arange(problem.nel) < problem.nel // 2, 1.0, 1e-3)
+
+        problem.compute_objective(x, numpy.empty(x.size))
+        mesh = problem.mesh
+        self.assertLess(mesh.nleaves, problem.nel)
+
+        problem.compute_objective(x, numpy.empty(x.size))
+        self.assertIs(problem.mesh, mesh)
+
+        problem.compute_objective(numpy.full(x.size, 0.5), numpy.empty(x.size))
+        self.assertIsNot(problem.mesh, mesh)
+
+    def test_linear_solver(self) -> None:
+        direct = AdaptiveComplianceProblem(self.bc, 3.0)
+        iterative = AdaptiveComplianceProblem(self.bc, 3.0)
+        iterative.linear_solver = IterativeSolver(self.bc.nelx, self.bc.nely)
+        iterative.linear_solver.tolerance = 1e-10
+        x = numpy.where(numpy.arange(direct.nel) < direct.nel // 2, 1.0, 0.3)
+
+        obj = direct.compute_objective(x, numpy.empty(x.size))
+
+        self.assertAlmostEqual(iterative.compute_objective(x, numpy.empty(x.size)), obj, delta=1e-6 * obj)
+        self.assertGreater(iterative.linear_solver.iterations, 0)
+
+    def test_unsupported_options(self) -> None:
+        options = OptimizationOptions(adaptive=True, stress_interval=0, void_iterations=2)
+        validations = []
+        options.validate(beam(), validations)
+
+        self.assertEqual(len(validations), 2)
+
+        project = beam()
+        project.excitation = Excitation.from_json({'frequency': 0.1})
+        validations = []
+        OptimizationOptions(adaptive=True).validate(project, validations)
+
+        self.assertEqual(len(validations), 1)
+
+        with self.assertRaises(ValueError):
+            Optimization(project, options=OptimizationOptions(adaptive=True))
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,99 @@
+"""
+Check the admission of optimizations into the bounded job queue.
+
+    python -m unittest discover tests
+"""
+import tempfile
+import unittest
+from unittest import mock
+
+import app
+from dto import OptimizationOptions
+from scheduler import OptimizationScheduler
+from services import OptimizationService, QueueFullError
+
+from tests.projects import beam
+
+
+class AdmissionTest(unittest.TestCase):
+    def setUp(self) -> None:
+        self.directory = tempfile.TemporaryDirectory()
+        # Without workers the admitted jobs are never stepped
+        self.service = OptimizationService(self.directory.name, OptimizationScheduler(0), max_running_jobs=1,
+                                           max_queued_jobs=2)
+
+    def tearDown(self) -> None:
+        self.directory.cleanup()
+
+    def test_queue_positions(self) -> None:
+        running = self.service.start_optimization(beam())
+        low = self.service.start_optimization(beam())
+        high = self.service.start_optimization(beam(), priority=1)
+
+        self.assertTrue(self.service.is_running(running))
+        self.assertEqual(self.service.queue_position(high), 1)
+        self.assertEqual(self.service.queue_position(low), 2)
+        self.assertEqual(self.service.get_result(low).serialize()['queuePosition'], 2)
+
+        # Completed jobs hand their slot to the highest priority
+        self.service.stop(running)
+
+        self.assertTrue(self.service.is_running(high))
+        self.assertEqual(self.service.queue_position(low), 1)
+
+    def test_full_queue(self) -> None:
+        for _ in range(3):
+            self.service.start_optimization(beam())
+
+        with self.assertRaises(QueueFullError) as context:
+            self.service.start_optimization(beam())
+
+        self.assertEqual(context.exception.retry_after, OptimizationService.default_retry_after)
+
+    def test_cost(self) -> None:
+        # The budget fits one plain job, robust jobs cost three systems
+        plain = self.service.cost(beam())
+        robust = self.service.cost(beam(), OptimizationOptions(robust=True))
+        self.assertGreater(robust, plain)
+
+        self.service.max_running_jobs = 4
+        self.service.max_running_cost = 1.5 * plain
+
+        self.service.start_optimization(beam())
+        queued = self.service.start_optimization(beam(), options=OptimizationOptions(robust=True))
+
+        self.assertEqual(self.service.queue_position(queued), 1)
+        self.assertEqual(self.service.queues[0][0].cost, robust)
+
+    def test_resume(self) -> None:
+        running = self.service.start_optimization(beam())
+        paused = self.service.start_optimization(beam(), options=OptimizationOptions(robust=True))
+
+        self.assertTrue(self.service.pause_optimization(paused))
+        self.assertIsNone(self.service.queue_position(paused))
+
+        # Resuming twice admits the optimization once, at the cost of its options
+        self.assertTrue(self.service.resume_optimization(paused))
+        self.assertTrue(self.service.resume_optimization(paused))
+
+        self.assertEqual(self.service.queued_count(), 1)
+        self.assertEqual(self.service.queues[0][0].cost, self.service.cost(beam(), OptimizationOptions(robust=True)))
+        self.assertTrue(self.service.queues[0][0].options.robust)
+        self.assertTrue(self.service.is_running(running))
+
+    def test_too_many_requests(self) -> None:
+        client = app.app.test_client()
+        project = {'project': beam().to_json()}
+
+        with mock.patch.object(app, 'service', self.service):
+            for _ in range(3):
+                self.assertEqual(client.post('/optimize', json=project).status_code, 200)
+
+            response = client.post('/optimize', json=project)
+
+        self.assertEqual(response.status_code, 429)
+        self.assertEqual(response.headers['Retry-After'], str(OptimizationService.default_retry_after))
+
+
+if __name__ == '__main__':
+    unittest.main()
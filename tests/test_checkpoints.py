@@ -0,0 +1,102 @@
+"""
+Check that checkpoints round trip and that paused optimizations resume.
+
+    python -m unittest discover tests
+"""
+import tempfile
+import unittest
+
+import numpy
+
+from checkpoints import Checkpoint
+from dto import OptimizationOptions
+from models import GaudiOCSolver, Optimization
+from scheduler import OptimizationScheduler
+from services import OptimizationService
+
+from tests.projects import beam
+
+
+def stepped(optimization: Optimization, iterations: int) -> Optimization:
+    for _ in range(iterations):
+        optimization.step()
+
+    return optimization
+
+
+class CheckpointTest(unittest.TestCase):
+    def setUp(self) -> None:
+        self.directory = tempfile.TemporaryDirectory()
+
+    def tearDown(self) -> None:
+        self.directory.cleanup()
+
+    def test_round_trip(self) -> None:
+        options = OptimizationOptions(levels=1, void_iterations=3, stress_interval=5, continuation=True,
+                                      linear_solver='iterative')
+        x = numpy.linspace(0, 1, 300)
+        Checkpoint('1a2b', beam(), x, x ** 2, 7, 12.5, {'algorithm': 'oc', 'move': 0.1}, options) \
+            .save(self.directory.name)
+
+        checkpoint = Checkpoint.load(self.directory.name, '1a2b')
+
+        numpy.testing.assert_array_equal(checkpoint.x, x)
+        numpy.testing.assert_array_equal(checkpoint.xPhys, x ** 2)
+        self.assertEqual((checkpoint.iteration, checkpoint.obj), (7, 12.5))
+        self.assertEqual(checkpoint.optimizer_state, {'algorithm': 'oc', 'move': 0.1})
+        self.assertEqual(checkpoint.project.to_json(), beam().to_json())
+        self.assertEqual(checkpoint.options.to_json(), options.to_json())
+
+    def test_identifiers(self) -> None:
+        for identifier in ('', '.', '..', '../checkpoint', 'a/b'):
+            with self.assertRaises(ValueError):
+                Checkpoint.path(self.directory.name, identifier)
+
+    def test_resume(self) -> None:
+        # The optimality criteria state is explicit, so a resumed run
+        # reproduces the uninterrupted one
+        options = OptimizationOptions(continuation=True)
+        uninterrupted = stepped(Optimization(beam(), algorithm=GaudiOCSolver.algorithm, options=options), 12)
+
+        paused = stepped(Optimization(beam(), '1a2b', self.directory.name, GaudiOCSolver.algorithm,
+                                      options=options), 6)
+        paused.save_checkpoint()
+
+        checkpoint = Checkpoint.load(self.directory.name, '1a2b')
+        resumed = stepped(Optimization.from_checkpoint(checkpoint, self.directory.name), 6)
+
+        self.assertTrue(resumed.continuation)
+        self.assertEqual(resumed.solver.iteration, uninterrupted.solver.iteration)
+        numpy.testing.assert_allclose(resumed.solver.xPhys, uninterrupted.solver.xPhys, rtol=1e-10)
+        self.assertAlmostEqual(resumed.solver.last_result.obj, uninterrupted.solver.last_result.obj, places=8)
+
+    def test_pause_queued(self) -> None:
+        # Optimizations paused before they started resume with their options
+        service = OptimizationService(self.directory.name, OptimizationScheduler(0), max_running_jobs=1)
+        service.start_optimization(beam())
+        queued = service.start_optimization(beam(), options=OptimizationOptions(robust=True))
+
+        self.assertTrue(service.pause_optimization(queued))
+        self.assertTrue(Checkpoint.exists(self.directory.name, queued))
+
+        checkpoint = Checkpoint.load(self.directory.name, queued)
+        self.assertEqual(checkpoint.iteration, 0)
+        self.assertTrue(checkpoint.options.robust)
+
+        self.assertTrue(service.resume_optimization(queued))
+        self.assertEqual(service.queue_position(queued), 1)
+
+    def test_finished(self) -> None:
+        # Completed optimizations delete their checkpoint
+        optimization = Optimization(beam(), '1a2b', self.directory.name, GaudiOCSolver.algorithm)
+        optimization.solver.maxeval = optimization.solver.total_maxeval = 3
+        stepped(optimization, 1).save_checkpoint()
+
+        while not optimization.step():
+            pass
+
+        self.assertFalse(Checkpoint.exists(self.directory.name, '1a2b'))
+
+
+if __name__ == '__main__':
+    unittest.main()
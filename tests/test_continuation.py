@@ -0,0 +1,91 @@
+"""
+Check the stages of the SIMP penalty continuation.
+
+    python -m unittest discover tests
+"""
+import tempfile
+import unittest
+
+import numpy
+
+from dto import OptimizationOptions
+from models import GaudiOCSolver, GaudiSolver, Optimization
+
+from tests.projects import beam
+
+
+def last_result(optimization: Optimization):
+    results = optimization.solver.results
+    result = results.get()
+
+    while not results.empty():
+        result = results.get()
+
+    return result
+
+
+class ContinuationTest(unittest.TestCase):
+    def test_stages(self) -> None:
+        optimization = Optimization(beam(), options=OptimizationOptions(continuation=True))
+        solver, problem = optimization.solver, optimization.problem
+        final_ftol_rel = solver.final_ftol_rel
+
+        # The stages before the last converge to a looser tolerance
+        self.assertEqual((problem.penalty, solver.penalties), (1, [2, 3]))
+        self.assertEqual(solver.ftol_rel, Optimization.continuation_stage_ftol)
+
+        self.assertTrue(solver.next_stage())
+        self.assertEqual((problem.penalty, solver.ftol_rel), (2, Optimization.continuation_stage_ftol))
+
+        self.assertTrue(solver.next_stage())
+        self.assertEqual((problem.penalty, solver.ftol_rel), (3, final_ftol_rel))
+
+        # The density filter does not sharpen, so the last stage ends it
+        self.assertFalse(solver.next_stage())
+        self.assertEqual(len(solver.stage_starts), 3)
+
+    def test_optimization(self) -> None:
+        for algorithm in (GaudiOCSolver.algorithm, GaudiSolver.algorithm):
+            optimization = Optimization(beam(), algorithm=algorithm, options=OptimizationOptions(continuation=True))
+            optimization.optimize()
+            result = last_result(optimization)
+
+            self.assertEqual(optimization.problem.penalty, 3)
+            self.assertEqual(len(result.stages), 3)
+            self.assertEqual(sum(result.stages), optimization.solver.iteration)
+            self.assertEqual(result.serialize()['stageIterations'], result.stages)
+
+    def test_resume_mid_stage(self) -> None:
+        # The schedule is saved with the checkpoint, so a run paused in an
+        # intermediate stage resumes in it
+        optimization = Optimization(beam(), algorithm=GaudiOCSolver.algorithm,
+                                    options=OptimizationOptions(continuation=True))
+        optimization.solver.start(optimization.start_design())
+
+        while len(optimization.solver.stage_starts) < 2:
+            optimization.step()
+
+        checkpoint = optimization.checkpoint()
+
+        with tempfile.TemporaryDirectory() as directory:
+            resumed = Optimization.from_checkpoint(checkpoint, directory)
+
+        self.assertEqual(resumed.problem.penalty, 2)
+        self.assertEqual(resumed.solver.penalties, [3])
+        self.assertEqual(resumed.solver.stage_starts, optimization.solver.stage_starts)
+        self.assertEqual(resumed.solver.ftol_rel, Optimization.continuation_stage_ftol)
+
+    def test_multiresolution(self) -> None:
+        # Only the coarsest level runs the continuation
+        optimization = Optimization(beam(width=80, height=40), options=OptimizationOptions(levels=2, continuation=True))
+
+        self.assertEqual((optimization.problem.penalty, optimization.solver.penalties), (3, []))
+        self.assertEqual(optimization.coarse_optimization(2, None, None).solver.penalties, [2, 3])
+
+        x = numpy.full(20 * 10, 0.4)
+        finer = optimization.coarse_optimization(1, x, beam(width=20, height=10).domain.dimensions)
+        self.assertEqual((finer.problem.penalty, finer.solver.penalties), (3, []))
+
+
+if __name__ == '__main__':
+    unittest.main()
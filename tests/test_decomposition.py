@@ -0,0 +1,52 @@
+"""
+Check that the domain decomposition solver solves the same system as a single
+factorization.
+
+    python -m unittest discover tests
+"""
+import unittest
+
+import numpy
+
+from models import CustomBoundaryConditions
+from topopt.linear_solvers import CholmodSolver, DomainDecompositionSolver
+from topopt.problems import ComplianceProblem
+
+from tests.projects import beam, pinched_plate
+
+
+def displacements(project, linear_solver, x: numpy.ndarray) -> numpy.ndarray:
+    dimensions = project.domain.dimensions
+    problem = ComplianceProblem(CustomBoundaryConditions(dimensions.width, dimensions.height,
+                                                         project.boundary_conditions), 3.0)
+    problem.linear_solver = linear_solver
+
+    try:
+        u = problem.compute_displacements(x)
+        # Later solves reuse the workers and their symbolic analysis
+        return problem.compute_displacements(x, u)
+    finally:
+        linear_solver.close()
+
+
+class DomainDecompositionTest(unittest.TestCase):
+    def test_strips(self) -> None:
+        # The grid is cut across its longer side
+        self.assertEqual(DomainDecompositionSolver(30, 10, 3).axis, 0)
+        self.assertEqual(DomainDecompositionSolver(10, 30, 3).axis, 1)
+        self.assertEqual(len(DomainDecompositionSolver(30, 10, 3).cuts), 2)
+
+    def test_displacements(self) -> None:
+        # One load case on the beam, two on the plate
+        for project, subdomains in ((beam(), 3), (pinched_plate(), 2)):
+            dimensions = project.domain.dimensions
+            x = numpy.random.default_rng(0).uniform(1e-3, 1, dimensions.width * dimensions.height)
+
+            reference = displacements(project, CholmodSolver(), x)
+            u = displacements(project, DomainDecompositionSolver(dimensions.width, dimensions.height, subdomains), x)
+
+            numpy.testing.assert_allclose(u, reference, rtol=0, atol=1e-10 * abs(reference).max())
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,63 @@
+"""
+Check the warm-started LOBPCG modes against a direct eigensolver.
+
+    python -m unittest discover tests
+"""
+import unittest
+
+import numpy
+import scipy.sparse.linalg
+
+from topopt.boundary_conditions import MBBBeamBoundaryConditions
+from topopt.problems import EigenfrequencyProblem
+
+
+class EigenfrequencyTest(unittest.TestCase):
+    def setUp(self) -> None:
+        self.problem = EigenfrequencyProblem(MBBBeamBoundaryConditions(24, 12), 3.0)
+        self.rng = numpy.random.default_rng(0)
+
+    def exact_eigenvalues(self, xPhys: numpy.ndarray) -> numpy.ndarray:
+        problem = self.problem
+        K = problem.assemble(problem.KE, problem.compute_young_moduli(xPhys))
+        M = problem.assemble(problem.ME, problem.compute_masses(xPhys))
+
+        return numpy.sort(scipy.sparse.linalg.eigsh(K, problem.modes, M, sigma=0, which='LM',
+                                                    return_eigenvectors=False))
+
+    def test_warm_started_modes(self) -> None:
+        # The later designs start from the modes and factor of the ones before
+        x = numpy.full(self.problem.nel, 0.5)
+
+        for _ in range(4):
+            eigenvalues = self.problem.compute_modes(x)
+
+            numpy.testing.assert_allclose(eigenvalues, self.exact_eigenvalues(x), rtol=1e-8)
+
+            x = numpy.clip(x * self.rng.uniform(0.95, 1.05, x.size), 0.01, 1)
+
+    def test_cold_started_modes(self) -> None:
+        self.problem.warm_start = False
+        x = self.rng.uniform(0.2, 1, self.problem.nel)
+
+        numpy.testing.assert_allclose(self.problem.compute_modes(x), self.exact_eigenvalues(x), rtol=1e-8)
+
+    def test_objective_gradient(self) -> None:
+        # The objective is the inverse of the fundamental eigenvalue
+        x = self.rng.uniform(0.2, 1, self.problem.nel)
+        dobj = numpy.empty(x.size)
+        obj = self.problem.compute_objective(x, dobj)
+
+        self.assertAlmostEqual(obj, 1 / self.exact_eigenvalues(x)[0], delta=1e-8 * obj)
+
+        for element in (5, 150):
+            step = 1e-6
+            shifted = x.copy()
+            shifted[element] += step
+            difference = (self.problem.compute_objective(shifted, numpy.empty(x.size)) - obj) / step
+
+            self.assertAlmostEqual(dobj[element], difference, delta=1e-3 * abs(difference))
+
+
+if __name__ == '__main__':
+    unittest.main()
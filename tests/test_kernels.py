@@ -0,0 +1,114 @@
+"""
+Check the compiled kernels against the NumPy reference implementation.
+
+    python -m unittest discover tests
+"""
+import unittest
+
+import numpy
+
+from topopt import kernels
+from topopt.boundary_conditions import LBracketBoundaryConditions, MBBBeamBoundaryConditions
+from topopt.filters import DensityBasedFilter, SensitivityBasedFilter
+from topopt.problems import ComplianceProblem
+
+rtol = 1e-12
+
+
+class TwoLoadsBoundaryConditions(MBBBeamBoundaryConditions):
+    @property
+    def forces(self):
+        f = numpy.zeros((self.ndof, 2))
+        f[1, 0] = -1
+        f[2 * (self.nelx + 1) * (self.nely + 1) - 2, 1] = 1
+        return f
+
+
+@unittest.skipUnless('numba' in kernels.available_backends(), 'Numba is not installed')
+class KernelsTest(unittest.TestCase):
+    def setUp(self) -> None:
+        self.rng = numpy.random.default_rng(0)
+
+    def tearDown(self) -> None:
+        kernels.set_backend('numpy')
+
+    def assertClose(self, actual: numpy.ndarray, expected: numpy.ndarray) -> None:
+        scale = numpy.abs(expected).max()
+        self.assertLessEqual(numpy.abs(actual - expected).max(), rtol * scale)
+
+    def backends(self, compute) -> tuple:
+        # The NumPy result and the compiled one of the same computation
+        results = []
+
+        for backend in ('numpy', 'numba'):
+            kernels.set_backend(backend)
+            results.append(numpy.array(compute(), copy=True))
+
+        return tuple(results)
+
+    def test_stiffness_values(self) -> None:
+        KE = self.rng.standard_normal((8, 8))
+        E = self.rng.uniform(1e-9, 1, 50)
+
+        self.assertClose(kernels.stiffness_values(KE, E), (E[:, numpy.newaxis] * KE.ravel()).ravel())
+
+    def test_element_energies(self) -> None:
+        KE = self.rng.standard_normal((8, 8))
+        KE = KE + KE.T
+        edofMat = self.rng.integers(0, 100, (40, 8))
+        u = self.rng.standard_normal((100, 3))
+        out = numpy.empty(40)
+
+        expected = numpy.einsum('eil,ij,ejl->e', u[edofMat], KE, u[edofMat])
+
+        self.assertClose(kernels.element_energies(u, edofMat, KE, out), expected)
+
+    def test_apply_filter(self) -> None:
+        H = DensityBasedFilter(30, 10, 2.5).H
+        x = self.rng.uniform(0, 1, 300)
+        scale = self.rng.uniform(0.5, 2, 300)
+
+        self.assertClose(kernels.apply_filter(H, x, scale, numpy.empty(300)), scale * (H @ x))
+
+    def test_problem_stiffness(self) -> None:
+        problem = ComplianceProblem(MBBBeamBoundaryConditions(30, 10), 3.0)
+        xPhys = self.rng.uniform(0, 1, 300)
+
+        self.assertClose(*self.backends(lambda: problem.build_K(xPhys, remove_constrained=False).data))
+
+    def test_problem_energies(self) -> None:
+        # Energies of several loads are summed
+        for bc in (LBracketBoundaryConditions(40, 40, 20, 20), TwoLoadsBoundaryConditions(30, 10)):
+            problem = ComplianceProblem(bc, 3.0)
+            xPhys = self.rng.uniform(0.1, 1, bc.nelx * bc.nely)
+            problem.update_displacements(xPhys)
+
+            self.assertClose(*self.backends(
+                lambda: problem.compute_element_energies(problem.KE, numpy.empty(xPhys.size))))
+
+    def test_filters(self) -> None:
+        x = self.rng.uniform(0, 1, 300)
+        dobj = -self.rng.uniform(0, 1, 300)
+
+        for filter in (DensityBasedFilter(30, 10, 2.5), SensitivityBasedFilter(30, 10, 2.5)):
+            def variables():
+                xPhys = numpy.empty(300)
+                filter.filter_variables(x, xPhys)
+                return xPhys
+
+            def objective():
+                filtered = dobj.copy()
+                filter.filter_objective_sensitivities(x, filtered)
+                return filtered
+
+            def volume():
+                dv = numpy.ones(300)
+                filter.filter_volume_sensitivities(x, dv)
+                return dv
+
+            for compute in (variables, objective, volume):
+                self.assertClose(*self.backends(compute))
+
+
+if __name__ == '__main__':
+    unittest.main()
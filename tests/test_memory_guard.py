@@ -0,0 +1,75 @@
+"""
+Check the resource estimates and the per-job memory cap.
+
+    python -m unittest discover tests
+"""
+import unittest
+
+from dto import Excitation, FailedResult, OptimizationOptions
+from models import Optimization
+from resources import ResourceEstimator
+
+from tests.projects import beam
+
+
+def last_result(optimization: Optimization):
+    results = optimization.solver.results
+    result = results.get()
+
+    while not results.empty():
+        result = results.get()
+
+    return result
+
+
+class MemoryGuardTest(unittest.TestCase):
+    def test_estimate(self) -> None:
+        project = beam()
+        estimate = ResourceEstimator().estimate(project)
+
+        self.assertEqual(estimate.dofs, 2 * 31 * 11)
+        self.assertGreater(estimate.factor_nonzeros, estimate.stiffness_nonzeros)
+        self.assertGreater(estimate.memory, ResourceEstimator.base_bytes)
+
+    def test_options(self) -> None:
+        # Robust optimizations hold three systems, harmonic loads the mass
+        # matrix and the displacements of every frequency
+        project = beam()
+        plain = Optimization.estimate_resources(project)
+        robust = Optimization.estimate_resources(project, OptimizationOptions(robust=True))
+
+        self.assertEqual(robust.factor_nonzeros, 3 * plain.factor_nonzeros)
+        self.assertAlmostEqual(robust.iteration_time, 3 * plain.iteration_time)
+        self.assertGreater(robust.memory, plain.memory)
+
+        adaptive = Optimization.estimate_resources(project, OptimizationOptions(adaptive=True))
+        self.assertGreater(adaptive.memory, plain.memory)
+
+        iterative = Optimization.estimate_resources(project, OptimizationOptions(linear_solver='iterative'))
+        self.assertEqual(iterative.factor_nonzeros, ResourceEstimator('iterative').estimate(project).factor_nonzeros)
+
+        project.excitation = Excitation(0.1, 0.2, 8)
+        self.assertGreater(Optimization.estimate_resources(project).memory, plain.memory)
+
+    def test_exceeded_limit(self) -> None:
+        # The job fails with a result instead of taking the process down
+        optimization = Optimization(beam(), memory_limit=1e5)
+        optimization.solver.maxeval = optimization.solver.total_maxeval = 5
+        optimization.optimize()
+
+        self.assertIsInstance(last_result(optimization), FailedResult)
+        self.assertTrue(optimization.finished)
+
+    def test_within_limit(self) -> None:
+        optimization = Optimization(beam(), memory_limit=2e9, options=OptimizationOptions(robust=True))
+        optimization.solver.maxeval = optimization.solver.total_maxeval = 5
+        optimization.optimize()
+
+        self.assertNotIsInstance(last_result(optimization), FailedResult)
+        self.assertGreaterEqual(optimization.solver.external_memory,
+                                Optimization.estimate_resources(beam(), OptimizationOptions(robust=True))
+                                .factor_nonzeros * ResourceEstimator.factor_bytes)
+
+
+if __name__ == '__main__':
+    unittest.main()
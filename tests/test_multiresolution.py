@@ -0,0 +1,83 @@
+"""
+Check the coarse grids of the multiresolution continuation and the
+prolongation of their designs.
+
+    python -m unittest discover tests
+"""
+import unittest
+
+import numpy
+
+from dto import BoundaryConditions, Dimensions, Force, OptimizationOptions, Position
+from models import CustomBoundaryConditions, GaudiOCSolver, Optimization
+
+from tests.projects import beam
+
+
+class MultiresolutionTest(unittest.TestCase):
+    def test_prolongation(self) -> None:
+        # Every fine element takes the density of the coarse element over it
+        coarse, fine = Dimensions(4, 3), Dimensions(8, 6)
+        x = numpy.random.default_rng(0).uniform(0, 1, 12)
+        prolongated = Optimization.prolongate(x, coarse, fine).reshape(8, 6)
+
+        numpy.testing.assert_array_equal(prolongated, numpy.kron(x.reshape(4, 3), numpy.ones((2, 2))))
+        self.assertAlmostEqual(prolongated.mean(), x.mean())
+
+        prolongated = Optimization.prolongate(x, coarse, Dimensions(7, 5)).reshape(7, 5)
+        self.assertEqual(prolongated[6, 4], x[11])
+        self.assertEqual(prolongated[0, 0], x[0])
+
+    def test_levels(self) -> None:
+        # The coarsest grid keeps at least min_level_size elements per side
+        self.assertEqual(Optimization.max_levels(beam(width=80, height=40)), 2)
+        self.assertEqual(Optimization.max_levels(beam(width=30, height=10)), 0)
+        self.assertEqual(Optimization(beam(), options=OptimizationOptions(levels=3)).levels, 0)
+
+    def test_coarsen(self) -> None:
+        project = beam(width=80, height=40)
+        project.boundary_conditions.forces.append(Force(-1, 1, Position(20, 0), 40))
+        coarse = Optimization.coarsen(project, 4)
+
+        self.assertEqual((coarse.domain.dimensions.width, coarse.domain.dimensions.height), (20, 10))
+        self.assertEqual(coarse.filter_radius, 1.5)
+
+        # Distributed forces keep their total load
+        total = sum(force.load * max(1, force.size) for force in project.boundary_conditions.forces)
+        coarse_total = sum(force.load * max(1, force.size) for force in coarse.boundary_conditions.forces)
+        self.assertAlmostEqual(coarse_total, total)
+
+        conditions = CustomBoundaryConditions(20, 10, coarse.boundary_conditions)
+        self.assertEqual(conditions.fixed_nodes.size, 11 + 1)
+
+    def test_coarse_design(self) -> None:
+        optimization = Optimization(beam(width=80, height=40), options=OptimizationOptions(levels=2))
+        optimization.solver.maxeval = optimization.solver.total_maxeval = 2
+        optimization.optimize()
+
+        self.assertEqual([level[:2] for level in optimization.level_times], [(20, 10), (40, 20)])
+        # The first published result is the prolongated design of the
+        # finest coarse level
+        first = optimization.solver.results.get()
+        self.assertEqual(len(first.densities), 80 * 40)
+        self.assertAlmostEqual(first.volume / (80 * 40), 0.4, delta=0.01)
+
+    def test_stepped_levels(self) -> None:
+        # The scheduler steps the coarse levels one evaluation at a time,
+        # through the same designs as a direct run
+        options = OptimizationOptions(levels=1)
+        optimized = Optimization(beam(width=40, height=20), algorithm=GaudiOCSolver.algorithm, options=options)
+        optimized.solver.maxeval = optimized.solver.total_maxeval = 1
+        optimized.optimize()
+
+        stepped = Optimization(beam(width=40, height=20), algorithm=GaudiOCSolver.algorithm, options=options)
+
+        while stepped.initial_x is None:
+            self.assertFalse(stepped.step())
+
+        numpy.testing.assert_allclose(stepped.initial_x, optimized.initial_x)
+        self.assertEqual(len(stepped.level_times), 1)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,63 @@
+"""
+Check the mixed precision mode against double precision.
+
+    python -m unittest discover tests
+"""
+import unittest
+
+import numpy
+
+from dto import OptimizationOptions
+from models import Optimization
+from topopt.boundary_conditions import MBBBeamBoundaryConditions
+from topopt.problems import ComplianceProblem
+
+from tests.projects import beam
+
+
+class MixedPrecisionTest(unittest.TestCase):
+    def setUp(self) -> None:
+        self.rng = numpy.random.default_rng(0)
+
+    def test_compliance(self) -> None:
+        # The refined displacements are those of the exact system, so the
+        # compliance and its gradient match double precision
+        bc = MBBBeamBoundaryConditions(60, 20)
+        double = ComplianceProblem(bc, 3.0)
+        mixed = ComplianceProblem(bc, 3.0)
+        mixed.set_precision(numpy.float32)
+
+        for x in (numpy.full(double.nel, 0.4), self.rng.uniform(0.01, 1, double.nel)):
+            dobj, mixed_dobj = numpy.empty(x.size), numpy.empty(x.size)
+            obj = double.compute_objective(x, dobj)
+
+            self.assertAlmostEqual(mixed.compute_objective(x, mixed_dobj), obj, delta=1e-6 * obj)
+            numpy.testing.assert_allclose(mixed_dobj, dobj, rtol=1e-5, atol=1e-6 * abs(dobj).max())
+
+        self.assertTrue(mixed.mixed_precision)
+        self.assertGreater(mixed.refinements, 0)
+        self.assertEqual(mixed.stiffness_values(x).dtype, numpy.float32)
+        self.assertEqual(mixed.obje.dtype, numpy.float32)
+
+    def test_optimization(self) -> None:
+        runs = []
+
+        for mixed_precision in (False, True):
+            optimization = Optimization(beam(), options=OptimizationOptions(mixed_precision=mixed_precision))
+            optimization.solver.maxeval = optimization.solver.total_maxeval = 10
+            optimization.optimize()
+            runs.append(optimization)
+
+        double, mixed = runs
+
+        self.assertEqual(mixed.topopt_filter.H.dtype, numpy.float32)
+        self.assertTrue(mixed.problem.mixed_precision)
+        self.assertAlmostEqual(mixed.solver.last_result.obj, double.solver.last_result.obj,
+                               delta=1e-4 * double.solver.last_result.obj)
+        # Resumed optimizations keep the precision they started with
+        self.assertTrue(mixed.checkpoint().options.mixed_precision)
+        self.assertFalse(double.checkpoint().options.mixed_precision)
+
+
+if __name__ == '__main__':
+    unittest.main()
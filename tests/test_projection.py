@@ -0,0 +1,97 @@
+"""
+Check the Heaviside projection filter and the continuation of its sharpness.
+
+    python -m unittest discover tests
+"""
+import tempfile
+import unittest
+
+import numpy
+
+from dto import OptimizationOptions
+from models import GaudiOCSolver, Optimization
+from topopt.filters import DensityBasedFilter, ProjectionFilter, gray_level
+
+from tests.projects import beam
+
+
+class ProjectionTest(unittest.TestCase):
+    def setUp(self) -> None:
+        self.x = numpy.random.default_rng(0).uniform(0.1, 0.9, 300)
+
+    def test_sharpen(self) -> None:
+        # Beta doubles on each stage of a gray design up to its maximum
+        projection = ProjectionFilter(DensityBasedFilter(30, 10, 1.5))
+        gray = numpy.full(300, 0.5)
+        betas = []
+
+        while projection.sharpen(gray):
+            betas.append(projection.beta)
+
+        self.assertEqual(betas, [2, 4, 8, 16, 32])
+
+        # A discrete design stops the continuation at once
+        projection = ProjectionFilter(DensityBasedFilter(30, 10, 1.5))
+        self.assertFalse(projection.sharpen(numpy.repeat([0.0, 1.0], 150)))
+        self.assertEqual(projection.beta, 1)
+
+    def test_next_stage(self) -> None:
+        optimization = Optimization(beam(), options=OptimizationOptions(projection=True))
+        solver = optimization.solver
+        solver.objective_function(self.x, numpy.empty(300))
+
+        self.assertTrue(solver.next_stage())
+        self.assertEqual(optimization.topopt_filter.beta, 2)
+        self.assertEqual(solver.stage_starts[-1], solver.iteration)
+
+    def test_gradient(self) -> None:
+        # The chain rule runs through the projection and the density filter
+        optimization = Optimization(beam(), options=OptimizationOptions(projection=True))
+        optimization.topopt_filter.beta = 8
+        solver = optimization.solver
+        direction = numpy.random.default_rng(1).uniform(-1, 1, 300)
+        epsilon = 1e-6
+
+        for function in (solver.objective_function, solver.volume_function):
+            gradient = numpy.empty(300)
+            function(self.x, gradient)
+            difference = (function(self.x + epsilon * direction, numpy.empty(300)) -
+                          function(self.x - epsilon * direction, numpy.empty(300)))
+
+            self.assertAlmostEqual(difference / (2 * epsilon), gradient @ direction,
+                                   delta=1e-5 * abs(gradient @ direction))
+
+    def test_checkpoint(self) -> None:
+        optimization = Optimization(beam(), options=OptimizationOptions(projection=True))
+        optimization.topopt_filter.beta = 8
+        checkpoint = optimization.checkpoint()
+
+        self.assertEqual(checkpoint.optimizer_state['beta'], 8)
+
+        with tempfile.TemporaryDirectory() as directory:
+            resumed = Optimization.from_checkpoint(checkpoint, directory)
+
+        self.assertIsInstance(resumed.topopt_filter, ProjectionFilter)
+        self.assertEqual(resumed.topopt_filter.beta, 8)
+
+    def test_crisp_design(self) -> None:
+        runs = []
+
+        for projection in (False, True):
+            options = OptimizationOptions(projection=projection)
+            optimization = Optimization(beam(), algorithm=GaudiOCSolver.algorithm, options=options)
+            optimization.solver.maxeval = optimization.solver.total_maxeval = 100
+            optimization.optimize()
+            runs.append(optimization)
+
+        density, projected = runs
+
+        # The continuation stops once the design is crisp
+        self.assertTrue(projected.solver.finished)
+        self.assertLess(projected.solver.iteration, 100)
+        self.assertLessEqual(gray_level(projected.solver.xPhys), projected.topopt_filter.gray_tolerance)
+        self.assertGreater(gray_level(density.solver.xPhys), 0.3)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,141 @@
+"""
+Check the mean and covariance of random loads and the expected compliance of
+their low rank load cases.
+
+    python -m unittest discover tests
+"""
+import unittest
+
+import numpy
+import scipy.sparse
+
+from dto import BoundaryConditions, Position, RandomLoads
+from models import CustomBoundaryConditions
+from topopt.problems import ComplianceProblem
+from topopt.utils import xy_to_id
+
+from tests.projects import beam
+
+
+class SampledLoads(CustomBoundaryConditions):
+    # Every sample of the random loads as a load case of its own, scaled so
+    # that their compliances add up to the sample average
+    def __init__(self, nelx: int, nely: int, boundary_conditions: BoundaryConditions, loads: RandomLoads):
+        super().__init__(nelx, nely, boundary_conditions)
+
+        samples = numpy.array(loads.samples, dtype=float).reshape(len(loads.samples), -1)
+        nodes = numpy.array([xy_to_id(position.x, position.y, nelx, nely) for position in loads.positions])
+        dofs = (2 * nodes[:, numpy.newaxis] + numpy.arange(2)).ravel()
+
+        sampled = scipy.sparse.csc_matrix(
+            (samples.ravel() / numpy.sqrt(len(samples)),
+             (numpy.tile(dofs, len(samples)), numpy.repeat(numpy.arange(len(samples)), dofs.size))),
+            shape=(self.ndof, len(samples)))
+        self.force_matrix = scipy.sparse.hstack([self.force_matrix, sampled]).tocsc()
+
+    @property
+    def load_cases(self):
+        return len(self.boundary_conditions.forces) + 1
+
+
+def sampled(count: int, points: int = 3, seed: int = 0) -> numpy.ndarray:
+    # Unit loads scattered around straight down
+    rng = numpy.random.default_rng(seed)
+    angles = rng.normal(0, 0.3, (count, points))
+    magnitudes = rng.normal(1, 0.2, (count, points))
+
+    return numpy.stack([magnitudes * numpy.sin(angles), -magnitudes * numpy.cos(angles)], axis=2)
+
+
+def positions(points: int = 3) -> list:
+    return [Position(10 * i + 5, 0) for i in range(points)]
+
+
+class RandomLoadsTest(unittest.TestCase):
+    def test_moments(self) -> None:
+        samples = sampled(50)
+        mean, covariance = RandomLoads(positions(), samples=samples.tolist()).moments()
+        flat = samples.reshape(50, 6)
+
+        numpy.testing.assert_allclose(mean, flat.mean(axis=0), rtol=1e-12)
+        # Samples are weighted equally, not with the unbiased estimate
+        numpy.testing.assert_allclose(covariance, numpy.cov(flat.T, bias=True), rtol=1e-12, atol=1e-15)
+
+    def test_load_cases(self) -> None:
+        # The cases add up to the second moment, the mean load followed by
+        # the covariance modes in decreasing order
+        loads = RandomLoads(positions(), samples=sampled(50).tolist())
+        mean, covariance = loads.moments()
+        cases = loads.load_cases()
+
+        self.assertEqual(cases.shape, (6, 7))
+        numpy.testing.assert_array_equal(cases[:, 0], mean)
+        numpy.testing.assert_allclose(cases @ cases.T, numpy.outer(mean, mean) + covariance, atol=1e-12)
+
+        norms = numpy.linalg.norm(cases[:, 1:], axis=0)
+        self.assertTrue((numpy.diff(norms) <= 0).all())
+
+        loads.rank = 2
+        numpy.testing.assert_allclose(loads.load_cases(), cases[:, :3])
+
+    def test_rank_deficient(self) -> None:
+        # Directions of zero variance add no load case, however many samples
+        covariance = numpy.zeros((2, 2))
+        covariance[1, 1] = 0.04
+
+        loads = RandomLoads([Position(5, 0)], mean=[[0, -1]], covariance=covariance.tolist())
+        cases = loads.load_cases()
+
+        numpy.testing.assert_allclose(cases, [[0, 0], [-1, 0.2]], atol=1e-15)
+
+        two = numpy.array([[[0, -1.2]], [[0, -0.8]]])
+        self.assertEqual(RandomLoads([Position(5, 0)], samples=two.tolist()).load_cases().shape, (2, 2))
+
+    def test_expected_compliance(self) -> None:
+        # The low rank cases give the average compliance of the samples,
+        # each solved as a load case of its own
+        for count in (4, 32):
+            samples = sampled(count)
+            project = beam({'positions': [position.to_json() for position in positions()],
+                            'samples': samples.tolist()})
+            conditions = project.boundary_conditions
+
+            runs = []
+
+            for boundary_conditions in (SampledLoads(30, 10, conditions, project.random_loads),
+                                        CustomBoundaryConditions(30, 10, conditions, project.random_loads)):
+                problem = ComplianceProblem(boundary_conditions, 3.0)
+                x = numpy.random.default_rng(1).uniform(0.1, 1, problem.nel)
+                dobj = numpy.empty(problem.nel)
+                runs.append((problem.compute_objective(x, dobj), dobj, problem.nloads))
+
+            (sampled_obj, sampled_dobj, sampled_loads), (obj, dobj, nloads) = runs
+
+            self.assertAlmostEqual(obj, sampled_obj, delta=1e-10 * sampled_obj)
+            numpy.testing.assert_allclose(dobj, sampled_dobj, rtol=1e-8, atol=1e-10 * abs(sampled_dobj).max())
+            # The columns do not grow with the samples
+            self.assertEqual(sampled_loads, 1 + count)
+            self.assertLessEqual(nloads, 1 + 1 + 6)
+
+    def test_moments_and_samples(self) -> None:
+        # Loads given by their moments are those given by samples with the
+        # same moments
+        samples = sampled(20)
+        mean, covariance = RandomLoads(positions(), samples=samples.tolist()).moments()
+        json = [position.to_json() for position in positions()]
+
+        results = []
+
+        for random_loads in ({'positions': json, 'samples': samples.tolist()},
+                             {'positions': json, 'mean': mean.reshape(3, 2).tolist(),
+                              'covariance': covariance.tolist()}):
+            project = beam(random_loads)
+            problem = ComplianceProblem(
+                CustomBoundaryConditions(30, 10, project.boundary_conditions, project.random_loads), 3.0)
+            results.append(problem.compute_objective(numpy.full(problem.nel, 0.4), numpy.empty(problem.nel)))
+
+        self.assertAlmostEqual(results[0], results[1], delta=1e-10 * results[0])
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,100 @@
+"""
+Check the eroded, intermediate and dilated designs of the robust formulation
+and their batched solves.
+
+    python -m unittest discover tests
+"""
+import unittest
+
+import numpy
+
+from dto import OptimizationOptions
+from models import Optimization
+from topopt.filters import heaviside_projection
+from topopt.linear_solvers import CholmodSolver, LinearSolver, ParallelCholmodSolver
+
+from tests.projects import beam
+
+
+class SeparateSolves(CholmodSolver):
+    # Factorizes every system of a batch from scratch
+    solve_batch = LinearSolver.solve_batch
+
+
+class RobustTest(unittest.TestCase):
+    def setUp(self) -> None:
+        self.optimization = Optimization(beam(), options=OptimizationOptions(robust=True))
+        self.solver, self.problem = self.optimization.solver, self.optimization.problem
+        self.x = numpy.random.default_rng(0).uniform(0.1, 0.9, self.problem.nel)
+
+    def designs(self) -> list:
+        return [heaviside_projection(self.solver.xTilde, self.solver.beta, eta) for eta in self.solver.thresholds]
+
+    def test_designs(self) -> None:
+        self.assertTrue(self.solver.robust)
+        # The projections are flat at full density, robust runs start at the
+        # volume fraction
+        numpy.testing.assert_array_equal(Optimization.initial_design(beam(), robust=True), 0.4)
+
+        self.solver.filter_variables(self.x)
+        eroded, dilated, intermediate = self.designs()
+
+        # The physical design and its volume are the intermediate ones
+        numpy.testing.assert_array_equal(self.solver.xPhys, intermediate)
+        self.assertTrue((eroded <= intermediate).all() and (intermediate <= dilated).all())
+        self.assertAlmostEqual(self.solver.volume_function(self.x, numpy.empty(self.x.size)),
+                               intermediate.sum() - 0.4 * self.x.size)
+
+    def test_worst_case(self) -> None:
+        dobj = numpy.empty(self.x.size)
+        obj = self.solver.objective_function(self.x, dobj)
+
+        objs = [self.problem.compute_objective(design, numpy.empty(self.x.size)) for design in self.designs()]
+
+        # The eroded design has the least material and the largest compliance
+        self.assertEqual(int(numpy.argmax(objs)), 0)
+        self.assertAlmostEqual(obj, max(objs), delta=1e-10 * obj)
+
+    def test_gradient(self) -> None:
+        # The chain rule runs through the eroded projection and the filter
+        dobj = numpy.empty(self.x.size)
+        self.solver.objective_function(self.x, dobj)
+
+        direction = numpy.random.default_rng(1).uniform(-1, 1, self.x.size)
+        epsilon = 1e-6
+        difference = (self.solver.objective_function(self.x + epsilon * direction, numpy.empty(self.x.size)) -
+                      self.solver.objective_function(self.x - epsilon * direction, numpy.empty(self.x.size)))
+
+        self.assertAlmostEqual(difference / (2 * epsilon), dobj @ direction, delta=1e-5 * abs(dobj @ direction))
+
+    def test_batch(self) -> None:
+        # The shared analysis and the parallel factorizations solve the same
+        # systems as separate factorizations
+        self.solver.filter_variables(self.x)
+        designs = self.designs()
+        results = []
+
+        for linear_solver in (SeparateSolves(), CholmodSolver(), ParallelCholmodSolver(2)):
+            self.problem.linear_solver = linear_solver
+            dobjs = [numpy.empty(self.x.size) for _ in designs]
+
+            try:
+                objs = self.problem.compute_objectives(designs, dobjs)
+                # A second batch reuses the analysis kept by the first
+                objs = self.problem.compute_objectives(designs, dobjs)
+            finally:
+                linear_solver.close()
+
+            results.append((objs, dobjs))
+
+        separate_objs, separate_dobjs = results[0]
+
+        for objs, dobjs in results[1:]:
+            numpy.testing.assert_allclose(objs, separate_objs, rtol=1e-10)
+
+            for dobj, separate_dobj in zip(dobjs, separate_dobjs):
+                numpy.testing.assert_allclose(dobj, separate_dobj, rtol=1e-8, atol=1e-12 * abs(separate_dobj).max())
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,105 @@
+"""
+Check the order the scheduling policies step their jobs in.
+
+    python -m unittest discover tests
+"""
+import threading
+import unittest
+
+from scheduler import OptimizationScheduler, SchedulingPolicy
+
+
+class CountedJob:
+    # Stands in for an optimization that converges after a number of steps
+    def __init__(self, identifier: str, size: int, iterations: int, log: list, error: bool = False) -> None:
+        self.identifier = identifier
+        self.size = size
+        self.iterations = iterations
+        self.log = log
+        self.error = error
+        self.finished = False
+        self.failure = None
+
+    def step(self) -> bool:
+        self.log.append(self.identifier)
+
+        if self.error:
+            raise RuntimeError('step failed')
+
+        self.iterations -= 1
+        self.finished = self.iterations == 0
+
+        return self.finished
+
+    def fail(self, error: str) -> None:
+        self.finished = True
+        self.failure = error
+
+
+class SchedulerTest(unittest.TestCase):
+    def run_jobs(self, policy: SchedulingPolicy, jobs: list) -> list:
+        # One worker, and every job submitted before it takes the first
+        scheduler = OptimizationScheduler(1, policy)
+        finished = []
+        done = threading.Event()
+
+        def on_finished(identifier: str) -> None:
+            finished.append(identifier)
+
+            if len(finished) == len(jobs):
+                done.set()
+
+        scheduler.on_finished = on_finished
+
+        with scheduler.condition:
+            for job, priority in jobs:
+                scheduler.submit(job, priority)
+
+        self.assertTrue(done.wait(10))
+        self.assertEqual(scheduler.jobs, {})
+
+        return finished
+
+    def test_round_robin(self) -> None:
+        log = []
+        self.run_jobs(SchedulingPolicy.ROUND_ROBIN, [(CountedJob(name, 1, 3, log), 0) for name in 'abc'])
+
+        self.assertEqual(''.join(log), 'abcabcabc')
+
+    def test_priority(self) -> None:
+        log = []
+        self.run_jobs(SchedulingPolicy.PRIORITY, [(CountedJob('a', 1, 2, log), 0), (CountedJob('b', 1, 2, log), 1),
+                                                  (CountedJob('c', 1, 2, log), 1)])
+
+        self.assertEqual(''.join(log), 'bcbcaa')
+
+    def test_shortest_job_first(self) -> None:
+        # Jobs are charged their size per iteration, so the small one runs
+        # four iterations for each iteration of the large one
+        log = []
+        finished = self.run_jobs(SchedulingPolicy.SHORTEST_JOB_FIRST,
+                                 [(CountedJob('large', 4, 4, log), 0), (CountedJob('small', 1, 8, log), 0)])
+
+        self.assertEqual(finished, ['small', 'large'])
+        self.assertEqual(log, ['large'] + ['small'] * 4 + ['large'] + ['small'] * 4 + ['large'] * 2)
+
+    def test_failed_job(self) -> None:
+        # A failing job is finished with an error and releases its slot
+        log = []
+        failing = CountedJob('failing', 1, 3, log, error=True)
+        finished = self.run_jobs(SchedulingPolicy.ROUND_ROBIN, [(failing, 0), (CountedJob('other', 1, 2, log), 0)])
+
+        self.assertEqual(sorted(finished), ['failing', 'other'])
+        self.assertEqual(log.count('failing'), 1)
+        self.assertIsNotNone(failing.failure)
+
+    def test_remove(self) -> None:
+        scheduler = OptimizationScheduler(0)
+        scheduler.submit(CountedJob('a', 1, 3, []))
+
+        self.assertTrue(scheduler.remove('a'))
+        self.assertFalse(scheduler.remove('a'))
+
+
+if __name__ == '__main__':
+    unittest.main()
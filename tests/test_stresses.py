@@ -0,0 +1,81 @@
+"""
+Check the stresses sent with the results of an optimization.
+
+    python -m unittest discover tests
+"""
+import unittest
+
+import numpy
+
+from dto import OptimizationOptions, Project
+from models import Optimization
+
+from tests.projects import beam
+
+
+def optimize(project: Project, stress_interval: int) -> list:
+    optimization = Optimization(project, options=OptimizationOptions(stress_interval=stress_interval))
+    optimization.solver.maxeval = optimization.solver.total_maxeval = 5
+    optimization.optimize()
+
+    results = []
+    while not optimization.solver.results.empty():
+        results.append(optimization.solver.results.get())
+
+    return optimization, results
+
+
+class StressTest(unittest.TestCase):
+    def test_interval(self) -> None:
+        # Every second result and the final one carry stresses
+        _, results = optimize(beam(), 2)
+        with_stresses = [result.stresses is not None for result in results]
+
+        self.assertTrue(with_stresses[-1])
+        self.assertTrue(any(with_stresses[:-1]))
+        self.assertFalse(all(with_stresses))
+
+    def test_final_only(self) -> None:
+        _, results = optimize(beam(), 0)
+
+        self.assertTrue(results[-1].stresses is not None)
+        self.assertTrue(all(result.stresses is None for result in results[:-1]))
+
+    def test_principal_stresses(self) -> None:
+        optimization, _ = optimize(beam(), 0)
+        von_mises, largest, smallest = optimization.solver.stresses()
+
+        self.assertEqual(von_mises.shape, (300,))
+        self.assertTrue(numpy.all(von_mises >= 0))
+        self.assertTrue(numpy.all(largest >= smallest))
+        # The Von Mises stress of plane stress from its principal stresses
+        numpy.testing.assert_allclose(von_mises, numpy.sqrt(largest**2 - largest * smallest + smallest**2),
+                                      atol=1e-12)
+
+    def test_random_load_cases(self) -> None:
+        # The covariance columns are not loads, only the forces and the mean
+        # of the random loads are
+        covariance = [[0.04, 0], [0, 0.09]]
+        optimization, _ = optimize(beam({'positions': [{'x': 15, 'y': 0}], 'covariance': covariance}), 0)
+
+        numpy.testing.assert_array_equal(optimization.problem.bc.stress_cases, [0])
+        self.assertEqual(optimization.problem.displacements.shape[1], 3)
+
+        solver = optimization.solver
+        expected = solver.stress_calculator.stress_field(solver.xPhys, optimization.problem.displacements[:, :1])
+        numpy.testing.assert_allclose(solver.stresses(), expected)
+
+        optimization, _ = optimize(beam({'positions': [{'x': 15, 'y': 0}], 'mean': [0, -1],
+                                         'covariance': covariance}), 0)
+
+        numpy.testing.assert_array_equal(optimization.problem.bc.stress_cases, [0, 1])
+
+    def test_negative_interval(self) -> None:
+        validations = []
+        OptimizationOptions(stress_interval=-1).validate(beam(), validations)
+
+        self.assertEqual(len(validations), 1)
+
+
+if __name__ == '__main__':
+    unittest.main()
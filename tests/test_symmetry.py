@@ -0,0 +1,106 @@
+"""
+Check that mirror symmetric projects solved on part of the grid match the
+whole grid.
+
+    python -m unittest discover tests
+"""
+import unittest
+
+import numpy
+
+from dto import OptimizationOptions
+from models import CustomBoundaryConditions, GaudiOCSolver, MirroredBoundaryConditions, Optimization, Symmetry
+from topopt.filters import DensityBasedFilter
+from topopt.problems import ComplianceProblem
+
+from tests.projects import beam, full_beam, pinched_plate
+
+
+def conditions(project) -> CustomBoundaryConditions:
+    dimensions = project.domain.dimensions
+    return CustomBoundaryConditions(dimensions.width, dimensions.height, project.boundary_conditions)
+
+
+def symmetric(symmetry: Symmetry, seed: int = 0) -> numpy.ndarray:
+    # A random design of the whole grid that is mirror symmetric
+    x = numpy.random.default_rng(seed).uniform(0.1, 1, symmetry.reduced_nelx * symmetry.reduced_nely)
+    return symmetry.expand(x)
+
+
+class SymmetryTest(unittest.TestCase):
+    def test_detection(self) -> None:
+        symmetry = conditions(full_beam()).symmetry()
+        self.assertEqual((symmetry.mirror_x, symmetry.mirror_y, symmetry.factor), (True, False, 2))
+
+        # Load cases that swap into each other are not a symmetry
+        symmetry = conditions(pinched_plate()).symmetry()
+        self.assertEqual((symmetry.mirror_x, symmetry.mirror_y), (True, False))
+
+        self.assertFalse(conditions(beam()).symmetry().reduced)
+        # The mirror line must run along grid nodes
+        self.assertFalse(conditions(full_beam(width=41)).symmetry().reduced)
+
+    def test_expand(self) -> None:
+        symmetry = Symmetry(8, 6, True, True)
+        x = numpy.arange(12.0)
+        expanded = symmetry.expand(x).reshape(8, 6)
+
+        numpy.testing.assert_array_equal(expanded, expanded[::-1])
+        numpy.testing.assert_array_equal(expanded, expanded[:, ::-1])
+        numpy.testing.assert_array_equal(symmetry.reduce(expanded.ravel()), x)
+
+    def test_filter(self) -> None:
+        # The stencil folds across the mirror lines onto the mirror image
+        symmetry = Symmetry(20, 12, True, True)
+        x = symmetric(symmetry)
+        full, filtered = numpy.empty(x.size), numpy.empty(x.size // 4)
+
+        DensityBasedFilter(20, 12, 2.5).filter_variables(x, full)
+        DensityBasedFilter(10, 6, 2.5, True, True).filter_variables(symmetry.reduce(x), filtered)
+
+        numpy.testing.assert_allclose(filtered, symmetry.reduce(full), rtol=1e-12)
+
+    def test_compliance(self) -> None:
+        # The mirrored half carries half of the loads on the mirror line, so
+        # it has half of the compliance and the same element sensitivities
+        for project in (full_beam(), pinched_plate()):
+            full_conditions = conditions(project)
+            symmetry = full_conditions.symmetry()
+            full = ComplianceProblem(full_conditions, 3.0)
+            reduced = ComplianceProblem(MirroredBoundaryConditions(full_conditions, symmetry), 3.0)
+
+            x = symmetric(symmetry)
+            dobj, reduced_dobj = numpy.empty(x.size), numpy.empty(x.size // symmetry.factor)
+            obj = full.compute_objective(x, dobj)
+
+            self.assertAlmostEqual(reduced.compute_objective(symmetry.reduce(x), reduced_dobj) * symmetry.factor,
+                                   obj, delta=1e-10 * obj)
+            numpy.testing.assert_allclose(reduced_dobj, symmetry.reduce(dobj), rtol=1e-8)
+            self.assertEqual(reduced.ndof, (symmetry.reduced_nelx + 1) * (symmetry.reduced_nely + 1) * 2)
+
+    def test_optimization(self) -> None:
+        runs = []
+
+        for mirrored in (False, True):
+            options = OptimizationOptions(symmetry=mirrored)
+            optimization = Optimization(full_beam(), algorithm=GaudiOCSolver.algorithm, options=options)
+            optimization.solver.maxeval = optimization.solver.total_maxeval = 10
+            optimization.optimize()
+            runs.append(optimization)
+
+        full, reduced = runs
+
+        self.assertTrue(reduced.symmetry.reduced)
+        self.assertEqual(reduced.problem.nel, 200)
+
+        # Results cover the whole grid, with the compliance of the whole grid
+        self.assertEqual(len(reduced.solver.last_result.densities), 400)
+        numpy.testing.assert_allclose(reduced.solver.last_result.densities, full.solver.last_result.densities,
+                                      atol=1e-6)
+        self.assertAlmostEqual(reduced.solver.last_result.obj, full.solver.last_result.obj,
+                               delta=1e-6 * full.solver.last_result.obj)
+        self.assertEqual(len(reduced.checkpoint().x), 400)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,131 @@
+"""
+Check that leaving void elements out of the finite element system keeps the
+compliance of the full system.
+
+    python -m unittest discover tests
+"""
+import unittest
+
+import numpy
+
+from dto import ConstantRegion, Dimensions, OptimizationOptions, Position, RegionType
+from models import CustomBoundaryConditions, GaudiOCSolver, Optimization
+from topopt.problems import ComplianceProblem
+
+from tests.projects import beam
+
+
+def conditions(void: bool = False) -> CustomBoundaryConditions:
+    # The beam, with a void top right corner to make an L-shape
+    project = beam()
+
+    if void:
+        project.boundary_conditions.constant_regions.append(
+            ConstantRegion(Position(20, 0), Dimensions(10, 4), RegionType.VOID))
+
+    return CustomBoundaryConditions(30, 10, project.boundary_conditions)
+
+
+def full(problem: ComplianceProblem) -> ComplianceProblem:
+    problem.set_active_elements(numpy.ones(problem.nel, dtype=bool))
+    return problem
+
+
+class VoidEliminationTest(unittest.TestCase):
+    def assert_same_compliance(self, eliminated: ComplianceProblem, assembled: ComplianceProblem,
+                               x: numpy.ndarray) -> None:
+        dobj, full_dobj = numpy.empty(x.size), numpy.empty(x.size)
+        obj = eliminated.compute_objective(x, dobj)
+        full_obj = assembled.compute_objective(x, full_dobj)
+
+        self.assertAlmostEqual(obj, full_obj, delta=1e-6 * full_obj)
+        # The eliminated elements get no sensitivity, the full system only a
+        # negligible one from their Emin stiffness
+        elements = eliminated.assembled
+        numpy.testing.assert_allclose(dobj[elements], full_dobj[elements], rtol=1e-6,
+                                      atol=1e-9 * abs(full_dobj).max())
+        numpy.testing.assert_array_equal(dobj[~elements], 0)
+
+    def test_void_regions(self) -> None:
+        bc = conditions(void=True)
+        eliminated = ComplianceProblem(bc, 3.0)
+        assembled = full(ComplianceProblem(bc, 3.0))
+
+        self.assertTrue(eliminated.eliminated)
+        self.assertEqual(eliminated.elements.size, 300 - 40)
+        self.assertLess(eliminated.free.size, assembled.free.size)
+
+        x = numpy.random.default_rng(0).uniform(0.1, 1, 300)
+        x[bc.passive_elements] = 0
+        self.assert_same_compliance(eliminated, assembled, x)
+
+    def test_void_iterations(self) -> None:
+        bc = conditions()
+        eliminated = ComplianceProblem(bc, 3.0, void_iterations=2)
+        assembled = ComplianceProblem(bc, 3.0)
+
+        # The bottom left of the beam carries no load
+        x = numpy.ones((30, 10))
+        x[:10, 5:] = 1e-4
+        x = x.flatten()
+        void = x <= ComplianceProblem.void_threshold
+
+        for evaluation in range(3):
+            self.assert_same_compliance(eliminated, assembled, x)
+            # Elements are eliminated after staying void void_iterations times
+            self.assertEqual(eliminated.eliminated, evaluation >= 1)
+
+        numpy.testing.assert_array_equal(eliminated.assembled, ~void | eliminated.loaded)
+
+        # An element that gains material is assembled again at once
+        x[void] = 0.5
+        self.assert_same_compliance(eliminated, assembled, x)
+        self.assertFalse(eliminated.eliminated)
+
+    def test_loaded_elements(self) -> None:
+        bc = conditions()
+        problem = ComplianceProblem(bc, 3.0, void_iterations=1)
+        x = numpy.full(300, 1e-4)
+        x[10:] = 1
+
+        problem.compute_objective(x, numpy.empty(300))
+
+        # The void elements around the load stay in the system
+        self.assertTrue(problem.loaded[0])
+        self.assertTrue(problem.assembled[problem.loaded].all())
+        self.assertFalse(problem.assembled[1:10].any())
+
+    def test_floating_material(self) -> None:
+        # Eliminating the ring around a solid island leaves it floating, so
+        # every element comes back and the full system is solved
+        bc = conditions()
+        eliminated = ComplianceProblem(bc, 3.0, void_iterations=1)
+        assembled = ComplianceProblem(bc, 3.0)
+
+        x = numpy.ones((30, 10))
+        x[10:20, 2:9] = 1e-4
+        x[12:18, 4:7] = 1
+        x = x.flatten()
+
+        self.assert_same_compliance(eliminated, assembled, x)
+        self.assertFalse(eliminated.eliminated)
+
+    def test_optimization(self) -> None:
+        runs = []
+
+        for void_iterations in (0, 2):
+            options = OptimizationOptions(void_iterations=void_iterations)
+            optimization = Optimization(beam(), algorithm=GaudiOCSolver.algorithm, options=options)
+            optimization.solver.maxeval = optimization.solver.total_maxeval = 30
+            optimization.optimize()
+            runs.append(optimization)
+
+        assembled, eliminated = runs
+
+        self.assertTrue(eliminated.problem.eliminated)
+        self.assertAlmostEqual(eliminated.solver.last_result.obj, assembled.solver.last_result.obj,
+                               delta=1e-4 * assembled.solver.last_result.obj)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -5,6 +5,7 @@ import abc
 
 # Import modules
 import numpy
+import scipy.sparse
 
 # Import TopOpt modules
 from .utils import xy_to_id
@@ -64,15 +65,25 @@ class BoundaryConditions(abc.ABC):
         """:obj:`numpy.ndarray`: Force vector for the problem."""
         pass
 
+    @property
+    def sparse_forces(self):
+        """:obj:`scipy.sparse.csc_matrix`: Force vectors as a sparse matrix."""
+        return scipy.sparse.csc_matrix(self.forces)
+
+    @property
+    def load_cases(self):
+        """:obj:`int`: Number of load cases the compliance averages over."""
+        return self.sparse_forces.shape[1]
+
     @property
     def passive_elements(self):
         """:obj:`numpy.ndarray`: Passive elements to be set to zero density."""
-        return numpy.array([])
+        return numpy.array([], dtype=int)
 
     @property
     def active_elements(self):
         """:obj:`numpy.ndarray`: Active elements to be set to full density."""
-        return numpy.array([])
+        return numpy.array([], dtype=int)
 
 
 class MBBBeamBoundaryConditions(BoundaryConditions):
@@ -8,11 +8,15 @@ import abc
 import numpy
 import scipy
 
+# Import TopOpt modules
+from . import kernels
+
 
 class Filter(abc.ABC):
     """Filter solutions to topology optimization to avoid checker boarding."""
 
-    def __init__(self, nelx: int, nely: int, rmin: float):
+    def __init__(self, nelx: int, nely: int, rmin: float,
+                 mirror_x: bool = False, mirror_y: bool = False):
         """
         Create a filter to filter solutions.
 
@@ -26,6 +30,11 @@ class Filter(abc.ABC):
             The number of elements in the y direction.
         rmin:
             The filter radius.
+        mirror_x:
+            Is the grid mirrored at its upper x boundary? The filter then
+            reaches across it onto the mirror image of the grid.
+        mirror_y:
+            Is the grid mirrored at its upper y boundary?
 
         """
         self._repr_string = "{}(nelx={:d}, nely={:d}, rmin={:g})".format(
@@ -34,17 +43,22 @@ class Filter(abc.ABC):
         iH = numpy.zeros(nfilter)
         jH = numpy.zeros(nfilter)
         sH = numpy.zeros(nfilter)
+        # Neighbours past a mirrored boundary are their mirror images
+        kmax = 2 * nelx if mirror_x else nelx
+        lmax = 2 * nely if mirror_y else nely
         cc = 0
         for i in range(nelx):
             for j in range(nely):
                 row = i * nely + j
                 kk1 = int(numpy.maximum(i - (numpy.ceil(rmin) - 1), 0))
-                kk2 = int(numpy.minimum(i + numpy.ceil(rmin), nelx))
+                kk2 = int(numpy.minimum(i + numpy.ceil(rmin), kmax))
                 ll1 = int(numpy.maximum(j - (numpy.ceil(rmin) - 1), 0))
-                ll2 = int(numpy.minimum(j + numpy.ceil(rmin), nely))
+                ll2 = int(numpy.minimum(j + numpy.ceil(rmin), lmax))
                 for k in range(kk1, kk2):
                     for l in range(ll1, ll2):
-                        col = k * nely + l
+                        kf = k if k < nelx else kmax - 1 - k
+                        lf = l if l < nely else lmax - 1 - l
+                        col = kf * nely + lf
                         fac = rmin - numpy.sqrt(
                             ((i - k) * (i - k) + (j - l) * (j - l)))
                         iH[cc] = row
@@ -55,6 +69,66 @@ class Filter(abc.ABC):
         self.H = scipy.sparse.coo_matrix(
             (sH, (iH, jH)), shape=(nelx * nely, nelx * nely)).tocsc()
         self.Hs = self.H.sum(1)
+        # Scalings and work buffer of the compiled kernels
+        self.Hs_inverse = 1 / numpy.asarray(self.Hs).ravel()
+        self.ones = numpy.ones(nelx * nely)
+        self.work = numpy.empty(nelx * nely)
+
+    def set_precision(self, dtype: numpy.dtype) -> None:
+        """
+        Select the precision the filter weights are stored in.
+
+        The weights are the largest array of the filter and every filtering
+        streams through them, so single precision halves both. The
+        normalization stays in double precision.
+
+        Parameters
+        ----------
+        dtype:
+            numpy.float32 or numpy.float64.
+
+        """
+        self.H = self.H.astype(dtype)
+
+    def weigh(self, x: numpy.ndarray) -> numpy.ndarray:
+        """
+        Multiply values by the filter weights in the weights' precision.
+
+        Mixing precisions would make SciPy widen the whole filter matrix for
+        the product, so the values are converted instead.
+
+        Parameters
+        ----------
+        x:
+            The values to weigh.
+
+        Returns
+        -------
+        numpy.ndarray
+            The weighted sums of the values.
+
+        """
+        return self.H * x.astype(self.H.dtype, copy=False)
+
+    def sharpen(self, xPhys: numpy.ndarray) -> bool:
+        """
+        Sharpen the filter for the next stage of a continuation.
+
+        Called when the optimization converged with the current filter.
+        Filters without a continuation never change.
+
+        Parameters
+        ----------
+        xPhys:
+            The filtered density values of the converged design.
+
+        Returns
+        -------
+        bool
+            Whether the filter changed and the optimization should go on.
+
+        """
+        return False
 
     def __str__(self) -> str:
         """Create a string representation of the filter."""
@@ -146,8 +220,13 @@ class SensitivityBasedFilter(Filter):
             The filtered objective sensitivities to be computed.
 
         """
+        if kernels.use_jit():
+            numpy.multiply(xPhys, dobj, out=self.work)
+            kernels.apply_filter(self.H, self.work, self.Hs_inverse, dobj)
+            dobj /= numpy.maximum(0.001, xPhys)
+            return
         dobj[:] = (numpy.asarray(
-            (self.H * (xPhys * dobj))[numpy.newaxis].T / self.Hs)[:, 0] /
+            self.weigh(xPhys * dobj)[numpy.newaxis].T / self.Hs)[:, 0] /
             numpy.maximum(0.001, xPhys))
 
     def filter_volume_sensitivities(
@@ -181,7 +260,11 @@ class DensityBasedFilter(Filter):
             The filtered density values to be computed
 
         """
-        xPhys[:] = numpy.asarray(self.H * x[numpy.newaxis].T / self.Hs)[:, 0]
+        if kernels.use_jit():
+            kernels.apply_filter(self.H, x, self.Hs_inverse, xPhys)
+            return
+        xPhys[:] = numpy.asarray(
+            self.weigh(x[numpy.newaxis].T) / self.Hs)[:, 0]
 
     def filter_objective_sensitivities(
             self, xPhys: numpy.ndarray, dobj: numpy.ndarray) -> None:
@@ -196,8 +279,12 @@ class DensityBasedFilter(Filter):
             The filtered objective sensitivities to be computed.
 
         """
+        if kernels.use_jit():
+            numpy.multiply(dobj, self.Hs_inverse, out=self.work)
+            kernels.apply_filter(self.H, self.work, self.ones, dobj)
+            return
         dobj[:] = numpy.asarray(
-            self.H * (dobj[numpy.newaxis].T / self.Hs))[:, 0]
+            self.weigh(dobj[numpy.newaxis].T / self.Hs))[:, 0]
 
     def filter_volume_sensitivities(
             self, xPhys: numpy.ndarray, dv: numpy.ndarray) -> None:
@@ -212,4 +299,220 @@ class DensityBasedFilter(Filter):
             The filtered volume sensitivities to be computed.
 
         """
-        dv[:] = numpy.asarray(self.H * (dv[numpy.newaxis].T / self.Hs))[:, 0]
+        if kernels.use_jit():
+            numpy.multiply(dv, self.Hs_inverse, out=self.work)
+            kernels.apply_filter(self.H, self.work, self.ones, dv)
+            return
+        dv[:] = numpy.asarray(self.weigh(dv[numpy.newaxis].T / self.Hs))[:, 0]
+
+
+class ProjectionFilter(Filter):
+    r"""
+    Project the densities of another filter towards 0 and 1.
+
+    The filtered densities :math:`\tilde{x}` are projected with a smoothed
+    Heaviside step, see :func:`heaviside_projection`, which removes the gray
+    transition zones the filter leaves. The sensitivities are multiplied by
+    the derivative of the projection before the other filter filters them.
+
+    A sharp step from the start traps the optimization in a poor design, so
+    :math:`\beta` follows a continuation: it doubles each time the
+    optimization converges, until the design is discrete enough or
+    :math:`\beta` reaches its maximum.
+
+    Attributes
+    ----------
+    filter: :obj:`Filter`
+        The filter whose densities are projected.
+    beta: float
+        The current sharpness of the projection.
+    eta: float
+        The threshold of the projection.
+    max_beta: float
+        The sharpness the continuation stops at.
+    gray_tolerance: float
+        The gray level, see :func:`gray_level`, at which the design is
+        discrete enough to stop the continuation.
+
+    """
+
+    def __init__(self, filter: Filter, beta: float = 1.0, eta: float = 0.5,
+                 max_beta: float = 32.0, gray_tolerance: float = 0.05):
+        """
+        Create a projection of a filter.
+
+        Parameters
+        ----------
+        filter:
+            The filter whose densities are projected.
+        beta:
+            The initial sharpness of the projection.
+        eta:
+            The threshold of the projection.
+        max_beta:
+            The sharpness the continuation stops at.
+        gray_tolerance:
+            The gray level at which the design is discrete enough.
+
+        """
+        self.filter = filter
+        self.beta = beta
+        self.eta = eta
+        self.max_beta = max_beta
+        self.gray_tolerance = gray_tolerance
+        self._repr_string = "{}(filter={!r}, eta={:g})".format(
+            self.__class__.__name__, filter, eta)
+        # The densities of the other filter and the derivative of their
+        # projection, from the last filtering
+        self.xTilde = numpy.zeros(filter.ones.size)
+        self.dx = numpy.ones(filter.ones.size)
+
+    @property
+    def H(self) -> scipy.sparse.csc_matrix:
+        """:obj:`scipy.sparse.csc_matrix`: The weights of the other filter."""
+        return self.filter.H
+
+    def set_precision(self, dtype: numpy.dtype) -> None:
+        """
+        Select the precision the weights of the other filter are stored in.
+
+        Parameters
+        ----------
+        dtype:
+            numpy.float32 or numpy.float64.
+
+        """
+        self.filter.set_precision(dtype)
+
+    def filter_variables(self, x: numpy.ndarray, xPhys: numpy.ndarray) -> None:
+        """
+        Filter the variable of the solution to produce xPhys.
+
+        Parameters
+        ----------
+        x:
+            The raw density values.
+        xPhys:
+            The filtered density values to be computed
+
+        """
+        self.filter.filter_variables(x, self.xTilde)
+        xPhys[:] = heaviside_projection(self.xTilde, self.beta, self.eta,
+                                        self.dx)
+
+    def filter_objective_sensitivities(
+            self, xPhys: numpy.ndarray, dobj: numpy.ndarray) -> None:
+        """
+        Filter derivative of the objective.
+
+        Parameters
+        ----------
+        xPhys:
+            The filtered density values.
+        dobj:
+            The filtered objective sensitivities to be computed.
+
+        """
+        dobj *= self.dx
+        self.filter.filter_objective_sensitivities(self.xTilde, dobj)
+
+    def filter_volume_sensitivities(
+            self, xPhys: numpy.ndarray, dv: numpy.ndarray) -> None:
+        """
+        Filter derivative of the volume.
+
+        Parameters
+        ----------
+        xPhys:
+            The filtered density values.
+        dv:
+            The filtered volume sensitivities to be computed.
+
+        """
+        dv *= self.dx
+        self.filter.filter_volume_sensitivities(self.xTilde, dv)
+
+    def sharpen(self, xPhys: numpy.ndarray) -> bool:
+        """
+        Double the sharpness of the projection unless the design is discrete.
+
+        Parameters
+        ----------
+        xPhys:
+            The filtered density values of the converged design.
+
+        Returns
+        -------
+        bool
+            Whether the projection changed and the optimization should go on.
+
+        """
+        if self.filter.sharpen(xPhys):
+            return True
+        if self.beta >= self.max_beta or \
+                gray_level(xPhys) <= self.gray_tolerance:
+            return False
+        self.beta = min(2 * self.beta, self.max_beta)
+        return True
+
+
+def heaviside_projection(x: numpy.ndarray, beta: float, eta: float,
+                         dx: numpy.ndarray = None) -> numpy.ndarray:
+    r"""
+    Project densities towards 0 and 1 with a smoothed Heaviside step.
+
+    :math:`\bar{x} = \frac{\tanh(\beta\eta) + \tanh(\beta(x - \eta))}
+    {\tanh(\beta\eta) + \tanh(\beta(1 - \eta))}`
+
+    which keeps 0 and 1 fixed and sharpens around the threshold
+    :math:`\eta` as :math:`\beta` grows.
+
+    Parameters
+    ----------
+    x:
+        The densities to project.
+    beta:
+        The sharpness of the step.
+    eta:
+        The threshold of the step.
+    dx:
+        The array to write the derivative of the projection into. Only set if
+        dx is not None.
+
+    Returns
+    -------
+    numpy.ndarray
+        The projected densities.
+
+    """
+    scale = numpy.tanh(beta * eta) + numpy.tanh(beta * (1 - eta))
+    step = numpy.tanh(beta * (x - eta))
+    if dx is not None:
+        numpy.multiply(step, step, out=dx)
+        numpy.subtract(1, dx, out=dx)
+        dx *= beta / scale
+    step += numpy.tanh(beta * eta)
+    step /= scale
+    return step
+
+
+def gray_level(x: numpy.ndarray) -> float:
+    r"""
+    Measure how far densities are from a discrete design.
+
+    :math:`M_{nd} = \frac{4}{n}\sum_{e=1}^n x_e(1 - x_e)`
+
+    is 0 for a design of only 0 and 1 and 1 for a design of only 0.5.
+
+    Parameters
+    ----------
+    x:
+        The densities.
+
+    Returns
+    -------
+    float
+        The gray level of the densities.
+
+    """
+    return 4 * float(numpy.mean(x * (1 - x)))
@@ -0,0 +1,191 @@
+"""
+Compiled element kernels for assembly, sensitivities and filters.
+
+The NumPy code in the problems and filters is the reference implementation.
+When Numba is installed, the loops below can replace it: they run in
+parallel over the elements and write straight into their outputs without
+intermediate arrays. The backend is selected at runtime with
+:func:`set_backend`.
+"""
+
+# Import standard library
+import logging
+import threading
+
+# Import modules
+import numpy
+
+try:
+    import numba
+except ImportError:  # Numba is an optional dependency
+    numba = None
+
+backends = ("numpy", "numba")
+
+# Name of the backend in use
+backend = "numpy"
+
+# The default workqueue threading layer of Numba aborts on concurrent
+# parallel launches, and optimizations run in several threads
+_launch = threading.Lock()
+
+
+def available_backends() -> list:
+    """
+    List the backends that can be used.
+
+    Returns
+    -------
+    list
+        The names of the usable backends.
+
+    """
+    return [name for name in backends if name == "numpy" or numba is not None]
+
+
+def set_backend(name: str) -> str:
+    """
+    Select the kernels used by the problems and filters.
+
+    Falls back to NumPy with a warning if Numba is requested but missing.
+
+    Parameters
+    ----------
+    name:
+        The name of the backend, "numpy" or "numba".
+
+    Returns
+    -------
+    str
+        The name of the backend in use.
+
+    Raises
+    ------
+        ValueError: `name` must be one of the known backends.
+
+    """
+    global backend
+    if name not in backends:
+        raise ValueError("Unknown kernel backend {}, use one of {}".format(
+            name, ", ".join(backends)))
+    if name == "numba" and numba is None:
+        logging.warning("Numba is not installed, using the NumPy kernels")
+        name = "numpy"
+    backend = name
+    return backend
+
+
+def use_jit() -> bool:
+    """:obj:`bool`: Are the compiled kernels selected?"""
+    return backend == "numba"
+
+
+if numba is not None:
+    @numba.njit(parallel=True, cache=True)
+    def _stiffness_values(KE, E, sK):
+        n = KE.shape[0]
+        for e in numba.prange(E.shape[0]):
+            for k in range(n):
+                sK[n * e + k] = E[e] * KE[k]
+
+    @numba.njit(parallel=True, cache=True)
+    def _element_energies(u, edofMat, KE, out):
+        for e in numba.prange(edofMat.shape[0]):
+            energy = 0.0
+            for load in range(u.shape[1]):
+                for i in range(8):
+                    KEu = 0.0
+                    for j in range(8):
+                        KEu += KE[i, j] * u[edofMat[e, j], load]
+                    energy += u[edofMat[e, i], load] * KEu
+            out[e] = energy
+
+    @numba.njit(parallel=True, cache=True)
+    def _filter(indptr, indices, data, x, scale, out):
+        # H is symmetric, so its csc arrays are read as csr
+        for i in numba.prange(out.shape[0]):
+            value = 0.0
+            for p in range(indptr[i], indptr[i + 1]):
+                value += data[p] * x[indices[p]]
+            out[i] = value * scale[i]
+
+
+def stiffness_values(KE: numpy.ndarray, E: numpy.ndarray) -> numpy.ndarray:
+    """
+    Compute the values of the stiffness matrix triplets.
+
+    Parameters
+    ----------
+    KE:
+        The element stiffness matrix.
+    E:
+        The Young's modulus of each element.
+
+    Returns
+    -------
+    numpy.ndarray
+        The element stiffness matrices scaled by the moduli, element by
+        element, in the order of the problem's index vectors.
+
+    """
+    sK = numpy.empty(E.size * KE.size, dtype=numpy.result_type(KE, E))
+    with _launch:
+        _stiffness_values(KE.ravel(), E, sK)
+    return sK
+
+
+def element_energies(u: numpy.ndarray, edofMat: numpy.ndarray,
+                     KE: numpy.ndarray, out: numpy.ndarray) -> numpy.ndarray:
+    r"""
+    Compute the element energies summed over all loads.
+
+    Parameters
+    ----------
+    u:
+        The displacements, one column per load.
+    edofMat:
+        The degrees of freedom of each element.
+    KE:
+        The symmetric element matrix.
+    out:
+        The array to write the energy of each element into.
+
+    Returns
+    -------
+    numpy.ndarray
+        The energy :math:`\sum_i \mathbf{u}_{e,i}^T\mathbf{K}_E
+        \mathbf{u}_{e,i}` of each element.
+
+    """
+    with _launch:
+        _element_energies(u, edofMat, KE, out)
+    return out
+
+
+def apply_filter(H, x: numpy.ndarray, scale: numpy.ndarray,
+                 out: numpy.ndarray) -> numpy.ndarray:
+    """
+    Apply a symmetric filter matrix and scale the filtered values.
+
+    Computes ``scale * (H @ x)`` in one pass.
+
+    Parameters
+    ----------
+    H:
+        The symmetric filter matrix in csc format.
+    x:
+        The values to filter. Must not be the same array as `out`.
+    scale:
+        The scaling applied to the filtered values.
+    out:
+        The array to write the filtered values into.
+
+    Returns
+    -------
+    numpy.ndarray
+        The filtered values.
+
+    """
+    with _launch:
+        _filter(H.indptr, H.indices, H.data, x, scale, out)
+    return out
@@ -0,0 +1,1348 @@
+"""Solve the linear systems of the finite element analysis."""
+
+# Import standard library
+import abc
+import multiprocessing
+import time
+
+# Import modules
+import numpy
+import scipy.linalg
+import scipy.sparse
+import scipy.sparse.linalg
+import cvxopt
+import cvxopt.amd
+import cvxopt.cholmod
+
+try:
+    import pyamg
+except ImportError:  # PyAMG is an optional dependency
+    pyamg = None
+
+
+class LinearSolver(abc.ABC):
+    """
+    Solve the stiffness system of the free degrees of freedom.
+
+    Attributes
+    ----------
+    iterations: int
+        The number of Krylov iterations performed over all solves.
+
+    """
+
+    iterations = 0
+
+    @abc.abstractmethod
+    def solve(self, K: scipy.sparse.coo_matrix, F: cvxopt.matrix,
+              dofs: numpy.ndarray) -> None:
+        """
+        Solve :math:`KU = F` for the displacements of every load.
+
+        Parameters
+        ----------
+        K:
+            The stiffness matrix of the free degrees of freedom.
+        F:
+            The forces of each load, overwritten with the displacements.
+        dofs:
+            The grid degree of freedom of each row of K.
+
+        """
+        pass
+
+    def solve_refined(self, K: scipy.sparse.coo_matrix, F: cvxopt.matrix,
+                      dofs: numpy.ndarray, stiffness, tolerance: float,
+                      max_refinements: int) -> int:
+        """
+        Solve :math:`KU = F` and refine the displacements in double precision.
+
+        K may hold its values in single precision. The displacements of the
+        first solve are refined by conjugate gradients on the exact system,
+        preconditioned by solves with K, until the residual falls under
+        `tolerance` relative to the forces. Unlike plain iterative
+        refinement this converges even when the rounding of K is too coarse
+        for its condition number, since the preconditioned system only has a
+        few eigenvalues away from one.
+
+        Parameters
+        ----------
+        K:
+            The stiffness matrix of the free degrees of freedom.
+        F:
+            The forces of each load, overwritten with the displacements.
+        dofs:
+            The grid degree of freedom of each row of K.
+        stiffness:
+            Computes the double precision product :math:`KU` of the exact
+            stiffness matrix with displacements U.
+        tolerance:
+            The relative residual to refine the displacements to.
+        max_refinements:
+            The most corrections made per load.
+
+        Returns
+        -------
+        int
+            The number of corrections made.
+
+        Raises
+        ------
+            ArithmeticError: K is singular or the corrections do not
+            converge.
+
+        """
+        forces = numpy.array(F)
+        self.solve(K, F, dofs)
+        U = numpy.asarray(F)
+
+        def precondition(r):
+            C = cvxopt.matrix(r.reshape(-1, 1))
+            self.solve(K, C, dofs)
+            return numpy.asarray(C).ravel()
+
+        n = U.shape[0]
+        A = scipy.sparse.linalg.LinearOperator(
+            (n, n), matvec=lambda u: stiffness(u.reshape(-1, 1)).ravel(),
+            dtype=float)
+        M = scipy.sparse.linalg.LinearOperator(
+            (n, n), matvec=precondition, dtype=float)
+
+        corrections = 0
+
+        def count(uk):
+            nonlocal corrections
+            corrections += 1
+
+        for load in range(U.shape[1]):
+            U[:, load], info = scipy.sparse.linalg.cg(
+                A, forces[:, load], x0=U[:, load], rtol=tolerance,
+                maxiter=max_refinements, M=M, callback=count)
+            if info != 0:
+                raise ArithmeticError(
+                    "Refinement did not converge in {:d} corrections".format(
+                        max_refinements))
+        return corrections
+
+    def solve_batch(self, Ks: list, Fs: list, dofs: numpy.ndarray) -> None:
+        """
+        Solve :math:`K_iU_i = F_i` for several matrices of the same sparsity.
+
+        The systems are solved one after the other, solvers that can share
+        work between them override this.
+
+        Parameters
+        ----------
+        Ks:
+            The stiffness matrices of the free degrees of freedom, all with
+            the same sparsity.
+        Fs:
+            The forces of each system, overwritten with the displacements.
+        dofs:
+            The grid degree of freedom of each row of the matrices.
+
+        """
+        for K, F in zip(Ks, Fs):
+            self.solve(K, F, dofs)
+
+    def resolve(self, F: cvxopt.matrix) -> None:
+        """
+        Solve for other forces with the matrix of the last solve.
+
+        Parameters
+        ----------
+        F:
+            The forces, overwritten with the displacements.
+
+        Raises
+        ------
+            NotImplementedError: The solver does not keep what it solved
+            with.
+
+        """
+        raise NotImplementedError(
+            "{} cannot solve with its last matrix again".format(self))
+
+    def adapt_tolerance(self, change: float) -> None:
+        """
+        Adapt the accuracy of the next solves to the optimization's progress.
+
+        Parameters
+        ----------
+        change:
+            The relative change of the objective in the last iteration.
+
+        """
+        pass
+
+    def close(self) -> None:
+        """Release the resources the solver holds between solves."""
+        pass
+
+    def __str__(self) -> str:
+        """Create a string representation of the solver."""
+        return self.__class__.__name__
+
+    def __repr__(self) -> str:
+        """Create a formated representation of the solver."""
+        return str(self)
+
+
+class CholmodSolver(LinearSolver):
+    """
+    Factorize the whole system with CHOLMOD's sparse Cholesky.
+
+    CHOLMOD only factorizes in double precision, so single precision values
+    are widened as the matrix is handed over. A refined solve keeps the
+    factor for its corrections.
+
+    Attributes
+    ----------
+    keep_factor: bool
+        Whether plain solves keep their factor for :meth:`resolve` until the
+        next solve, holding its memory in between.
+
+    """
+
+    # The factor kept for :meth:`resolve`, or the one of the refined solve
+    # in progress on matrix
+    matrix = None
+    factor = None
+
+    keep_factor = False
+
+    def solve(self, K: scipy.sparse.coo_matrix, F: cvxopt.matrix,
+              dofs: numpy.ndarray) -> None:
+        """
+        Solve :math:`KU = F` for the displacements of every load.
+
+        Parameters
+        ----------
+        K:
+            The stiffness matrix of the free degrees of freedom.
+        F:
+            The forces of each load, overwritten with the displacements.
+        dofs:
+            The grid degree of freedom of each row of K.
+
+        """
+        if K is self.matrix:
+            cvxopt.cholmod.solve(self.factor, F)
+            return
+        if self.keep_factor:
+            A = self.to_cvxopt(K)
+            self.factor = None  # released before the next one is built
+            factor = cvxopt.cholmod.symbolic(A)
+            cvxopt.cholmod.numeric(A, factor)
+            cvxopt.cholmod.solve(factor, F)
+            self.factor = factor
+            return
+        cvxopt.cholmod.linsolve(self.to_cvxopt(K), F)  # F stores solution
+
+    def resolve(self, F: cvxopt.matrix) -> None:
+        """
+        Solve for other forces with the factor of the last solve.
+
+        Parameters
+        ----------
+        F:
+            The forces, overwritten with the displacements.
+
+        Raises
+        ------
+            RuntimeError: The last solve did not keep its factor, see
+            :attr:`keep_factor`, or the factor was released by
+            :meth:`close`.
+
+        """
+        if self.factor is None:
+            raise RuntimeError(
+                "{} kept no factor to solve with again, set keep_factor "
+                "before solving".format(self))
+        cvxopt.cholmod.solve(self.factor, F)
+
+    def close(self) -> None:
+        """Release the kept factor."""
+        self.factor = None
+        super().close()
+
+    def solve_refined(self, K: scipy.sparse.coo_matrix, F: cvxopt.matrix,
+                      dofs: numpy.ndarray, stiffness, tolerance: float,
+                      max_refinements: int) -> int:
+        """
+        Solve :math:`KU = F` and refine the displacements in double precision.
+
+        Parameters
+        ----------
+        K:
+            The stiffness matrix of the free degrees of freedom.
+        F:
+            The forces of each load, overwritten with the displacements.
+        dofs:
+            The grid degree of freedom of each row of K.
+        stiffness:
+            Computes the double precision product :math:`KU` of the exact
+            stiffness matrix with displacements U.
+        tolerance:
+            The relative residual to refine the displacements to.
+        max_refinements:
+            The most corrections made per load.
+
+        Returns
+        -------
+        int
+            The number of corrections made.
+
+        Raises
+        ------
+            ArithmeticError: K is singular or the corrections do not
+            converge.
+
+        """
+        A = self.to_cvxopt(K)
+        factor = cvxopt.cholmod.symbolic(A)
+        cvxopt.cholmod.numeric(A, factor)
+        del A
+        self.matrix, self.factor = K, factor
+        try:
+            return super().solve_refined(K, F, dofs, stiffness, tolerance,
+                                         max_refinements)
+        finally:
+            self.matrix = self.factor = None
+
+    def solve_batch(self, Ks: list, Fs: list, dofs: numpy.ndarray) -> None:
+        """
+        Solve :math:`K_iU_i = F_i` for several matrices of the same sparsity.
+
+        The ordering and symbolic analysis of the first matrix are reused by
+        the numeric factorizations of all of them.
+
+        Parameters
+        ----------
+        Ks:
+            The stiffness matrices of the free degrees of freedom, all with
+            the same sparsity.
+        Fs:
+            The forces of each system, overwritten with the displacements.
+        dofs:
+            The grid degree of freedom of each row of the matrices.
+
+        """
+        symbolic = None
+        for K, F in zip(Ks, Fs):
+            A = self.to_cvxopt(K)
+            if symbolic is None:
+                symbolic = cvxopt.cholmod.symbolic(A)
+            cvxopt.cholmod.numeric(A, symbolic)
+            cvxopt.cholmod.solve(symbolic, F)
+
+    @staticmethod
+    def to_cvxopt(K: scipy.sparse.coo_matrix) -> cvxopt.spmatrix:
+        """
+        Convert a matrix to CHOLMOD's double precision format.
+
+        Parameters
+        ----------
+        K:
+            The matrix to convert.
+
+        Returns
+        -------
+        cvxopt.spmatrix
+            The matrix in double precision.
+
+        """
+        return cvxopt.spmatrix(K.data.astype(float, copy=False),
+                               K.row.astype(int), K.col.astype(int))
+
+
+class IterativeSolver(LinearSolver):
+    r"""
+    Solve the system inexactly by preconditioned conjugate gradients.
+
+    Early in an optimization the design changes a lot between iterations, so
+    displacements to machine precision are wasted. Each load is solved to a
+    relative residual of :attr:`tolerance`, which follows the relative change
+    of the objective, and starts from the displacements of the previous
+    solve.
+
+    The sensitivities are computed from element energies, so the solve is
+    also checked by the energy gap :math:`|f^Tu - u^TKu| / f^Tu`, which
+    vanishes for the exact solution. While the gap exceeds the tolerance the
+    solve continues with a ten times smaller residual.
+
+    Attributes
+    ----------
+    nelx: int
+        The number of elements in the x-direction.
+    nely: int
+        The number of elements in the y-direction.
+    preconditioner: str
+        "amg" for smoothed aggregation multigrid, which needs PyAMG, or
+        "jacobi" for the inverse diagonal.
+    tolerance: float
+        The relative residual of the next solve.
+    min_tolerance: float
+        The smallest tolerance used.
+    max_tolerance: float
+        The largest tolerance used, also the one of the first solve.
+    tolerance_scale: float
+        The ratio of the tolerance to the objective change.
+    maxiter: int
+        The iterations per load after which the system is factorized instead.
+    refinements: int
+        The number of times the energy gap made a solve continue.
+    fallbacks: int
+        The number of systems factorized after the iterations stalled.
+
+    """
+
+    preconditioners = ("amg", "jacobi")
+
+    def __init__(self, nelx: int, nely: int, preconditioner: str = None,
+                 min_tolerance: float = 1e-8, max_tolerance: float = 1e-2,
+                 tolerance_scale: float = 0.1, maxiter: int = 5000):
+        """
+        Create an iterative solver.
+
+        Parameters
+        ----------
+        nelx:
+            The number of elements in the x-direction.
+        nely:
+            The number of elements in the y-direction.
+        preconditioner:
+            "amg" or "jacobi". Defaults to "amg" when PyAMG is installed.
+        min_tolerance:
+            The smallest tolerance used.
+        max_tolerance:
+            The largest tolerance used, also the one of the first solve.
+        tolerance_scale:
+            The ratio of the tolerance to the objective change.
+        maxiter:
+            The iterations per load after which the system is factorized
+            instead.
+
+        Raises
+        ------
+            ValueError: The preconditioner must be known and available.
+
+        """
+        if preconditioner is None:
+            preconditioner = self.default_preconditioner()
+        if preconditioner not in self.preconditioners:
+            raise ValueError("Unknown preconditioner {}".format(
+                preconditioner))
+        if preconditioner == "amg" and pyamg is None:
+            raise ValueError("The amg preconditioner needs PyAMG")
+        self.nelx = nelx
+        self.nely = nely
+        self.preconditioner = preconditioner
+        self.min_tolerance = min_tolerance
+        self.max_tolerance = max_tolerance
+        self.tolerance_scale = tolerance_scale
+        self.tolerance = max_tolerance
+        self.maxiter = maxiter
+
+        self.iterations = 0
+        self.refinements = 0
+        self.fallbacks = 0
+
+        self.previous = None
+
+    def __str__(self) -> str:
+        """Create a string representation of the solver."""
+        return "{}(preconditioner={})".format(
+            self.__class__.__name__, self.preconditioner)
+
+    @staticmethod
+    def default_preconditioner() -> str:
+        """:obj:`str`: The preconditioner used unless another is given."""
+        return "jacobi" if pyamg is None else "amg"
+
+    def adapt_tolerance(self, change: float) -> None:
+        """
+        Adapt the accuracy of the next solves to the optimization's progress.
+
+        Parameters
+        ----------
+        change:
+            The relative change of the objective in the last iteration.
+
+        """
+        self.tolerance = min(self.max_tolerance, max(
+            self.min_tolerance, self.tolerance_scale * change))
+
+    def rigid_body_modes(self, dofs: numpy.ndarray) -> numpy.ndarray:
+        """
+        Build the rigid body modes, the near null space of elasticity.
+
+        Parameters
+        ----------
+        dofs:
+            The grid degree of freedom of each row of the system.
+
+        Returns
+        -------
+        numpy.ndarray
+            The two translations and the rotation, (dofs, 3).
+
+        """
+        nodes = dofs // 2
+        x = (nodes // (self.nely + 1)).astype(float)
+        y = (nodes % (self.nely + 1)).astype(float)
+        horizontal = dofs % 2 == 0
+        return numpy.stack([horizontal, ~horizontal,
+                            numpy.where(horizontal, -y, x)], axis=1
+                           ).astype(float)
+
+    def build_preconditioner(self, K: scipy.sparse.csr_matrix,
+                             dofs: numpy.ndarray
+                             ) -> scipy.sparse.linalg.LinearOperator:
+        """
+        Build the preconditioner of a system.
+
+        Parameters
+        ----------
+        K:
+            The stiffness matrix of the free degrees of freedom.
+        dofs:
+            The grid degree of freedom of each row of K.
+
+        Returns
+        -------
+        scipy.sparse.linalg.LinearOperator
+            The approximate inverse of K.
+
+        """
+        if self.preconditioner == "amg":
+            return pyamg.smoothed_aggregation_solver(
+                K, B=self.rigid_body_modes(dofs)).aspreconditioner()
+        inverse = 1 / K.diagonal()
+        return scipy.sparse.linalg.LinearOperator(
+            K.shape, matvec=lambda r: inverse * r.ravel(), dtype=K.dtype)
+
+    def solve(self, K: scipy.sparse.coo_matrix, F: cvxopt.matrix,
+              dofs: numpy.ndarray) -> None:
+        """
+        Solve :math:`KU = F` for the displacements of every load.
+
+        Parameters
+        ----------
+        K:
+            The stiffness matrix of the free degrees of freedom.
+        F:
+            The forces of each load, overwritten with the displacements.
+        dofs:
+            The grid degree of freedom of each row of K.
+
+        """
+        B = numpy.asarray(F)  # a view of the cvxopt buffer
+        if self.previous is None or self.previous.shape[1] != B.shape[1]:
+            # Kept over the whole grid, the free dofs change as void
+            # elements are left out
+            self.previous = numpy.zeros(
+                (2 * (self.nelx + 1) * (self.nely + 1), B.shape[1]))
+        K = K.tocsr()
+        M = self.build_preconditioner(K, dofs)
+        forces = B.copy()
+
+        def count(xk):
+            self.iterations += 1
+
+        for i in range(B.shape[1]):
+            f = forces[:, i]
+            u = self.previous[dofs, i]
+            tolerance = self.tolerance
+            while True:
+                u, info = scipy.sparse.linalg.cg(
+                    K, f, u, rtol=tolerance, maxiter=self.maxiter, M=M,
+                    callback=count)
+                if info != 0:
+                    break
+                work = f @ u
+                gap = abs(work - u @ (K @ u)) / max(abs(work), 1e-300)
+                if gap <= self.tolerance or tolerance <= self.min_tolerance:
+                    break
+                tolerance = max(self.min_tolerance, 0.1 * tolerance)
+                self.refinements += 1
+            if info != 0:
+                # The iterations stalled, factorize the system instead. A
+                # singular system raises ArithmeticError as with CHOLMOD
+                B[:] = forces
+                self.fallback(K, F, dofs)
+                break
+            B[:, i] = u
+        self.previous[dofs] = B
+
+    def fallback(self, K: scipy.sparse.csr_matrix, F: cvxopt.matrix,
+                 dofs: numpy.ndarray) -> None:
+        """
+        Solve a system the iterations failed on by factorizing it.
+
+        Parameters
+        ----------
+        K:
+            The stiffness matrix of the free degrees of freedom.
+        F:
+            The forces of each load, overwritten with the displacements.
+        dofs:
+            The grid degree of freedom of each row of K.
+
+        """
+        self.fallbacks += 1
+        CholmodSolver().solve(K.tocoo(), F, dofs)
+
+
+class ReanalysisSolver(IterativeSolver):
+    """
+    Reanalyse each system with the factorization of an earlier one.
+
+    Consecutive designs differ little, so the Cholesky factor of an earlier
+    stiffness matrix is a close approximate inverse of the current one and
+    preconditions conjugate gradients to convergence in a few iterations.
+    The tolerances, warm starts and energy check are those of
+    :class:`IterativeSolver`.
+
+    A solve marks the factor as stale when it needs more than
+    :attr:`max_iterations` iterations per load, or when its iterations took
+    longer than the factorization did, and the next solve factorizes its
+    own matrix. Iterations that stall short of the tolerance factorize the
+    current matrix right away. The symbolic analysis is kept while the
+    sparsity of the system does not change.
+
+    Attributes
+    ----------
+    max_iterations: int
+        The iterations per load above which the factor is renewed.
+    factorizations: int
+        The number of numeric factorizations performed.
+    factor_time: float
+        The seconds the last numeric factorization took.
+
+    """
+
+    preconditioners = ("factor",)
+
+    def __init__(self, nelx: int, nely: int, max_iterations: int = 20,
+                 min_tolerance: float = 1e-8, max_tolerance: float = 1e-2,
+                 tolerance_scale: float = 0.1):
+        """
+        Create a reanalysis solver.
+
+        Parameters
+        ----------
+        nelx:
+            The number of elements in the x-direction.
+        nely:
+            The number of elements in the y-direction.
+        max_iterations:
+            The iterations per load above which the factor is renewed.
+        min_tolerance:
+            The smallest tolerance used.
+        max_tolerance:
+            The largest tolerance used, also the one of the first solve.
+        tolerance_scale:
+            The ratio of the tolerance to the objective change.
+
+        """
+        super().__init__(nelx, nely, "factor", min_tolerance, max_tolerance,
+                         tolerance_scale, 5 * max_iterations)
+        self.max_iterations = max_iterations
+        self.factorizations = 0
+
+        self.factor_time = 0.0
+
+        self.factor = None
+        self.pattern = None
+        self.stale = True
+
+    @staticmethod
+    def default_preconditioner() -> str:
+        """:obj:`str`: The preconditioner used unless another is given."""
+        return "factor"
+
+    def __str__(self) -> str:
+        """Create a string representation of the solver."""
+        return "{}(max_iterations={:d})".format(
+            self.__class__.__name__, self.max_iterations)
+
+    def factorize(self, K: scipy.sparse.csr_matrix) -> None:
+        """
+        Replace the factor with the factorization of K.
+
+        Parameters
+        ----------
+        K:
+            The stiffness matrix of the free degrees of freedom.
+
+        """
+        self.stale = True
+        if not self.matches(K):
+            self.factor = None
+        A = K.tocoo()
+        A = cvxopt.spmatrix(A.data, A.row.astype(int), A.col.astype(int),
+                            A.shape)
+        if self.factor is None:
+            self.factor = cvxopt.cholmod.symbolic(A)
+            self.pattern = (K.indptr.copy(), K.indices.copy())
+        start = time.perf_counter()
+        cvxopt.cholmod.numeric(A, self.factor)
+        self.factor_time = time.perf_counter() - start
+        self.factorizations += 1
+        self.stale = False
+
+    def matches(self, K: scipy.sparse.csr_matrix) -> bool:
+        """
+        Check if the factor was made for a matrix with the sparsity of K.
+
+        Parameters
+        ----------
+        K:
+            The stiffness matrix of the free degrees of freedom.
+
+        Returns
+        -------
+        bool
+            Whether K has the sparsity of the factorized matrix.
+
+        """
+        return self.factor is not None and \
+            numpy.array_equal(K.indptr, self.pattern[0]) and \
+            numpy.array_equal(K.indices, self.pattern[1])
+
+    def build_preconditioner(self, K: scipy.sparse.csr_matrix,
+                             dofs: numpy.ndarray
+                             ) -> scipy.sparse.linalg.LinearOperator:
+        """
+        Build the preconditioner of a system.
+
+        Parameters
+        ----------
+        K:
+            The stiffness matrix of the free degrees of freedom.
+        dofs:
+            The grid degree of freedom of each row of K.
+
+        Returns
+        -------
+        scipy.sparse.linalg.LinearOperator
+            The solve with the last factor, renewed first if stale or made
+            for a matrix of another sparsity.
+
+        """
+        if self.stale or not self.matches(K):
+            self.factorize(K)
+        factor = self.factor
+
+        def apply(r):
+            b = cvxopt.matrix(numpy.ascontiguousarray(r, dtype=float))
+            cvxopt.cholmod.solve(factor, b)
+            return numpy.array(b).ravel()
+
+        return scipy.sparse.linalg.LinearOperator(
+            K.shape, matvec=apply, dtype=K.dtype)
+
+    def solve(self, K: scipy.sparse.coo_matrix, F: cvxopt.matrix,
+              dofs: numpy.ndarray) -> None:
+        """
+        Solve :math:`KU = F` for the displacements of every load.
+
+        Parameters
+        ----------
+        K:
+            The stiffness matrix of the free degrees of freedom.
+        F:
+            The forces of each load, overwritten with the displacements.
+        dofs:
+            The grid degree of freedom of each row of K.
+
+        """
+        iterations, factorizations = self.iterations, self.factorizations
+        start = time.perf_counter()
+        super().solve(K, F, dofs)
+        elapsed = time.perf_counter() - start
+        if self.factorizations > factorizations:
+            elapsed -= self.factor_time
+        # A factor that needs many iterations no longer resembles K, and
+        # iterating longer than a factorization takes does not pay off
+        if self.iterations - iterations > self.max_iterations * F.size[1] or \
+                elapsed > self.factor_time:
+            self.stale = True
+
+    def fallback(self, K: scipy.sparse.csr_matrix, F: cvxopt.matrix,
+                 dofs: numpy.ndarray) -> None:
+        """
+        Solve a system the iterations failed on by factorizing it.
+
+        Parameters
+        ----------
+        K:
+            The stiffness matrix of the free degrees of freedom.
+        F:
+            The forces of each load, overwritten with the displacements.
+        dofs:
+            The grid degree of freedom of each row of K.
+
+        """
+        self.fallbacks += 1
+        self.factorize(K)
+        cvxopt.cholmod.solve(self.factor, F)
+
+
+class ProcessPoolSolver(LinearSolver):
+    """
+    Base of the solvers that spread their work over worker processes.
+
+    Each worker answers the messages sent through its end of a pipe with
+    :meth:`serve` until it is closed, and keeps its state between solves.
+
+    Attributes
+    ----------
+    workers: list
+        The process and the solver's end of the pipe of each worker.
+
+    """
+
+    workers = ()
+
+    @property
+    @abc.abstractmethod
+    def nworkers(self) -> int:
+        """:obj:`int`: The number of worker processes to start."""
+        pass
+
+    @staticmethod
+    @abc.abstractmethod
+    def serve(connection) -> None:
+        """
+        Answer the solver's messages in a worker process until it is closed.
+
+        Parameters
+        ----------
+        connection:
+            The worker's end of the pipe to the solver.
+
+        """
+        pass
+
+    def start(self) -> None:
+        """Start the worker processes if they are not running."""
+        if self.workers:
+            return
+        context = multiprocessing.get_context('spawn')
+        self.workers = []
+        for _ in range(self.nworkers):
+            connection, worker_connection = context.Pipe()
+            process = context.Process(
+                target=self.serve, args=(worker_connection,), daemon=True)
+            process.start()
+            worker_connection.close()
+            self.workers.append((process, connection))
+
+    def close(self) -> None:
+        """Stop the worker processes."""
+        for process, connection in self.workers:
+            try:
+                connection.send(('close',))
+            except (BrokenPipeError, OSError):
+                pass
+            process.join(timeout=5)
+            if process.is_alive():
+                process.terminate()
+            connection.close()
+        self.workers = []
+
+    def __del__(self):
+        """Stop the worker processes with the solver."""
+        self.close()
+
+    def exchange(self, messages: list) -> list:
+        """
+        Send a message to every worker and collect their replies.
+
+        All workers compute concurrently. Every reply is collected before an
+        error is raised, so the workers stay in step with the solver.
+
+        Parameters
+        ----------
+        messages:
+            The message of each worker, None to skip it.
+
+        Returns
+        -------
+        list
+            The reply of each worker, None for the skipped ones.
+
+        """
+        for (_, connection), message in zip(self.workers, messages):
+            if message is not None:
+                connection.send(message)
+        replies = [connection.recv() if message is not None else None
+                   for (_, connection), message in zip(self.workers, messages)]
+        for reply in replies:
+            if reply is not None and reply[0] == 'error':
+                raise reply[1]
+        return [reply[1] if reply is not None else None for reply in replies]
+
+
+class DomainDecompositionSolver(ProcessPoolSolver):
+    r"""
+    Solve the system by non-overlapping domain decomposition.
+
+    The grid is cut across its longer side into strips, separated by lines
+    of interface nodes. No element couples the interiors of two strips, so
+    with the interface degrees of freedom :math:`\Gamma` numbered last the
+    stiffness matrix is block arrow shaped and each strip :math:`i` is
+    eliminated independently. A worker process per strip factorizes its
+    interior block and reduces it onto the interface,
+
+    .. math::
+        S = K_{\Gamma\Gamma} - \sum_i K_{\Gamma i} K_{ii}^{-1} K_{i\Gamma},
+        \quad
+        g = f_\Gamma - \sum_i K_{\Gamma i} K_{ii}^{-1} f_i,
+
+    the dense interface system :math:`S u_\Gamma = g` is solved here, and
+    the workers recover their interiors by back substitution,
+    :math:`u_i = K_{ii}^{-1}(f_i - K_{i\Gamma} u_\Gamma)`. The solve is
+    direct, so it is as robust as a single factorization to the contrast
+    between solid and void elements.
+
+    Attributes
+    ----------
+    nelx: int
+        The number of elements in the x-direction.
+    nely: int
+        The number of elements in the y-direction.
+    axis: int
+        The axis the grid is cut across, 0 for x.
+    cuts: numpy.ndarray
+        The node coordinates of the interface lines along the axis.
+
+    """
+
+    def __init__(self, nelx: int, nely: int, nsubdomains: int):
+        """
+        Create a domain decomposition solver.
+
+        Parameters
+        ----------
+        nelx:
+            The number of elements in the x-direction.
+        nely:
+            The number of elements in the y-direction.
+        nsubdomains:
+            The number of strips, each solved by its own worker process.
+
+        """
+        self.nelx = nelx
+        self.nely = nely
+        # Cutting across the longer side keeps the interface short
+        self.axis = 0 if nelx >= nely else 1
+        length = nelx if self.axis == 0 else nely
+        nsubdomains = max(2, min(nsubdomains, length // 2))
+        self.cuts = numpy.arange(1, nsubdomains) * length // nsubdomains
+
+        self.dofs = None
+
+    def __str__(self) -> str:
+        """Create a string representation of the solver."""
+        return "{}(nsubdomains={:d})".format(
+            self.__class__.__name__, self.nsubdomains)
+
+    @property
+    def nsubdomains(self) -> int:
+        """:obj:`int`: The number of strips."""
+        return self.cuts.size + 1
+
+    def partition(self, dofs: numpy.ndarray) -> None:
+        """
+        Split the free degrees of freedom into the interface and interiors.
+
+        Parameters
+        ----------
+        dofs:
+            The grid degree of freedom of each row of the system.
+
+        """
+        nodes = dofs // 2
+        if self.axis == 0:
+            coordinate = nodes // (self.nely + 1)
+        else:
+            coordinate = nodes % (self.nely + 1)
+
+        on_interface = numpy.isin(coordinate, self.cuts)
+        strip = numpy.searchsorted(self.cuts, coordinate)
+
+        self.dofs = dofs.copy()
+        self.interface = numpy.flatnonzero(on_interface)
+        self.interiors = [numpy.flatnonzero(~on_interface & (strip == i))
+                          for i in range(self.nsubdomains)]
+        # Each strip only touches the interface lines at its two ends
+        interface_coordinate = coordinate[self.interface]
+        self.local_interfaces = [numpy.flatnonzero(numpy.isin(
+            interface_coordinate, self.cuts[max(0, i - 1):i + 1]))
+            for i in range(self.nsubdomains)]
+
+    @property
+    def nworkers(self) -> int:
+        """:obj:`int`: One worker process per strip."""
+        return self.nsubdomains
+
+    @staticmethod
+    def serve(connection) -> None:
+        """
+        Answer the solver's messages in a worker process until it is closed.
+
+        Parameters
+        ----------
+        connection:
+            The worker's end of the pipe to the solver.
+
+        """
+        serve_subdomain(connection)
+
+    def solve(self, K: scipy.sparse.coo_matrix, F: cvxopt.matrix,
+              dofs: numpy.ndarray) -> None:
+        """
+        Solve :math:`KU = F` for the displacements of every load.
+
+        Parameters
+        ----------
+        K:
+            The stiffness matrix of the free degrees of freedom.
+        F:
+            The forces of each load, overwritten with the displacements.
+        dofs:
+            The grid degree of freedom of each row of K.
+
+        """
+        if self.dofs is None or not numpy.array_equal(dofs, self.dofs):
+            self.partition(dofs)
+        self.start()
+
+        K = K.tocsr()
+        B = numpy.asarray(F)  # a view of the cvxopt buffer
+        interface = self.interface
+
+        messages = []
+        for interior, local in zip(self.interiors, self.local_interfaces):
+            if interior.size == 0:
+                messages.append(None)
+                continue
+            rows = K[interior]
+            boundary = interface[local]
+            messages.append(('factor', rows[:, interior].tocsc(),
+                             rows[:, boundary].tocsc(),
+                             K[boundary][:, boundary].tocsc(), B[interior]))
+
+        S = K[interface][:, interface].toarray()
+        g = B[interface]
+        for local, reduced in zip(self.local_interfaces,
+                                  self.exchange(messages)):
+            if reduced is not None:
+                S[numpy.ix_(local, local)] -= reduced[0]
+                g[local] -= reduced[1]
+
+        try:
+            u = scipy.linalg.cho_solve(
+                scipy.linalg.cho_factor(S, lower=True, overwrite_a=True), g)
+        except scipy.linalg.LinAlgError as error:
+            raise ArithmeticError(str(error)) from error
+
+        messages = [None if message is None else ('back', u[local])
+                    for message, local in zip(messages, self.local_interfaces)]
+        for interior, displacements in zip(self.interiors,
+                                           self.exchange(messages)):
+            if displacements is not None:
+                B[interior] = displacements
+        B[interface] = u
+
+
+class ParallelCholmodSolver(CholmodSolver, ProcessPoolSolver):
+    """
+    Factorize the systems of a batched solve concurrently with CHOLMOD.
+
+    Single systems are solved like :class:`CholmodSolver` does. The systems
+    of a batched solve are spread over worker processes, at most one per
+    worker at a time. Their matrices share the sparsity, so its fill
+    reducing ordering is computed once here and each worker keeps the
+    symbolic analysis made with it until the sparsity changes.
+
+    Attributes
+    ----------
+    nprocesses: int
+        The number of worker processes.
+
+    """
+
+    def __init__(self, nprocesses: int):
+        """
+        Create a parallel CHOLMOD solver.
+
+        Parameters
+        ----------
+        nprocesses:
+            The number of systems factorized at the same time.
+
+        """
+        self.nprocesses = nprocesses
+        self.pattern = None
+        # The workers that have not received the current sparsity yet
+        self.outdated = set()
+
+    def __str__(self) -> str:
+        """Create a string representation of the solver."""
+        return "{}(nprocesses={:d})".format(
+            self.__class__.__name__, self.nprocesses)
+
+    @property
+    def nworkers(self) -> int:
+        """:obj:`int`: The number of worker processes to start."""
+        return self.nprocesses
+
+    @staticmethod
+    def serve(connection) -> None:
+        """
+        Answer the solver's messages in a worker process until it is closed.
+
+        Parameters
+        ----------
+        connection:
+            The worker's end of the pipe to the solver.
+
+        """
+        serve_factorization(connection)
+
+    def solve_batch(self, Ks: list, Fs: list, dofs: numpy.ndarray) -> None:
+        """
+        Solve :math:`K_iU_i = F_i` for several matrices of the same sparsity.
+
+        Parameters
+        ----------
+        Ks:
+            The stiffness matrices of the free degrees of freedom, all with
+            the same sparsity.
+        Fs:
+            The forces of each system, overwritten with the displacements.
+        dofs:
+            The grid degree of freedom of each row of the matrices.
+
+        """
+        # Workers started again after a close know no sparsity yet
+        if not self.workers:
+            self.pattern = None
+        self.start()
+
+        K = Ks[0]
+        pattern = None
+        if self.pattern is None or not (
+                numpy.array_equal(K.row, self.pattern[0]) and
+                numpy.array_equal(K.col, self.pattern[1])):
+            rows, cols = K.row.astype(int), K.col.astype(int)
+            order = cvxopt.amd.order(cvxopt.spmatrix(1.0, rows, cols, K.shape))
+            self.pattern = (K.row.copy(), K.col.copy())
+            pattern = (rows, cols, K.shape, order)
+            # Every worker receives the new sparsity with its next system
+            self.outdated = set(range(self.nworkers))
+
+        for start in range(0, len(Ks), self.nworkers):
+            messages = [None] * self.nworkers
+            for worker, (K, F) in enumerate(
+                    zip(Ks[start:], Fs[start:start + self.nworkers])):
+                sent = pattern if worker in self.outdated else None
+                messages[worker] = ('solve', K.data.astype(float, copy=False),
+                                    numpy.array(F), sent)
+                self.outdated.discard(worker)
+            replies = self.exchange(messages)
+            for F, U in zip(Fs[start:start + self.nworkers], replies):
+                numpy.asarray(F)[:] = U
+
+
+def factorize(A: scipy.sparse.csc_matrix):
+    """
+    Factorize a symmetric, possibly indefinite, sparse matrix.
+
+    Positive definite matrices are factorized by CHOLMOD. The others, such as
+    the dynamic stiffness above the first resonance, fall back to SuperLU.
+
+    Parameters
+    ----------
+    A:
+        The symmetric matrix to factorize.
+
+    Returns
+    -------
+    callable
+        Solves the system for a dense array of right-hand sides.
+
+    Raises
+    ------
+        ArithmeticError: A is singular.
+
+    """
+    B = A.tocoo()
+    B = cvxopt.spmatrix(B.data, B.row.astype(int), B.col.astype(int), B.shape)
+    try:
+        factor = cvxopt.cholmod.symbolic(B)
+        cvxopt.cholmod.numeric(B, factor)
+    except ArithmeticError:
+        try:
+            return scipy.sparse.linalg.splu(A.tocsc()).solve
+        except RuntimeError as error:  # SuperLU reports singular matrices
+            raise ArithmeticError(str(error)) from error
+
+    def solve(F: numpy.ndarray) -> numpy.ndarray:
+        X = cvxopt.matrix(F)
+        cvxopt.cholmod.solve(factor, X)
+        return numpy.array(X)
+
+    return solve
+
+
+def schur_complement(Kii: scipy.sparse.csc_matrix,
+                     KiG: scipy.sparse.csc_matrix,
+                     KGG: scipy.sparse.csc_matrix,
+                     order: cvxopt.matrix) -> numpy.ndarray:
+    r"""
+    Reduce the interior of a strip onto its interface.
+
+    Factorizes the strip bordered by its interface with the interface
+    numbered last. The trailing block of the factor is then
+    :math:`L_{\Gamma\Gamma}L_{\Gamma\Gamma}^T = K_{\Gamma\Gamma} -
+    K_{\Gamma i}K_{ii}^{-1}K_{i\Gamma}`, which takes one factorization
+    instead of a solve per interface degree of freedom.
+
+    Parameters
+    ----------
+    Kii:
+        The interior block of the strip.
+    KiG:
+        The coupling of the interior to the strip's interface.
+    KGG:
+        The interface block, any matrix that keeps the bordered matrix
+        positive definite.
+    order:
+        The fill reducing ordering of the interior.
+
+    Returns
+    -------
+    numpy.ndarray
+        The strip's share :math:`K_{\Gamma i}K_{ii}^{-1}K_{i\Gamma}` of the
+        Schur complement.
+
+    Notes
+    -----
+    cvxopt only takes CHOLMOD's options from the module wide
+    ``cvxopt.cholmod.options``, which are changed for the factorization and
+    restored after it. This only runs in the worker processes of
+    :class:`DomainDecompositionSolver`, where nothing else factorizes
+    concurrently.
+
+    """
+    n, m = KiG.shape
+    A = scipy.sparse.bmat([[Kii, None], [KiG.T, KGG]]).tocoo()
+    A = cvxopt.spmatrix(A.data, A.row.astype(int), A.col.astype(int),
+                        A.shape)
+    p = cvxopt.matrix(numpy.concatenate(
+        [numpy.asarray(order).ravel(), numpy.arange(n, n + m)]))
+    # Keep CHOLMOD from replacing or postordering the given ordering
+    options = dict(cvxopt.cholmod.options)
+    cvxopt.cholmod.options.update({'nmethods': 1, 'postorder': False})
+    try:
+        F = cvxopt.cholmod.symbolic(A, p=p)
+        cvxopt.cholmod.numeric(A, F)
+    finally:
+        cvxopt.cholmod.options.clear()
+        cvxopt.cholmod.options.update(options)
+    L = cvxopt.cholmod.getfactor(F)
+    colptr, rows, values = L.CCS
+    L = scipy.sparse.csc_matrix(
+        (numpy.asarray(values).ravel(), numpy.asarray(rows).ravel(),
+         numpy.asarray(colptr).ravel()), shape=L.size)
+    LGG = L[n:, n:].toarray()
+    return KGG.toarray() - LGG @ LGG.T
+
+
+def serve_subdomain(connection) -> None:
+    """
+    Eliminate the interior of one strip for a domain decomposition solver.
+
+    Runs in a worker process, answering the solver's messages until it is
+    closed. The ordering and symbolic analysis of the interior are kept
+    while its sparsity does not change.
+
+    Parameters
+    ----------
+    connection:
+        The worker's end of the pipe to the solver.
+
+    """
+    pattern, order, symbolic = None, None, None
+    while True:
+        message = connection.recv()
+        if message[0] == 'close':
+            break
+        try:
+            if message[0] == 'factor':
+                _, Kii, KiG, KGG, fi = message
+                A = Kii.tocoo()
+                A = cvxopt.spmatrix(A.data, A.row.astype(int),
+                                    A.col.astype(int), A.shape)
+                if pattern is None or not (
+                        numpy.array_equal(Kii.indptr, pattern[0]) and
+                        numpy.array_equal(Kii.indices, pattern[1])):
+                    pattern = (Kii.indptr, Kii.indices)
+                    order = cvxopt.amd.order(A)
+                    symbolic = cvxopt.cholmod.symbolic(A, p=order)
+                cvxopt.cholmod.numeric(A, symbolic)
+
+                # K_ii^{-1} f_i, reused by the back substitution
+                z = cvxopt.matrix(fi)
+                cvxopt.cholmod.solve(symbolic, z)
+                z = numpy.array(z)
+
+                S = schur_complement(Kii, KiG, KGG, order)
+                connection.send(('ok', (S, KiG.T @ z)))
+            elif message[0] == 'back':
+                w = cvxopt.matrix(KiG @ message[1])
+                cvxopt.cholmod.solve(symbolic, w)
+                connection.send(('ok', z - numpy.asarray(w)))
+        except Exception as error:
+            connection.send(('error', error))
+
+
+def serve_factorization(connection) -> None:
+    """
+    Factorize and solve the systems of a parallel CHOLMOD solver.
+
+    Runs in a worker process, answering the solver's messages until it is
+    closed. The symbolic analysis is kept while the sparsity does not
+    change.
+
+    Parameters
+    ----------
+    connection:
+        The worker's end of the pipe to the solver.
+
+    """
+    pattern, symbolic = None, None
+    while True:
+        message = connection.recv()
+        if message[0] == 'close':
+            break
+        try:
+            if message[0] == 'solve':
+                _, values, F, sent = message
+                if sent is not None:
+                    pattern, symbolic = sent, None
+                rows, cols, shape, order = pattern
+                A = cvxopt.spmatrix(values, rows, cols, shape)
+                if symbolic is None:
+                    symbolic = cvxopt.cholmod.symbolic(A, p=order)
+                cvxopt.cholmod.numeric(A, symbolic)
+                B = cvxopt.matrix(F)
+                cvxopt.cholmod.solve(symbolic, B)
+                connection.send(('ok', numpy.array(B)))
+        except Exception as error:
+            connection.send(('error', error))
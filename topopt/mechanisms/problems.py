@@ -5,7 +5,6 @@ import scipy.sparse
 
 from ..problems import ElasticityProblem
 from .boundary_conditions import MechanismSynthesisBoundaryConditions
-from ..utils import deleterowcol
 
 
 class MechanismSynthesisProblem(ElasticityProblem):
@@ -58,56 +57,76 @@ class MechanismSynthesisProblem(ElasticityProblem):
         return ElasticityProblem.lk(1e0, nu)
 
     def __init__(
-            self, bc: MechanismSynthesisBoundaryConditions, penalty: float):
+            self, bc: MechanismSynthesisBoundaryConditions, penalty: float,
+            Emax: float = 1e2, nu: float = 0.3,
+            spring_stiffnesses: numpy.ndarray = (10.0, 10.0)):
         """
         Create the topology optimization problem.
 
         Parameters
         ----------
-        nelx:
-            Number of elements in the x direction.
-        nely:
-            Number of elements in the x direction.
+        bc:
+            Boundary conditions of the problem. The first load is the input
+            force and the second the negated unit load at the output.
         penalty:
             Penalty value used to penalize fractional densities in SIMP.
-        bc:
-            Boundary conditions of the problem.
+        Emax:
+            Young's modulus of the solid material.
+        nu:
+            Poisson's ratio of the material.
+        spring_stiffnesses:
+            Stiffness of the springs on the degrees of freedom of each load,
+            the actuator and the workpiece.
 
         """
-        super().__init__(bc, penalty)
-        self.Emin = 1e-6  # Minimum stiffness of elements
-        self.Emax = 1e2  # Maximum stiffness of elements
+        super().__init__(bc, penalty, Emax, nu)
+        self.Emin = 1e-8 * Emax  # Minimum stiffness of elements
         # Spring stiffnesses for the actuator and output displacement
-        self.spring_stiffnesses = numpy.full(
-            numpy.nonzero(self.f)[0].shape, 10.0)
+        self.spring_stiffnesses = numpy.repeat(
+            numpy.asarray(spring_stiffnesses, dtype=float),
+            numpy.diff(self.spring_loads.indptr))
+
+    @property
+    def spring_loads(self) -> scipy.sparse.csc_matrix:
+        """:obj:`scipy.sparse.csc_matrix`: The loads without explicit zeros."""
+        f = self.f.tocsc(copy=True)
+        f.eliminate_zeros()
+        return f
+
+    @property
+    def displacements(self) -> numpy.ndarray:
+        """:obj:`numpy.ndarray`: The displacements of the input load."""
+        return self.u[:, :1]
+
+    def build_indices(self) -> None:
+        """
+        Build the index vectors for the finite element coo matrix format.
+
+        The diagonal entries of the springs are appended to the ones of the
+        elements, so the springs are summed into K with the elements instead
+        of being added to the assembled matrix.
+        """
+        super().build_indices()
+        spring_dofs = self.spring_loads.indices
+        self.iK = numpy.concatenate((self.iK, spring_dofs))
+        self.jK = numpy.concatenate((self.jK, spring_dofs))
 
-    def build_K(self, xPhys: numpy.ndarray, remove_constrained: bool = True
-                ) -> scipy.sparse.coo.coo_matrix:
+    def stiffness_values(self, xPhys: numpy.ndarray) -> numpy.ndarray:
         """
-        Build the stiffness matrix for the problem.
+        Compute the values of the stiffness matrix triplets.
 
         Parameters
         ----------
         xPhys:
             The element densisities used to build the stiffness matrix.
-        remove_constrained:
-            Should the constrained nodes be removed?
 
         Returns
         -------
-            The stiffness matrix for the mesh.
+            The values of the elements followed by the spring stiffnesses.
 
         """
-        # Build the stiffness matrix using inheritance
-        K = super().build_K(xPhys, remove_constrained=False).tocsc()
-        # Add spring stiffnesses
-        spring_ids = numpy.nonzero(self.f)[0]
-        K[spring_ids, spring_ids] += self.spring_stiffnesses
-        # K = (K.T + K) / 2.  # Make sure the stiffness matrix is symmetric
-        # Remove constrained dofs from matrix and convert to coo
-        if remove_constrained:
-            K = deleterowcol(K, self.fixed, self.fixed)
-        return K.tocoo()
+        return numpy.concatenate(
+            (super().stiffness_values(xPhys), self.spring_stiffnesses))
 
     def compute_objective(self, xPhys: numpy.ndarray, dobj: numpy.ndarray
                           ) -> float:
@@ -145,12 +164,13 @@ class MechanismSynthesisProblem(ElasticityProblem):
             The objective of the compliant mechanism synthesis problem.
 
         """
-        # Setup and solve FE problem
+        # Setup and solve FE problem, the displacements and λ are solved
+        # together on one factorization of K
         self.update_displacements(xPhys)
 
         u = self.u[:, 0][self.edofMat].reshape(-1, 8)  # Displacement
         λ = self.u[:, 1][self.edofMat].reshape(-1, 8)  # Fixed vector (Kλ = -l)
-        obj = self.f[:, 1].T @ self.u[:, 0]
+        obj = (self.f[:, 1].T @ self.u[:, 0]).item()
         self.obje[:] = (λ @ self.KE * u).sum(1)
         self.compute_young_moduli(xPhys, dobj)  # Stores the derivative in dobj
         dobj *= -self.obje
@@ -1,6 +1,8 @@
 """Topology optimization problem to solve."""
 
 import abc
+import logging
+import warnings
 
 import numpy
 import scipy.sparse
@@ -8,7 +10,10 @@ import scipy.sparse.linalg
 import cvxopt
 import cvxopt.cholmod
 
+from . import kernels
 from .boundary_conditions import BoundaryConditions
+from .linear_solvers import CholmodSolver, LinearSolver, factorize
+from .quadtree import Quadtree
 from .utils import deleterowcol
 
 
@@ -22,7 +27,7 @@ class Problem(abc.ABC):
         The boundary conditions for the problem.
     penalty: float
         The SIMP penalty value.
-    f: numpy.ndarray
+    f: scipy.sparse.csc_matrix
         The right-hand side of the FEM equation (forces).
     u: numpy.ndarray
         The variables of the FEM equation.
@@ -61,7 +66,7 @@ class Problem(abc.ABC):
         self.free = numpy.setdiff1d(dofs, self.fixed)
 
         # RHS and Solution vectors
-        self.f = bc.forces
+        self.f = bc.sparse_forces
         self.u = numpy.zeros(self.f.shape)
 
         # Per element objective
@@ -80,8 +85,20 @@ class Problem(abc.ABC):
         return "{}(bc={!r}, penalty={:g})".format(
             self.__class__.__name__, self.penalty, self.bc)
 
-    def penalize_densities(self, x: numpy.ndarray, drho: numpy.ndarray = None
-                           ) -> numpy.ndarray:
+    def adapt_solve_tolerance(self, change: float) -> None:
+        """
+        Adapt the accuracy of the next analyses to the optimization's progress.
+
+        Parameters
+        ----------
+        change:
+            The relative change of the objective in the last iteration.
+
+        """
+        pass
+
+    def penalize_densities(self, x: numpy.ndarray, drho: numpy.ndarray = None,
+                           out: numpy.ndarray = None) -> numpy.ndarray:
         """
         Compute the penalized densties (and optionally its derivative).
 
@@ -92,6 +109,9 @@ class Problem(abc.ABC):
         drho:
             The derivative of the penealized densities to compute. Only set if
             drho is not None.
+        out:
+            The array to write the penalized densities into. A new array is
+            allocated if out is None.
 
         Returns
         -------
@@ -99,12 +119,13 @@ class Problem(abc.ABC):
             The penalized densities used for SIMP.
 
         """
-        rho = x**self.penalty
+        rho = numpy.power(x, self.penalty, out=out)
         if drho is not None:
             assert(drho.shape == x.shape)
-            drho[:] = rho
-            valid = x != 0  # valid values for division
-            drho[valid] *= self.penalty / x[valid]
+            drho[:] = 0
+            # avoid 0**(p - 1) for p < 1
+            numpy.power(x, self.penalty - 1, out=drho, where=x != 0)
+            drho *= self.penalty
         return rho
 
     @abc.abstractmethod
@@ -128,6 +149,28 @@ class Problem(abc.ABC):
         """
         pass
 
+    def compute_objectives(self, xPhys: list, dobj: list) -> list:
+        """
+        Compute the objective and its gradient for several designs.
+
+        The designs are analysed one after the other, problems that can
+        solve them together override this.
+
+        Parameters
+        ----------
+        xPhys:
+            The design variables of each design.
+        dobj:
+            The gradient of the objective to compute for each design.
+
+        Returns
+        -------
+        list
+            The objective value of each design.
+
+        """
+        return [self.compute_objective(x, d) for x, d in zip(xPhys, dobj)]
+
 
 class ElasticityProblem(Problem):
     """
@@ -141,15 +184,40 @@ class ElasticityProblem(Problem):
         The Young's modulus use for the solid regions.
     nu: float
         Poisson's ratio of the material.
-    f: numpy.ndarray
+    f: scipy.sparse.csc_matrix
         The right-hand side of the FEM equation (forces).
     u: numpy.ndarray
         The variables of the FEM equation (displacments).
     nloads: int
         The number of loads applied to the material.
+    load_cases: int
+        The number of load cases the compliance averages over. Several
+        loads can make up one load case whose compliances add up.
+    f_free: scipy.sparse.coo_matrix
+        The forces on the free degrees of freedom.
+    rhs: cvxopt.matrix
+        The right-hand side buffer the linear solve overwrites with the
+        displacements of the free degrees of freedom.
+    assembled: numpy.ndarray
+        Which elements are assembled into the finite element system.
+    elements: numpy.ndarray
+        The indices of the assembled elements.
+    removed: numpy.ndarray
+        The degrees of freedom left out of the solve, the fixed ones and the
+        ones no assembled element touches.
+    linear_solver: LinearSolver
+        The solver of the reduced system.
+    dtype: numpy.dtype
+        The precision the values of the stiffness matrix are stored in.
+    refinements: int
+        The number of double precision corrections of the displacements.
 
     """
 
+    # Relative residual the displacements are refined to in mixed precision
+    refinement_tolerance = 1e-9
+    max_refinements = 20
+
     @staticmethod
     def lk(E: float = 1.0, nu: float = 0.3) -> numpy.ndarray:
         """
@@ -204,14 +272,33 @@ class ElasticityProblem(Problem):
         self.nu = nu
         self.build_indices()
 
-        # BC's and support (half MBB-beam)
-        self.bc = bc
-        dofs = numpy.arange(self.ndof)
-        self.fixed = bc.fixed_nodes
-        self.free = numpy.setdiff1d(dofs, self.fixed)
-
         # Number of loads
         self.nloads = self.f.shape[1]
+        self.load_cases = bc.load_cases
+
+        # Reduced RHS and the buffer it is scattered into for every solve
+        self.f_free = self.f[self.free, :].tocoo()
+        self.rhs = cvxopt.matrix(0.0, (self.free.size, self.nloads))
+
+        # Every element is assembled until set_active_elements says otherwise
+        self.assembled = numpy.ones(self.nel, dtype=bool)
+        self.elements = numpy.arange(self.nel)
+        self.element_dofs = self.edofMat
+        self.removed = self.fixed
+
+        # Work buffers of the sensitivity kernel
+        self.E = numpy.empty(self.nel)
+        self.dE = numpy.empty(self.nel)
+        self.drho = numpy.empty(self.nel)
+        self.uT = numpy.empty((self.nloads, self.ndof))
+        self.ue = numpy.empty((self.nloads, self.nel, 8))
+        self.KEue = numpy.empty((self.nloads, self.nel, 8))
+        self.energies = None
+
+        self.linear_solver: LinearSolver = CholmodSolver()
+
+        self.dtype = numpy.dtype(numpy.float64)
+        self.refinements = 0
 
     def build_indices(self) -> None:
         """Build the index vectors for the finite element coo matrix format."""
@@ -229,8 +316,87 @@ class ElasticityProblem(Problem):
         self.iK = numpy.kron(self.edofMat, numpy.ones((8, 1))).flatten()
         self.jK = numpy.kron(self.edofMat, numpy.ones((1, 8))).flatten()
 
-    def compute_young_moduli(self, x: numpy.ndarray, dE: numpy.ndarray = None
-                             ) -> numpy.ndarray:
+    @property
+    def mixed_precision(self) -> bool:
+        """:obj:`bool`: Are the stiffness values stored in single precision?"""
+        return self.dtype != numpy.float64
+
+    def set_precision(self, dtype: numpy.dtype) -> None:
+        """
+        Select the precision the values of the stiffness matrix are stored in.
+
+        Single precision halves the memory and bandwidth of assembling K, but
+        the rounding of its values moves the displacements by far more than
+        the rounding itself, since stiff regions mostly move as rigid bodies.
+        Every solve is then refined in double precision against the exact
+        system until its residual falls under :attr:`refinement_tolerance`.
+        The element energies are computed from these double precision
+        displacements and stored in the precision of K; computed from
+        rounded displacements they lose the strain for the same reason.
+
+        Single precision cannot resolve the stiffness contrast void regions
+        reach on large grids. When the rounded K is no longer positive
+        definite, or the refinement stalls, the problem switches to double
+        precision for good.
+
+        Parameters
+        ----------
+        dtype:
+            numpy.float32 for mixed precision or numpy.float64.
+
+        """
+        self.dtype = numpy.dtype(dtype)
+        self.obje = self.obje.astype(self.dtype)
+        if self.energies is not None:
+            self.energies = self.energies.astype(self.dtype)
+
+    @property
+    def displacements(self) -> numpy.ndarray:
+        """:obj:`numpy.ndarray`: The last solved displacements of each load."""
+        return self.u
+
+    @property
+    def eliminated(self) -> bool:
+        """:obj:`bool`: Are some elements left out of the system?"""
+        return self.elements.size < self.edofMat.shape[0]
+
+    def set_active_elements(self, assembled: numpy.ndarray) -> None:
+        """
+        Select the elements assembled into the finite element system.
+
+        The degrees of freedom only touched by the other elements are removed
+        from the solve along with the fixed ones and stay at zero, so the
+        cost of assembly, factorization and sensitivities tracks the
+        assembled elements. The others get zero element energies.
+
+        Parameters
+        ----------
+        assembled:
+            Which elements to assemble.
+
+        """
+        self.assembled = assembled.copy()
+        self.elements = numpy.flatnonzero(assembled)
+        self.element_dofs = self.edofMat[self.elements]
+        self.iK = numpy.kron(self.element_dofs, numpy.ones((8, 1))).flatten()
+        self.jK = numpy.kron(self.element_dofs, numpy.ones((1, 8))).flatten()
+
+        used = numpy.zeros(self.ndof, dtype=bool)
+        used[self.element_dofs] = True
+        used[self.fixed] = False
+        self.free = numpy.flatnonzero(used)
+        self.removed = numpy.flatnonzero(~used)
+
+        self.f_free = self.f[self.free, :].tocoo()
+        self.rhs = cvxopt.matrix(0.0, (self.free.size, self.nloads))
+
+        nelements = self.elements.size
+        self.ue = numpy.empty((self.nloads, nelements, 8))
+        self.KEue = numpy.empty((self.nloads, nelements, 8))
+        self.energies = numpy.empty(nelements, dtype=self.obje.dtype) if self.eliminated else None
+
+    def compute_young_moduli(self, x: numpy.ndarray, dE: numpy.ndarray = None,
+                             out: numpy.ndarray = None) -> numpy.ndarray:
         """
         Compute the Young's modulus of each element from the densties.
 
@@ -243,6 +409,9 @@ class ElasticityProblem(Problem):
         dE:
             The derivative of Young's moduli to compute. Only set if dE is not
             None.
+        out:
+            The array to write the Young's moduli into. A new array is
+            allocated if out is None.
 
         Returns
         -------
@@ -250,12 +419,82 @@ class ElasticityProblem(Problem):
             The elements' Young's modulus.
 
         """
-        drho = None if dE is None else numpy.empty(x.shape)
-        rho = self.penalize_densities(x, drho)
+        drho = None if dE is None else self.drho
+        E = self.penalize_densities(x, drho, out)
         if drho is not None and dE is not None:
             assert(dE.shape == x.shape)
-            dE[:] = (self.Emax - self.Emin) * drho
-        return (self.Emax - self.Emin) * rho + self.Emin
+            numpy.multiply(self.Emax - self.Emin, drho, out=dE)
+        E *= self.Emax - self.Emin
+        E += self.Emin
+        return E
+
+    def compute_element_energies(self, KE: numpy.ndarray,
+                                 out: numpy.ndarray) -> numpy.ndarray:
+        r"""
+        Compute the element energies summed over all loads.
+
+        Computes :math:`\sum_i \mathbf{u}_{e,i}^T\mathbf{K}_E
+        \mathbf{u}_{e,i}` for every element :math:`e` with a single matrix
+        product over all elements and loads, using the problem's work buffers.
+
+        Parameters
+        ----------
+        KE:
+            The symmetric element matrix.
+        out:
+            The array to write the energy of each element into.
+
+        Returns
+        -------
+        numpy.ndarray
+            The energy of each element.
+
+        """
+        energies = self.energies if self.eliminated else out
+        if kernels.use_jit():
+            kernels.element_energies(self.u, self.element_dofs, KE, energies)
+        else:
+            # Gather the element displacements of every load, (nloads, nel,
+            # 8). The indices are always valid, and mode='clip' writes
+            # straight into the buffer where the default mode would stage a
+            # copy
+            numpy.copyto(self.uT, self.u.T)
+            for i in range(self.nloads):
+                numpy.take(self.uT[i], self.element_dofs, out=self.ue[i],
+                           mode='clip')
+            numpy.matmul(self.ue.reshape(-1, 8), KE,
+                         out=self.KEue.reshape(-1, 8))
+            numpy.einsum('lej,lej->e', self.ue, self.KEue, out=energies,
+                         casting='same_kind')
+        if energies is not out:
+            out.fill(0)
+            out[self.elements] = energies
+        return out
+
+    def stiffness_values(self, xPhys: numpy.ndarray) -> numpy.ndarray:
+        """
+        Compute the values of the stiffness matrix triplets.
+
+        Parameters
+        ----------
+        xPhys:
+            The element densisities used to build the stiffness matrix.
+
+        Returns
+        -------
+        numpy.ndarray
+            The values at the rows and columns of :attr:`iK` and :attr:`jK`.
+
+        """
+        E = self.compute_young_moduli(xPhys)
+        if self.eliminated:
+            E = E[self.elements]
+        KE = self.KE
+        if self.mixed_precision:
+            KE, E = KE.astype(self.dtype), E.astype(self.dtype)
+        if kernels.use_jit():
+            return kernels.stiffness_values(KE, E)
+        return ((KE.flatten()[numpy.newaxis]).T * E).flatten(order='F')
 
     def build_K(self, xPhys: numpy.ndarray, remove_constrained: bool = True
                 ) -> scipy.sparse.coo_matrix:
@@ -275,16 +514,16 @@ class ElasticityProblem(Problem):
             The stiffness matrix for the mesh.
 
         """
-        sK = ((self.KE.flatten()[numpy.newaxis]).T *
-              self.compute_young_moduli(xPhys)).flatten(order='F')
+        sK = self.stiffness_values(xPhys)
         K = scipy.sparse.coo_matrix(
             (sK, (self.iK, self.jK)), shape=(self.ndof, self.ndof))
         if remove_constrained:
             # Remove constrained dofs from matrix and convert to coo
-            K = deleterowcol(K.tocsc(), self.fixed, self.fixed).tocoo()
+            K = deleterowcol(K.tocsc(), self.removed, self.removed).tocoo()
         return K
 
-    def compute_displacements(self, xPhys: numpy.ndarray) -> numpy.ndarray:
+    def compute_displacements(self, xPhys: numpy.ndarray,
+                              out: numpy.ndarray = None) -> numpy.ndarray:
         """
         Compute the displacements given the densities.
 
@@ -296,6 +535,9 @@ class ElasticityProblem(Problem):
         ----------
         xPhys:
             The element densisities used to build the stiffness matrix.
+        out:
+            The array to write the displacements into. A new array is
+            allocated if out is None.
 
         Returns
         -------
@@ -306,14 +548,120 @@ class ElasticityProblem(Problem):
         """
         # Setup and solve FE problem
         K = self.build_K(xPhys)
-        K = cvxopt.spmatrix(
-            K.data, K.row.astype(int), K.col.astype(int))
-        # Solve system
-        F = cvxopt.matrix(self.f[self.free, :])
-        cvxopt.cholmod.linsolve(K, F)  # F stores solution after solve
-        new_u = self.u.copy()
-        new_u[self.free, :] = numpy.array(F)[:, :]
-        return new_u
+        F = self.load_rhs()
+        if self.mixed_precision:
+            E = self.compute_young_moduli(xPhys)[self.elements]
+            try:
+                self.refinements += self.linear_solver.solve_refined(
+                    K, F, self.free, lambda U: self.apply_stiffness(E, U),
+                    self.refinement_tolerance, self.max_refinements)
+            except ArithmeticError:
+                # The stiffness spans more than single precision resolves
+                # once void regions appear, and only grows from there
+                logging.warning("The single precision stiffness cannot be "
+                                "solved, switching to double precision")
+                self.set_precision(numpy.float64)
+                K = self.build_K(xPhys)
+                F = self.load_rhs()
+        if not self.mixed_precision:
+            self.linear_solver.solve(K, F, self.free)  # F stores the solution
+        if out is None:
+            out = numpy.zeros(self.u.shape)
+        out[self.free, :] = numpy.asarray(F)
+        out[self.removed, :] = 0
+        return out
+
+    def compute_displacements_batch(self, xPhys: list) -> list:
+        """
+        Compute the displacements of several designs with one batched solve.
+
+        The stiffness matrices of all designs share their sparsity, so the
+        linear solver analyses it once and may factorize them concurrently.
+        Their values are solved in double precision.
+
+        Parameters
+        ----------
+        xPhys:
+            The element densities of each design.
+
+        Returns
+        -------
+        list
+            The displacements of each design.
+
+        """
+        Ks = [self.build_K(x) for x in xPhys]
+        F = numpy.array(self.load_rhs())
+        Fs = [cvxopt.matrix(F) for _ in Ks]
+        self.linear_solver.solve_batch(Ks, Fs, self.free)
+        displacements = []
+        for F in Fs:
+            u = numpy.zeros(self.u.shape)
+            u[self.free, :] = numpy.asarray(F)
+            displacements.append(u)
+        return displacements
+
+    def apply_stiffness(self, E: numpy.ndarray,
+                        U: numpy.ndarray) -> numpy.ndarray:
+        """
+        Multiply displacements by the stiffness matrix in double precision.
+
+        The stiffness matrix is applied element by element with the double
+        precision element matrix, so the product is the one of the exact
+        system whatever precision K is assembled in.
+
+        Parameters
+        ----------
+        E:
+            The Young's modulus of each assembled element.
+        U:
+            The displacements of the free degrees of freedom, one column per
+            vector.
+
+        Returns
+        -------
+        numpy.ndarray
+            The product :math:`KU` on the free degrees of freedom.
+
+        """
+        u, ue, KEue = self.uT[0], self.ue[0], self.KEue[0]
+        KU = numpy.empty(U.shape)
+        for i in range(U.shape[1]):
+            u[:] = 0
+            u[self.free] = U[:, i]
+            numpy.take(u, self.element_dofs, out=ue, mode='clip')
+            numpy.matmul(ue, self.KE, out=KEue)
+            KEue *= E[:, numpy.newaxis]
+            KU[:, i] = numpy.bincount(self.element_dofs.ravel(), KEue.ravel(),
+                                      self.ndof)[self.free]
+        return KU
+
+    def adapt_solve_tolerance(self, change: float) -> None:
+        """
+        Adapt the accuracy of the next solves to the optimization's progress.
+
+        Parameters
+        ----------
+        change:
+            The relative change of the objective in the last iteration.
+
+        """
+        self.linear_solver.adapt_tolerance(change)
+
+    def load_rhs(self) -> cvxopt.matrix:
+        """
+        Scatter the reduced forces into the right-hand side buffer.
+
+        Returns
+        -------
+        cvxopt.matrix
+            The right-hand side buffer, ready to be solved in place.
+
+        """
+        F = numpy.asarray(self.rhs)  # a view of the cvxopt buffer
+        F[:] = 0
+        F[self.f_free.row, self.f_free.col] = self.f_free.data
+        return self.rhs
 
     def update_displacements(self, xPhys: numpy.ndarray) -> None:
         """
@@ -325,7 +673,7 @@ class ElasticityProblem(Problem):
             The element densisities used to compute the displacements.
 
         """
-        self.u[:, :] = self.compute_displacements(xPhys)
+        self.compute_displacements(xPhys, self.u)
 
 
 class ComplianceProblem(ElasticityProblem):
@@ -342,8 +690,69 @@ class ComplianceProblem(ElasticityProblem):
     where :math:`\mathbf{f}` are the forces, :math:`\mathbf{u}` are the \
     displacements, :math:`\mathbf{K}` is the striffness matrix, and :math:`V`
     is the volume.
+
+    Elements in void regions are left out of the finite element system, and
+    with `void_iterations` so are elements that stayed void for that many
+    evaluations. These come back as soon as their density rises again.
     """
 
+    # Physical densities at or below this count as void
+    void_threshold = 1e-3
+
+    def __init__(self, bc: BoundaryConditions, penalty: float,
+                 Emax: float = 1.0, nu: float = 0.3, void_iterations: int = 0):
+        """
+        Create the topology optimization problem.
+
+        Parameters
+        ----------
+        bc:
+            The boundary conditions of the problem.
+        penalty:
+            The penalty value used to penalize fractional densities in SIMP.
+        Emax:
+            The Young's modulus of the solid material.
+        nu:
+            The Poisson's ratio of the material.
+        void_iterations:
+            The number of consecutive evaluations an element must stay void
+            before it is eliminated, 0 to only eliminate void regions.
+
+        """
+        super().__init__(bc, penalty, Emax, nu)
+        self.void_iterations = void_iterations
+        self.void_count = numpy.zeros(self.nel, dtype=int)
+
+        # Elements carrying loads always stay, or their loads would be lost
+        loaded = numpy.zeros(self.ndof, dtype=bool)
+        loaded[self.f.nonzero()[0]] = True
+        self.loaded = loaded[self.edofMat].any(axis=1)
+
+        self.void = numpy.zeros(self.nel, dtype=bool)
+        self.void[bc.passive_elements] = True
+        self.void &= ~self.loaded
+        if self.void.any():
+            self.set_active_elements(~self.void)
+
+    def update_active_elements(self, xPhys: numpy.ndarray) -> None:
+        """
+        Eliminate the elements that stayed void and restore the others.
+
+        Parameters
+        ----------
+        xPhys:
+            The element densities.
+
+        """
+        void = xPhys <= self.void_threshold
+        self.void_count[void] += 1
+        self.void_count[~void] = 0
+
+        assembled = ~self.void & (
+            (self.void_count < self.void_iterations) | self.loaded)
+        if not numpy.array_equal(assembled, self.assembled):
+            self.set_active_elements(assembled)
+
     def compute_objective(
             self, xPhys: numpy.ndarray, dobj: numpy.ndarray) -> float:
         r"""
@@ -379,19 +788,383 @@ class ComplianceProblem(ElasticityProblem):
 
         """
         # Setup and solve FE problem
-        self.update_displacements(xPhys)
+        if self.void_iterations > 0:
+            self.update_active_elements(xPhys)
+        try:
+            self.update_displacements(xPhys)
+        except ArithmeticError:
+            if not self.eliminated or numpy.array_equal(
+                    self.assembled, ~self.void):
+                raise
+            # Eliminating elements can leave material floating free of the
+            # supports, so bring them all back and solve again
+            self.void_count[:] = 0
+            self.set_active_elements(~self.void)
+            self.update_displacements(xPhys)
+
+        return self.compute_compliance(xPhys, dobj)
+
+    def compute_objectives(self, xPhys: list, dobj: list) -> list:
+        """
+        Compute compliance and its gradient for several designs.
 
-        obj = 0.0
-        dobj[:] = 0.0
+        All designs are solved together by the linear solver's batched solve.
+        The displacements of the last design are kept in :attr:`u`.
+
+        Parameters
+        ----------
+        xPhys:
+            The element densities of each design.
+        dobj:
+            The gradient of compliance to compute for each design.
+
+        Returns
+        -------
+        list
+            The compliance of each design.
+
+        """
+        # An element void in every design is left out of all of them
+        if self.void_iterations > 0:
+            self.update_active_elements(numpy.max(xPhys, axis=0))
+        try:
+            displacements = self.compute_displacements_batch(xPhys)
+        except ArithmeticError:
+            if not self.eliminated or numpy.array_equal(
+                    self.assembled, ~self.void):
+                raise
+            self.void_count[:] = 0
+            self.set_active_elements(~self.void)
+            displacements = self.compute_displacements_batch(xPhys)
+
+        objs = []
+        for x, d, u in zip(xPhys, dobj, displacements):
+            self.u[:] = u
+            objs.append(self.compute_compliance(x, d))
+        return objs
+
+    def compute_compliance(self, xPhys: numpy.ndarray,
+                           dobj: numpy.ndarray) -> float:
+        """
+        Compute compliance and its gradient from the solved displacements.
+
+        Parameters
+        ----------
+        xPhys:
+            The element densities.
+        dobj:
+            The gradient of compliance.
+
+        Returns
+        -------
+        float
+            The compliance value.
+
+        """
+        E = self.compute_young_moduli(xPhys, self.dE, out=self.E)
+        self.compute_element_energies(self.KE, self.obje)
+        obj = E @ self.obje
+        numpy.multiply(self.dE, self.obje, out=dobj)
+        dobj *= -1.0 / self.load_cases
+        return obj / float(self.load_cases)
+
+    def hessian_product(self, xPhys: numpy.ndarray,
+                        v: numpy.ndarray) -> numpy.ndarray:
+        r"""
+        Multiply the Hessian of compliance by a direction.
+
+        With :math:`\mathbf{K} = \sum_e E_e \mathbf{K}_e` the product is
+
+        :math:`(\mathbf{H}\mathbf{v})_e = 2 E'_e \mathbf{u}_e^T
+        \mathbf{K}_e \mathbf{z}_e - E''_e \mathbf{u}_e^T \mathbf{K}_e
+        \mathbf{u}_e v_e`
+
+        where :math:`\mathbf{K}\mathbf{z} = \sum_e v_e E'_e \mathbf{K}_e
+        \mathbf{u}`, summed over the loads like the compliance. It reuses
+        the displacements of the last :meth:`compute_objective`, which must
+        have analysed xPhys, and solves for z with the factor of that
+        analysis, see :meth:`topopt.linear_solvers.LinearSolver.resolve`.
+
+        Parameters
+        ----------
+        xPhys:
+            The element densities of the last analysis.
+        v:
+            The direction to multiply by.
+
+        Returns
+        -------
+        numpy.ndarray
+            The product of the Hessian with v.
+
+        """
         dE = numpy.empty(xPhys.shape)
-        E = self.compute_young_moduli(xPhys, dE)
+        self.compute_young_moduli(xPhys, dE)
+        d2E = numpy.zeros(xPhys.shape)
+        numpy.power(xPhys, self.penalty - 2, out=d2E, where=xPhys != 0)
+        d2E *= (self.Emax - self.Emin) * self.penalty * (self.penalty - 1)
+
+        elements = self.elements
+        ue = self.u[self.element_dofs]  # (elements, 8, loads)
+        KEue = numpy.einsum('ij,ejl->eil', self.KE, ue)
+
+        # Load of the second solve, the stiffness change along v applied to
+        # the displacements
+        w = numpy.zeros((self.ndof, self.nloads))
+        scaled = KEue * (v * dE)[elements, numpy.newaxis, numpy.newaxis]
         for i in range(self.nloads):
-            ui = self.u[:, i][self.edofMat].reshape(-1, 8)
-            self.obje[:] = (ui @ self.KE * ui).sum(1)
-            obj += (E * self.obje).sum()
-            dobj[:] += -dE * self.obje
-        dobj /= float(self.nloads)
-        return obj / float(self.nloads)
+            w[:, i] = numpy.bincount(self.element_dofs.ravel(),
+                                     scaled[:, :, i].ravel(), self.ndof)
+        Z = cvxopt.matrix(w[self.free])
+        self.linear_solver.resolve(Z)
+        z = numpy.zeros((self.ndof, self.nloads))
+        z[self.free] = numpy.asarray(Z)
+
+        product = numpy.zeros(xPhys.shape)
+        product[elements] = (
+            2 * dE[elements] * numpy.einsum('eil,eil->e', KEue, z[self.element_dofs])
+            - d2E[elements] * numpy.einsum('eil,eil->e', KEue, ue) * v[elements])
+        product /= self.load_cases
+        return product
+
+
+class AdaptiveComplianceProblem(ComplianceProblem):
+    r"""
+    Compliance problem analysed on an adaptive quadtree mesh.
+
+    The design variables stay on the uniform nelx×nely grid, but the finite
+    element analysis runs on a balanced :class:`Quadtree` that keeps unit
+    elements near material boundaries, supports and loads and merges the
+    clearly void or solid regions into larger leaves. Each leaf takes the
+    mean density of the unit elements it covers, and the sensitivity of a
+    leaf is spread back evenly over them. The mesh follows the design,
+    checked every `adapt_interval` evaluations and rebuilt only when the
+    refinement levels of the elements change.
+
+    Attributes
+    ----------
+    mesh: Quadtree
+        The current analysis mesh.
+    max_level: int
+        The highest level of any leaf.
+    adapt_interval: int
+        The number of evaluations between mesh adaptations.
+    evaluations: int
+        The number of objective evaluations so far.
+    refinement: numpy.ndarray
+        The refinement level of each unit element the mesh was built from.
+    dofs: numpy.ndarray
+        The grid degree of freedom of each solved unknown.
+
+    """
+
+    def __init__(self, bc: BoundaryConditions, penalty: float,
+                 Emax: float = 1.0, nu: float = 0.3, max_level: int = 3,
+                 adapt_interval: int = 1):
+        """
+        Create the topology optimization problem.
+
+        Parameters
+        ----------
+        bc:
+            The boundary conditions of the problem.
+        penalty:
+            The penalty value used to penalize fractional densities in SIMP.
+        Emax:
+            The Young's modulus of the solid material.
+        nu:
+            The Poisson's ratio of the material.
+        max_level:
+            The highest level of any leaf, leaves span up to 2**max_level
+            unit elements per side.
+        adapt_interval:
+            The number of evaluations between mesh adaptations.
+
+        """
+        super().__init__(bc, penalty, Emax, nu)
+        self.max_level = max_level
+        self.adapt_interval = adapt_interval
+        self.evaluations = 0
+
+        # Supports and loads are applied on grid nodes, which the elements
+        # around them keep in the mesh
+        self.grid_fixed = numpy.zeros(self.ndof, dtype=bool)
+        self.grid_fixed[self.fixed] = True
+        nodes = numpy.union1d(self.fixed, self.f.nonzero()[0]) // 2
+        x, y = nodes // (self.nely + 1), nodes % (self.nely + 1)
+        self.pinned = numpy.zeros((self.nelx, self.nely), dtype=bool)
+        for dx in (-1, 0):
+            for dy in (-1, 0):
+                inside = (x + dx >= 0) & (x + dx < self.nelx) & \
+                    (y + dy >= 0) & (y + dy < self.nely)
+                self.pinned[x[inside] + dx, y[inside] + dy] = True
+        self.grid_f = self.f.tocsr()
+
+        self.refinement = numpy.zeros((self.nelx, self.nely), dtype=int)
+        self.remesh(Quadtree(self.nelx, self.nely, self.refinement))
+
+    def adapt(self, xPhys: numpy.ndarray) -> None:
+        """
+        Adapt the mesh to the physical densities.
+
+        The mesh is kept while the refinement levels stay the same, which
+        also keeps the symbolic analysis of the linear solver.
+
+        Parameters
+        ----------
+        xPhys:
+            The density of each unit element.
+
+        """
+        refinement = Quadtree.refinement_levels(
+            xPhys, self.nelx, self.nely, self.max_level, self.pinned)
+        if numpy.array_equal(refinement, self.refinement):
+            return
+        self.refinement = refinement
+        self.remesh(Quadtree(self.nelx, self.nely, refinement))
+
+    def remesh(self, mesh: Quadtree) -> None:
+        """
+        Analyse the problem on a new mesh.
+
+        Parameters
+        ----------
+        mesh:
+            The mesh to use for the next evaluations.
+
+        """
+        self.mesh = mesh
+        self.ndof = mesh.ndof
+        self.edofMat = mesh.edofMat
+        self.iK = numpy.kron(self.edofMat, numpy.ones((8, 1))).flatten()
+        self.jK = numpy.kron(self.edofMat, numpy.ones((1, 8))).flatten()
+
+        # Unconstrained mesh dofs without supports are solved for, the
+        # hanging ones follow them through the constraints
+        free = ~self.grid_fixed[mesh.dofs[mesh.unconstrained]]
+        self.dofs = mesh.dofs[mesh.unconstrained][free]
+        self.T = mesh.constraints[:, free].tocsc()
+        self.TT = self.T.T.tocsr()
+        self.averaging = mesh.averaging()
+        self.spreading = self.averaging.T.tocsr()
+
+        self.f_free = (self.TT @ self.grid_f[mesh.dofs]).tocoo()
+        self.rhs = cvxopt.matrix(0.0, (self.T.shape[1], self.nloads))
+
+        nleaves = mesh.nleaves
+        self.assembled = numpy.ones(nleaves, dtype=bool)
+        self.elements = numpy.arange(nleaves)
+        self.element_dofs = self.edofMat
+        self.energies = None
+        self.u = numpy.zeros((self.ndof, self.nloads))
+        self.obje = numpy.zeros(nleaves)
+        self.rho = numpy.empty(nleaves)
+        self.dobj = numpy.empty(nleaves)
+        self.E = numpy.empty(nleaves)
+        self.dE = numpy.empty(nleaves)
+        self.drho = numpy.empty(nleaves)
+        self.uT = numpy.empty((self.nloads, self.ndof))
+        self.ue = numpy.empty((self.nloads, nleaves, 8))
+        self.KEue = numpy.empty((self.nloads, nleaves, 8))
+
+    def build_K(self, xPhys: numpy.ndarray, remove_constrained: bool = True
+                ) -> scipy.sparse.coo_matrix:
+        """
+        Build the stiffness matrix for the mesh.
+
+        Parameters
+        ----------
+        xPhys:
+            The density of each leaf.
+        remove_constrained:
+            Should the supported and hanging dofs be removed?
+
+        Returns
+        -------
+        scipy.sparse.coo_matrix
+            The stiffness matrix for the mesh.
+
+        """
+        K = super().build_K(xPhys, remove_constrained=False)
+        if remove_constrained:
+            K = (self.TT @ K.tocsc() @ self.T).tocoo()
+        return K
+
+    def compute_displacements(self, xPhys: numpy.ndarray,
+                              out: numpy.ndarray = None) -> numpy.ndarray:
+        """
+        Compute the displacements of the mesh nodes given the densities.
+
+        Parameters
+        ----------
+        xPhys:
+            The density of each leaf.
+        out:
+            The array to write the displacements into. A new array is
+            allocated if out is None.
+
+        Returns
+        -------
+        numpy.ndarray
+            The displacements of the mesh dofs.
+
+        """
+        K = self.build_K(xPhys)
+        F = self.load_rhs()
+        self.linear_solver.solve(K, F, self.dofs)  # F stores the solution
+        if out is None:
+            out = numpy.zeros(self.u.shape)
+        out[:] = self.T @ numpy.asarray(F)
+        return out
+
+    def compute_objective(
+            self, xPhys: numpy.ndarray, dobj: numpy.ndarray) -> float:
+        """
+        Compute compliance and its gradient on the adaptive mesh.
+
+        Parameters
+        ----------
+        xPhys:
+            The density of each unit element.
+        dobj:
+            The gradient of compliance with respect to each unit element.
+
+        Returns
+        -------
+        float
+            The compliance value.
+
+        """
+        if self.evaluations % self.adapt_interval == 0:
+            self.adapt(xPhys)
+        self.evaluations += 1
+
+        numpy.copyto(self.rho, self.averaging @ xPhys)
+        obj = super().compute_objective(self.rho, self.dobj)
+        numpy.copyto(dobj, self.spreading @ self.dobj)
+        return obj
+
+    def compute_objectives(self, xPhys: list, dobj: list) -> list:
+        """
+        Compute compliance and its gradient for several designs.
+
+        The mesh follows each design, so the designs are analysed one after
+        the other.
+
+        Parameters
+        ----------
+        xPhys:
+            The density of each unit element of each design.
+        dobj:
+            The gradient of compliance to compute for each design.
+
+        Returns
+        -------
+        list
+            The compliance of each design.
+
+        """
+        return Problem.compute_objectives(self, xPhys, dobj)
 
 
 class HarmonicLoadsProblem(ElasticityProblem):
@@ -417,8 +1190,38 @@ class HarmonicLoadsProblem(ElasticityProblem):
 
     where :math:`\omega` is the angular frequency of the load, and
     :math:`\mathbf{M}` is the global mass matrix.
+
+    With several frequencies the objective is the mean of the absolute
+    dynamic compliance over them. The frequencies are swept on a single
+    factorization per design: the system is factorized at the middle of the
+    band and the amplitudes of every frequency are projected onto the Krylov
+    basis that factor generates, which matches the response around the
+    middle frequency and grows until each frequency's residual falls under
+    :attr:`sweep_tolerance`. Frequencies the basis cannot resolve are
+    factorized on their own.
+
+    Attributes
+    ----------
+    frequencies: numpy.ndarray
+        The angular frequencies of the load.
+    sweep: bool
+        Sweep the frequencies on one factorization, or factorize each?
+    amplitudes: numpy.ndarray
+        The amplitudes of vibration at each frequency.
+    factorizations: int
+        The number of systems factorized.
+    basis_size: int
+        The size of the last reduced basis.
+
     """
 
+    # Relative residual of the amplitudes taken from the reduced basis
+    sweep_tolerance = 1e-6
+    # Most blocks of Krylov vectors in the reduced basis
+    max_basis_blocks = 30
+    # Exponent of the mass interpolation, the stiffness penalty if None
+    mass_penalty = None
+
     @staticmethod
     def lm(nel: int) -> numpy.ndarray:
         r"""
@@ -459,7 +1262,9 @@ class HarmonicLoadsProblem(ElasticityProblem):
             [2, 0, 1, 0, 2, 0, 4, 0],
             [0, 2, 0, 1, 0, 2, 0, 4]], dtype=float) / (36 * nel)
 
-    def __init__(self, bc: BoundaryConditions, penalty: float):
+    def __init__(self, bc: BoundaryConditions, penalty: float,
+                 Emax: float = 1.0, nu: float = 0.3,
+                 frequencies: numpy.ndarray = (0.0,)):
         """
         Create the topology optimization problem.
 
@@ -469,45 +1274,269 @@ class HarmonicLoadsProblem(ElasticityProblem):
             The boundary conditions of the problem.
         penalty:
             The penalty value used to penalize fractional densities in SIMP.
+        Emax:
+            The Young's modulus of the solid material.
+        nu:
+            The Poisson's ratio of the material.
+        frequencies:
+            The angular frequencies of the load.
 
         """
-        super().__init__(bc, penalty)
-        self.angular_frequency = 0e-2
+        super().__init__(bc, penalty, Emax, nu)
+        self.frequencies = numpy.array(frequencies, dtype=float).ravel()
+        self.sweep = True
+        self.amplitudes = numpy.zeros((self.frequencies.size,) + self.u.shape)
+        self.factorizations = 0
+        self.basis_size = 0
+        self.build_assembly()
+
+    @property
+    def angular_frequency(self) -> float:
+        """:obj:`float`: The angular frequency of a single frequency load."""
+        return self.frequencies[0]
+
+    @angular_frequency.setter
+    def angular_frequency(self, value: float) -> None:
+        self.frequencies = numpy.array([value], dtype=float)
+        self.amplitudes = numpy.zeros((1,) + self.u.shape)
 
     def build_indices(self) -> None:
         """Build the index vectors for the finite element coo matrix format."""
         super().build_indices()
         self.ME = self.lm(self.nel)
 
+    def build_assembly(self) -> None:
+        """
+        Map the element matrix values onto the reduced system.
+
+        K and M share their sparsity, so the compressed columns of the free
+        degrees of freedom and the entry each element value is summed into
+        are found once. Every design then assembles both with a weighted
+        count instead of converting and trimming a coo matrix.
+        """
+        n = self.free.size
+        index = numpy.full(self.ndof, -1)
+        index[self.free] = numpy.arange(n)
+        rows = index[self.iK.astype(int)]
+        cols = index[self.jK.astype(int)]
+        self.assembled_values = numpy.flatnonzero((rows >= 0) & (cols >= 0))
+        keys, self.value_entries = numpy.unique(
+            cols[self.assembled_values] * n + rows[self.assembled_values],
+            return_inverse=True)
+        self.value_entries = self.value_entries.ravel()
+        self.entry_rows = keys % n
+        self.entry_columns = numpy.concatenate(
+            ([0], numpy.cumsum(numpy.bincount(keys // n, minlength=n))))
+
+    def assemble(self, ME: numpy.ndarray,
+                 scale: numpy.ndarray) -> scipy.sparse.csc_matrix:
+        """
+        Assemble the reduced system of a scaled element matrix.
+
+        Parameters
+        ----------
+        ME:
+            The element matrix.
+        scale:
+            The scale of each element's matrix.
+
+        Returns
+        -------
+        scipy.sparse.csc_matrix
+            The matrix of the free degrees of freedom.
+
+        """
+        values = (scale[:, numpy.newaxis] * ME.ravel()).ravel()
+        data = numpy.bincount(self.value_entries,
+                              values[self.assembled_values],
+                              self.entry_rows.size)
+        n = self.free.size
+        return scipy.sparse.csc_matrix(
+            (data, self.entry_rows, self.entry_columns), shape=(n, n))
+
+    def compute_masses(self, x: numpy.ndarray,
+                       drho: numpy.ndarray = None) -> numpy.ndarray:
+        """
+        Compute the mass scale of each element from the densities.
+
+        Parameters
+        ----------
+        x:
+            The density variable of each element.
+        drho:
+            The derivative of the masses to compute. Only set if drho is not
+            None.
+
+        Returns
+        -------
+        numpy.ndarray
+            The elements' mass scale.
+
+        """
+        penalty = self.penalty if self.mass_penalty is None else \
+            self.mass_penalty
+        if drho is not None:
+            drho[:] = penalty * x**(penalty - 1)
+        return x**penalty
+
     def build_M(self, xPhys: numpy.ndarray, remove_constrained: bool = True
                 ) -> scipy.sparse.coo_matrix:
         """
-        Build the stiffness matrix for the problem.
+        Build the mass matrix for the problem.
 
         Parameters
         ----------
         xPhys:
-            The element densisities used to build the stiffness matrix.
+            The element densisities used to build the mass matrix.
         remove_constrained:
             Should the constrained nodes be removed?
 
         Returns
         -------
         scipy.sparse.coo_matrix
-            The stiffness matrix for the mesh.
+            The mass matrix for the mesh.
 
         """
-        # vals = numpy.tile(self.ME.flatten(), xPhys.size)
         vals = (self.ME.reshape(-1, 1) *
-                self.penalize_densities(xPhys)).flatten(order='F')
+                self.compute_masses(xPhys)).flatten(order='F')
         M = scipy.sparse.coo_matrix((vals, (self.iK, self.jK)),
                                     shape=(self.ndof, self.ndof))
         if remove_constrained:
             # Remove constrained dofs from matrix and convert to coo
-            M = deleterowcol(M.tocsc(), self.fixed, self.fixed).tocoo()
+            M = deleterowcol(M.tocsc(), self.removed, self.removed).tocoo()
         return M
 
-    def compute_displacements(self, xPhys: numpy.ndarray) -> numpy.ndarray:
+    def compute_amplitudes(self, xPhys: numpy.ndarray,
+                           out: numpy.ndarray = None) -> numpy.ndarray:
+        """
+        Compute the amplitudes of vibration at every frequency.
+
+        Parameters
+        ----------
+        xPhys:
+            The element densisities used to build the system matrices.
+        out:
+            The array to write the amplitudes into. A new array is allocated
+            if out is None.
+
+        Returns
+        -------
+        numpy.ndarray
+            The amplitudes of vibration, one displacement array per
+            frequency.
+
+        """
+        K = self.assemble(self.KE, self.compute_young_moduli(xPhys))
+        M = self.assemble(self.ME, self.compute_masses(xPhys))
+        F = self.f_free.toarray()
+        if self.sweep:
+            U = self.sweep_frequencies(K, M, F)
+        else:
+            U = [self.solve_frequency(K, M, F, w) for w in self.frequencies]
+        if out is None:
+            out = numpy.zeros(self.amplitudes.shape)
+        out[:, self.free, :] = U
+        out[:, self.removed, :] = 0
+        return out
+
+    def solve_frequency(self, K: scipy.sparse.csc_matrix,
+                        M: scipy.sparse.csc_matrix, F: numpy.ndarray,
+                        frequency: float) -> numpy.ndarray:
+        """
+        Solve the system of one frequency with its own factorization.
+
+        Parameters
+        ----------
+        K:
+            The stiffness matrix of the free degrees of freedom.
+        M:
+            The mass matrix of the free degrees of freedom.
+        F:
+            The forces of each load.
+        frequency:
+            The angular frequency of the load.
+
+        Returns
+        -------
+        numpy.ndarray
+            The amplitudes of vibration of the free degrees of freedom.
+
+        """
+        self.factorizations += 1
+        return factorize(K - frequency**2 * M)(F)
+
+    def sweep_frequencies(self, K: scipy.sparse.csc_matrix,
+                          M: scipy.sparse.csc_matrix,
+                          F: numpy.ndarray) -> numpy.ndarray:
+        """
+        Solve the systems of every frequency on one factorization.
+
+        Parameters
+        ----------
+        K:
+            The stiffness matrix of the free degrees of freedom.
+        M:
+            The mass matrix of the free degrees of freedom.
+        F:
+            The forces of each load.
+
+        Returns
+        -------
+        numpy.ndarray
+            The amplitudes of vibration of the free degrees of freedom, one
+            array per frequency.
+
+        """
+        frequencies = self.frequencies
+        forces = numpy.linalg.norm(F)
+        if forces == 0:
+            return numpy.zeros((frequencies.size,) + F.shape)
+
+        center = (frequencies.min() + frequencies.max()) / 2
+        solve = factorize(K - center**2 * M)
+        self.factorizations += 1
+
+        n = F.shape[0]
+        V, KV, MV = (numpy.empty((n, 0)) for _ in range(3))
+        # Without a basis every frequency is factorized on its own
+        Y = [numpy.zeros((0, F.shape[1])) for _ in frequencies]
+        residuals = numpy.ones(frequencies.size)
+        block = solve(F)
+        history = []
+        for _ in range(self.max_basis_blocks):
+            # Orthogonalize twice, the Krylov vectors align fast
+            for _ in range(2):
+                block -= V @ (V.T @ block)
+            block, R = numpy.linalg.qr(block)
+            block = block[:, numpy.abs(numpy.diag(R)) > 1e-12 * forces]
+            if block.shape[1] == 0:
+                break  # the basis spans the response exactly
+            V = numpy.hstack((V, block))
+            KV = numpy.hstack((KV, K @ block))
+            MV = numpy.hstack((MV, M @ block))
+
+            Kr, Mr, Fr = V.T @ KV, V.T @ MV, V.T @ F
+            Y = [numpy.linalg.solve(Kr - w**2 * Mr, Fr) for w in frequencies]
+            residuals = numpy.array([
+                numpy.linalg.norm(F - (KV - w**2 * MV) @ y)
+                for w, y in zip(frequencies, Y)]) / forces
+            if residuals.max() <= self.sweep_tolerance:
+                break
+            # A frequency right at a resonance never converges, so stop once
+            # the basis no longer helps and factorize it on its own
+            history.append(residuals.max())
+            if len(history) > 5 and history[-1] > 0.5 * history[-6]:
+                break
+            block = solve(M @ block)
+        self.basis_size = V.shape[1]
+
+        U = numpy.array([V @ y for y in Y])
+        for i in numpy.flatnonzero(residuals > self.sweep_tolerance):
+            U[i] = self.solve_frequency(K, M, F, frequencies[i])
+        return U
+
+    def compute_displacements(self, xPhys: numpy.ndarray,
+                              out: numpy.ndarray = None) -> numpy.ndarray:
         r"""
         Compute the amplitude of vibration given the densities.
 
@@ -515,12 +1544,15 @@ class HarmonicLoadsProblem(ElasticityProblem):
         elastic finite element analysis (solving
         :math:`\mathbf{S}\mathbf{u} = \mathbf{f}` where :math:`\mathbf{S} =
         \mathbf{K} - \omega^2\mathbf{M}` is the system matrix and
-        :math:`\mathbf{f}` is the force vector).
+        :math:`\mathbf{f}` is the force vector) at the first frequency.
 
         Parameters
         ----------
         xPhys:
             The element densisities used to build the stiffness matrix.
+        out:
+            The array to write the amplitudes into. A new array is allocated
+            if out is None.
 
         Returns
         -------
@@ -529,23 +1561,11 @@ class HarmonicLoadsProblem(ElasticityProblem):
             analysis.
 
         """
-        # Setup and solve FE problem
-        K = self.build_K(xPhys)
-        M = self.build_M(xPhys)
-        S = (K - self.angular_frequency**2 * M).tocoo()
-        cvxopt_S = cvxopt.spmatrix(
-            S.data, S.row.astype(int), S.col.astype(int))
-        # Solve system
-        F = cvxopt.matrix(self.f[self.free, :])
-        try:
-            # F stores solution after solve
-            cvxopt.cholmod.linsolve(cvxopt_S, F)
-        except Exception:
-            F = scipy.sparse.linalg.spsolve(S.tocsc(), self.f[self.free, :])
-            F = F.reshape(-1, self.nloads)
-        new_u = self.u.copy()
-        new_u[self.free, :] = numpy.array(F)[:, :]
-        return new_u
+        amplitudes = self.compute_amplitudes(xPhys)
+        if out is None:
+            out = numpy.zeros(self.u.shape)
+        out[:] = amplitudes[0]
+        return out
 
     def compute_objective(
             self, xPhys: numpy.ndarray, dobj: numpy.ndarray) -> float:
@@ -566,7 +1586,9 @@ class HarmonicLoadsProblem(ElasticityProblem):
         = \mathbf{u}^T\frac{\partial \mathbf K}{\partial \rho_e}\mathbf{u}
         \end{align}`
 
-        where :math:`\boldsymbol{\lambda} = \mathbf{u}`.
+        where :math:`\boldsymbol{\lambda} = \mathbf{u}`. Over several
+        frequencies the absolute values are averaged, so a load above a
+        resonance does not reward approaching it.
 
         Parameters
         ----------
@@ -582,26 +1604,308 @@ class HarmonicLoadsProblem(ElasticityProblem):
 
         """
         # Setup and solve FE problem
-        self.update_displacements(xPhys)
+        self.compute_amplitudes(xPhys, self.amplitudes)
 
-        obj = 0.0
-        dobj[:] = 0.0
         dE = numpy.empty(xPhys.shape)
         E = self.compute_young_moduli(xPhys, dE)
         drho = numpy.empty(xPhys.shape)
-        penalty = self.penalty
-        self.penalty = 2
-        rho = self.penalize_densities(xPhys, drho)
-        self.penalty = penalty
-        for i in range(self.nloads):
-            ui = self.u[:, i][self.edofMat].reshape(-1, 8)
-            obje1 = (ui @ self.KE * ui).sum(1)
-            obje2 = (ui @ (-self.angular_frequency**2 * self.ME) * ui).sum(1)
-            self.obje[:] = obje1 + obje2
-            obj += (E * obje1 + rho * obje2).sum()
-            dobj[:] += -(dE * obje1 + drho * obje2)
-        dobj /= float(self.nloads)
-        return obj / float(self.nloads)
+        rho = self.compute_masses(xPhys, drho)
+
+        compliances = numpy.empty(self.frequencies.size)
+        dobj[:] = 0.0
+        self.obje[:] = 0.0
+        for i, w in enumerate(self.frequencies):
+            ue = self.amplitudes[i][self.edofMat]  # (nel, 8, nloads)
+            obje1 = numpy.einsum('ejl,jk,ekl->e', ue, self.KE, ue)
+            obje2 = -w**2 * numpy.einsum('ejl,jk,ekl->e', ue, self.ME, ue)
+            compliances[i] = (E @ obje1 + rho @ obje2) / self.nloads
+            sign = numpy.sign(compliances[i])
+            dobj -= sign * (dE * obje1 + drho * obje2)
+            self.obje += sign * (obje1 + obje2)
+
+        # The amplitudes of the frequency that matters most are shown
+        self.u[:] = self.amplitudes[numpy.argmax(numpy.abs(compliances))]
+        scale = 1.0 / (self.nloads * self.frequencies.size)
+        dobj *= scale
+        self.obje *= scale
+        return numpy.abs(compliances).mean()
+
+
+class EigenfrequencyProblem(HarmonicLoadsProblem):
+    r"""
+    Topology optimization problem to maximize the fundamental frequency.
+
+    :math:`\begin{aligned}
+    \max_{\boldsymbol{\rho}} \quad & \lambda_1\\
+    \textrm{subject to}: \quad & \mathbf{K}\boldsymbol{\phi}_j =
+    \lambda_j\mathbf{M}\boldsymbol{\phi}_j\\
+    & \sum_{e=1}^N v_e\rho_e \leq V_\text{frac},
+    \quad 0 < \rho_\min \leq \rho_e \leq 1\\
+    \end{aligned}`
+
+    where :math:`\lambda_1 = \omega_1^2` is the smallest eigenvalue of the
+    free vibrations, and :math:`\mathbf{K}` and :math:`\mathbf{M}` are
+    assembled as in :class:`HarmonicLoadsProblem`. The forces of the
+    boundary conditions are ignored.
+
+    The lowest modes are found by LOBPCG, started from the modes of the
+    previous design and preconditioned by a Cholesky factor of the
+    stiffness. The modes move little between iterations, so a few LOBPCG
+    iterations on the new factor suffice and an iteration costs about as
+    much as a compliance solve. Once the modes converge in at most
+    :attr:`reuse_iterations`, the design has settled enough for the factor
+    to precondition the next design as well. That attempt gives up after
+    :attr:`refactor_iterations` and continues on a new factor.
+
+    Attributes
+    ----------
+    modes: int
+        The number of modes computed. Only the first is optimized, the others
+        speed up LOBPCG and show how close the next modes are.
+    warm_start: bool
+        Start from the previous modes and factor, or find the modes of every
+        design from scratch with a shift-invert Lanczos?
+    eigenvalues: numpy.ndarray
+        The lowest eigenvalues of the last design.
+    eigenvectors: numpy.ndarray
+        The mass normalized modes of the free degrees of freedom.
+    eigen_iterations: int
+        The number of LOBPCG iterations run.
+
+    """
+
+    # Relative residual the modes are computed to, the eigenvalues are
+    # accurate to about its square
+    eigen_tolerance = 1e-6
+    max_eigen_iterations = 100
+    # LOBPCG iterations within which the factor is kept for the next design,
+    # and after which a kept factor is given up
+    reuse_iterations = 3
+    refactor_iterations = 6
+    # Density under which the mass vanishes faster than the stiffness
+    low_density = 0.1
+
+    def __init__(self, bc: BoundaryConditions, penalty: float,
+                 Emax: float = 1.0, nu: float = 0.3, modes: int = 3):
+        """
+        Create the topology optimization problem.
+
+        Parameters
+        ----------
+        bc:
+            The boundary conditions of the problem.
+        penalty:
+            The penalty value used to penalize fractional densities in SIMP.
+        Emax:
+            The Young's modulus of the solid material.
+        nu:
+            The Poisson's ratio of the material.
+        modes:
+            The number of modes to compute.
+
+        """
+        super().__init__(bc, penalty, Emax, nu)
+        self.modes = modes
+        self.warm_start = True
+        self.eigenvalues = numpy.zeros(modes)
+        self.eigenvectors = None
+        self.eigen_iterations = 0
+        self.preconditioner = None
+        self.stale = True
+
+    def compute_masses(self, x: numpy.ndarray,
+                       drho: numpy.ndarray = None) -> numpy.ndarray:
+        """
+        Compute the mass scale of each element from the densities.
+
+        The mass is linear in the density, except under
+        :attr:`low_density` where it falls as the sixth power. Low density
+        elements would otherwise be much heavier than they are stiff, and
+        vibrate on their own in spurious local modes.
+
+        Parameters
+        ----------
+        x:
+            The density variable of each element.
+        drho:
+            The derivative of the masses to compute. Only set if drho is not
+            None.
+
+        Returns
+        -------
+        numpy.ndarray
+            The elements' mass scale.
+
+        """
+        low = x < self.low_density
+        scale = self.low_density**-5
+        if drho is not None:
+            drho[:] = numpy.where(low, 6 * scale * x**5, 1.0)
+        return numpy.where(low, scale * x**6, x)
+
+    def compute_modes(self, xPhys: numpy.ndarray) -> numpy.ndarray:
+        """
+        Compute the lowest modes of free vibration.
+
+        Parameters
+        ----------
+        xPhys:
+            The element densisities used to build the system matrices.
+
+        Returns
+        -------
+        numpy.ndarray
+            The lowest eigenvalues, in increasing order.
+
+        """
+        K = self.assemble(self.KE, self.compute_young_moduli(xPhys))
+        M = self.assemble(self.ME, self.compute_masses(xPhys))
+        if not self.warm_start:
+            solve = factorize(K)
+            self.factorizations += 1
+            values, vectors = scipy.sparse.linalg.eigsh(
+                K, self.modes, M, sigma=0, which='LM',
+                tol=self.eigen_tolerance,
+                OPinv=scipy.sparse.linalg.LinearOperator(
+                    K.shape, solve, matmat=solve, dtype=float))
+        else:
+            values, vectors = self.iterate_modes(K, M)
+        order = numpy.argsort(values)
+        self.eigenvalues = values[order]
+        self.eigenvectors = vectors[:, order]
+        return self.eigenvalues
+
+    def iterate_modes(self, K: scipy.sparse.csc_matrix,
+                      M: scipy.sparse.csc_matrix) -> tuple:
+        """
+        Refine the previous modes into the ones of a new design.
+
+        Parameters
+        ----------
+        K:
+            The stiffness matrix of the free degrees of freedom.
+        M:
+            The mass matrix of the free degrees of freedom.
+
+        Returns
+        -------
+        tuple
+            The eigenvalues and the mass normalized modes.
+
+        """
+        fresh = self.preconditioner is None or self.stale
+        X = self.eigenvectors
+        while True:
+            if fresh:
+                solve = factorize(K)
+                self.preconditioner = scipy.sparse.linalg.LinearOperator(
+                    K.shape, solve, matmat=solve, dtype=float)
+                self.factorizations += 1
+                self.stale = False
+            if X is None:
+                # One inverse iteration turns noise into mostly low modes
+                X = self.preconditioner @ (M @ numpy.random.default_rng(
+                    0).standard_normal((K.shape[0], self.modes)))
+            # LOBPCG bounds the residual norms, which scale with the modes
+            scale = numpy.linalg.norm(K @ X, axis=0) / numpy.sqrt(
+                numpy.einsum('ij,ij->j', X, M @ X))
+            tolerance = self.eigen_tolerance * scale.min()
+            with warnings.catch_warnings():
+                # Convergence is checked below
+                warnings.simplefilter("ignore", UserWarning)
+                values, vectors, history = scipy.sparse.linalg.lobpcg(
+                    K, X, M, self.preconditioner, largest=False,
+                    tol=tolerance,
+                    maxiter=self.max_eigen_iterations if fresh else
+                    self.refactor_iterations,
+                    retResidualNormsHistory=True)
+            iterations = len(history) - 1
+            self.eigen_iterations += iterations
+            converged = numpy.max(history[-1]) <= tolerance
+            if converged or fresh:
+                break
+            # The old factor no longer approximates the stiffness, carry on
+            # from where it got with a new one
+            fresh = True
+            X = vectors
+        self.stale = iterations > self.reuse_iterations
+        if not converged:
+            logging.warning("LOBPCG did not converge in %d iterations",
+                            iterations)
+        return values, vectors
+
+    def compute_displacements(self, xPhys: numpy.ndarray,
+                              out: numpy.ndarray = None) -> numpy.ndarray:
+        """
+        Compute the fundamental mode given the densities.
+
+        Parameters
+        ----------
+        xPhys:
+            The element densisities used to build the system matrices.
+        out:
+            The array to write the mode into, in the first load's column. A
+            new array is allocated if out is None.
+
+        Returns
+        -------
+        numpy.ndarray
+            The mass normalized fundamental mode.
+
+        """
+        self.compute_modes(xPhys)
+        if out is None:
+            out = numpy.zeros(self.u.shape)
+        out[:] = 0
+        out[self.free, 0] = self.eigenvectors[:, 0]
+        return out
+
+    def compute_objective(
+            self, xPhys: numpy.ndarray, dobj: numpy.ndarray) -> float:
+        r"""
+        Compute the reciprocal fundamental eigenvalue and its gradient.
+
+        The objective is :math:`1 / \lambda_1`, which scales like compliance
+        and so suits the same optimizer settings. With the mode normalized so
+        that :math:`\boldsymbol{\phi}_1^T\mathbf{M}\boldsymbol{\phi}_1 = 1`,
+        the gradient of the eigenvalue is
+
+        :math:`\begin{align}
+        \frac{\partial \lambda_1}{\partial \rho_e} =
+        \boldsymbol{\phi}_1^T\left(\frac{\partial \mathbf K}{\partial \rho_e}
+        - \lambda_1\frac{\partial \mathbf M}{\partial \rho_e}\right)
+        \boldsymbol{\phi}_1
+        \end{align}`
+
+        which only holds while :math:`\lambda_1` is simple. Watch
+        :attr:`eigenvalues` for the second mode catching up.
+
+        Parameters
+        ----------
+        xPhys:
+            The element densities.
+        dobj:
+            The gradient of the objective.
+
+        Returns
+        -------
+        float
+            The reciprocal of the fundamental eigenvalue.
+
+        """
+        self.update_displacements(xPhys)
+        dE = numpy.empty(xPhys.shape)
+        self.compute_young_moduli(xPhys, dE)
+        drho = numpy.empty(xPhys.shape)
+        self.compute_masses(xPhys, drho)
+
+        eigenvalue = self.eigenvalues[0]
+        ue = self.u[self.edofMat, 0]
+        stiffness = numpy.einsum('ej,jk,ek->e', ue, self.KE, ue)
+        mass = numpy.einsum('ej,jk,ek->e', ue, self.ME, ue)
+        numpy.subtract(stiffness, eigenvalue * mass, out=self.obje)
+        dobj[:] = (eigenvalue * drho * mass - dE * stiffness) / eigenvalue**2
+        return 1.0 / eigenvalue
 
 
 class VonMisesStressProblem(ElasticityProblem):
@@ -0,0 +1,284 @@
+"""Adaptive quadtree meshes over the uniform element grid."""
+
+import numpy
+import scipy.ndimage
+import scipy.sparse
+
+
+class Quadtree:
+    r"""
+    Balanced quadtree of square leaves covering a nelx×nely element grid.
+
+    A leaf of level :math:`k` is a square of :math:`2^k \times 2^k` unit
+    elements aligned to multiples of its side. Edge-adjacent leaves differ by
+    at most one level, so every hanging node sits at the midpoint of an edge
+    of its larger neighbour and is constrained to the mean of that edge's end
+    nodes, which are never hanging themselves.
+
+    Attributes
+    ----------
+    nelx: int
+        The number of unit elements in the x-direction.
+    nely: int
+        The number of unit elements in the y-direction.
+    level: numpy.ndarray
+        The level of the leaf covering each unit element, (nelx, nely).
+    origin: numpy.ndarray
+        The lower left unit element of each leaf, (nleaves, 2).
+    size: numpy.ndarray
+        The side of each leaf in unit elements.
+    element_leaf: numpy.ndarray
+        The leaf covering each unit element, in element order.
+    nodes: numpy.ndarray
+        The grid node id of each mesh node.
+    edofMat: numpy.ndarray
+        The mesh degrees of freedom of each leaf, (nleaves, 8), in the corner
+        order of the uniform grid's elements.
+    hanging: numpy.ndarray
+        The mesh degrees of freedom constrained by hanging nodes.
+    constraints: scipy.sparse.csr_matrix
+        Maps the unconstrained mesh degrees of freedom to all of them.
+
+    """
+
+    def __init__(self, nelx: int, nely: int, max_level: numpy.ndarray):
+        """
+        Build the coarsest balanced quadtree the levels allow.
+
+        Parameters
+        ----------
+        nelx:
+            The number of unit elements in the x-direction.
+        nely:
+            The number of unit elements in the y-direction.
+        max_level:
+            The highest level of the leaf allowed over each unit element,
+            (nelx, nely).
+
+        """
+        self.nelx = nelx
+        self.nely = nely
+        self.level = self.balance(nelx, nely, max_level)
+        self.build_leaves()
+        self.build_nodes()
+
+    @staticmethod
+    def refinement_levels(x: numpy.ndarray, nelx: int, nely: int,
+                          max_level: int, pinned: numpy.ndarray = None,
+                          threshold: float = 0.05, buffer: int = 2
+                          ) -> numpy.ndarray:
+        """
+        Compute the levels allowed by a density field.
+
+        Only elements that are clearly void or clearly solid, and at least
+        `buffer` elements away from any other state, may be coarsened.
+
+        Parameters
+        ----------
+        x:
+            The density of each unit element.
+        nelx:
+            The number of unit elements in the x-direction.
+        nely:
+            The number of unit elements in the y-direction.
+        max_level:
+            The highest level of any leaf.
+        pinned:
+            The unit elements that must stay at the finest level.
+        threshold:
+            Densities within `threshold` of 0 or 1 count as void or solid.
+        buffer:
+            The number of elements kept fine around material boundaries.
+
+        Returns
+        -------
+        numpy.ndarray
+            The highest level allowed over each unit element, (nelx, nely).
+
+        """
+        x = x.reshape(nelx, nely)
+        # -1 for intermediate densities, 0 for void and 1 for solid
+        state = numpy.full(x.shape, -1)
+        state[x <= threshold] = 0
+        state[x >= 1 - threshold] = 1
+
+        boundary = state < 0
+        boundary[1:] |= state[1:] != state[:-1]
+        boundary[:-1] |= state[1:] != state[:-1]
+        boundary[:, 1:] |= state[:, 1:] != state[:, :-1]
+        boundary[:, :-1] |= state[:, 1:] != state[:, :-1]
+        if buffer > 0:
+            boundary = scipy.ndimage.binary_dilation(
+                boundary, iterations=buffer)
+        if pinned is not None:
+            boundary |= pinned.reshape(nelx, nely)
+
+        return numpy.where(boundary, 0, max_level)
+
+    @staticmethod
+    def assign_levels(nelx: int, nely: int,
+                      max_level: numpy.ndarray) -> numpy.ndarray:
+        """
+        Cover the grid with the largest aligned leaves the levels allow.
+
+        Parameters
+        ----------
+        nelx:
+            The number of unit elements in the x-direction.
+        nely:
+            The number of unit elements in the y-direction.
+        max_level:
+            The highest level allowed over each unit element.
+
+        Returns
+        -------
+        numpy.ndarray
+            The level of the leaf covering each unit element.
+
+        """
+        level = numpy.zeros((nelx, nely), dtype=int)
+        assigned = numpy.zeros((nelx, nely), dtype=bool)
+        for k in range(int(max_level.max(initial=0)), 0, -1):
+            s = 2**k
+            bx, by = nelx // s, nely // s
+            if bx == 0 or by == 0:
+                continue
+            # Leaves that fit in the domain, are allowed over all of their
+            # elements and are not inside a larger leaf
+            blocks = (slice(0, bx * s), slice(0, by * s))
+            leaves = (
+                max_level[blocks].reshape(bx, s, by, s).min(axis=(1, 3)) >= k
+            ) & ~assigned[blocks].reshape(bx, s, by, s).any(axis=(1, 3))
+            mask = leaves.repeat(s, axis=0).repeat(s, axis=1)
+            level[blocks][mask] = k
+            assigned[blocks] |= mask
+        return level
+
+    @staticmethod
+    def balance(nelx: int, nely: int,
+                max_level: numpy.ndarray) -> numpy.ndarray:
+        """
+        Assign the leaf levels and refine them until the tree is balanced.
+
+        Parameters
+        ----------
+        nelx:
+            The number of unit elements in the x-direction.
+        nely:
+            The number of unit elements in the y-direction.
+        max_level:
+            The highest level allowed over each unit element.
+
+        Returns
+        -------
+        numpy.ndarray
+            The level of the leaf covering each unit element.
+
+        """
+        max_level = max_level.copy()
+        while True:
+            level = Quadtree.assign_levels(nelx, nely, max_level)
+            # No element may be more than one level above an edge neighbour
+            limit = level + 1
+            numpy.minimum(limit[1:], level[:-1] + 1, out=limit[1:])
+            numpy.minimum(limit[:-1], level[1:] + 1, out=limit[:-1])
+            numpy.minimum(limit[:, 1:], level[:, :-1] + 1, out=limit[:, 1:])
+            numpy.minimum(limit[:, :-1], level[:, 1:] + 1, out=limit[:, :-1])
+            if (level <= limit).all():
+                return level
+            numpy.minimum(max_level, limit, out=max_level)
+
+    def build_leaves(self) -> None:
+        """Extract the leaves and the leaf covering each unit element."""
+        x, y = numpy.indices((self.nelx, self.nely))
+        side = 2**self.level
+        origins = (x % side == 0) & (y % side == 0)
+        self.origin = numpy.argwhere(origins)
+        self.size = side[origins]
+
+        leaf_at = numpy.zeros((self.nelx, self.nely), dtype=int)
+        leaf_at[origins] = numpy.arange(self.size.size)
+        self.element_leaf = leaf_at[x - x % side, y - y % side].ravel()
+
+    def build_nodes(self) -> None:
+        """Number the mesh nodes and constrain the hanging ones."""
+        x0, y0, s = self.origin[:, 0], self.origin[:, 1], self.size
+        corners = numpy.stack([self.node_id(x0, y0 + s),
+                               self.node_id(x0 + s, y0 + s),
+                               self.node_id(x0 + s, y0),
+                               self.node_id(x0, y0)], axis=1)
+        self.nodes, inverse = numpy.unique(corners, return_inverse=True)
+        mesh_nodes = inverse.reshape(corners.shape)
+        self.edofMat = numpy.empty((s.size, 8), dtype=int)
+        self.edofMat[:, 0::2] = 2 * mesh_nodes
+        self.edofMat[:, 1::2] = 2 * mesh_nodes + 1
+
+        # The mesh nodes at edge midpoints of larger leaves are hanging
+        big = s >= 2
+        x0, y0, s = x0[big], y0[big], s[big]
+        h = s // 2
+        midpoints = numpy.concatenate([
+            self.node_id(x0 + h, y0), self.node_id(x0 + s, y0 + h),
+            self.node_id(x0 + h, y0 + s), self.node_id(x0, y0 + h)])
+        ends = numpy.concatenate([
+            numpy.stack([self.node_id(x0, y0), self.node_id(x0 + s, y0)], 1),
+            numpy.stack([self.node_id(x0 + s, y0),
+                         self.node_id(x0 + s, y0 + s)], 1),
+            numpy.stack([self.node_id(x0, y0 + s),
+                         self.node_id(x0 + s, y0 + s)], 1),
+            numpy.stack([self.node_id(x0, y0), self.node_id(x0, y0 + s)], 1)])
+        found = numpy.searchsorted(self.nodes, midpoints).clip(
+            max=self.nodes.size - 1)
+        found_mask = self.nodes[found] == midpoints
+        hanging, first = numpy.unique(found[found_mask], return_index=True)
+        ends = numpy.searchsorted(self.nodes, ends[found_mask][first])
+
+        ndof = 2 * self.nodes.size
+        self.hanging = numpy.concatenate([2 * hanging, 2 * hanging + 1])
+        constrained = numpy.zeros(ndof, dtype=bool)
+        constrained[self.hanging] = True
+        own = numpy.flatnonzero(~constrained)
+
+        rows = numpy.concatenate([own, numpy.repeat(self.hanging, 2)])
+        columns = numpy.concatenate([
+            own, (2 * ends).ravel(), (2 * ends + 1).ravel()])
+        values = numpy.concatenate([
+            numpy.ones(own.size), numpy.full(2 * self.hanging.size, 0.5)])
+        self.constraints = scipy.sparse.csr_matrix(
+            (values, (rows, columns)), shape=(ndof, ndof))[:, own]
+        self.unconstrained = own
+
+    def node_id(self, x: numpy.ndarray, y: numpy.ndarray) -> numpy.ndarray:
+        """Compute the grid node id of the nodes at x and y."""
+        return x * (self.nely + 1) + y
+
+    @property
+    def nleaves(self) -> int:
+        """:obj:`int`: The number of leaves."""
+        return self.size.size
+
+    @property
+    def ndof(self) -> int:
+        """:obj:`int`: The number of mesh degrees of freedom."""
+        return 2 * self.nodes.size
+
+    @property
+    def dofs(self) -> numpy.ndarray:
+        """:obj:`numpy.ndarray`: The grid dof of each mesh dof."""
+        return numpy.stack([2 * self.nodes, 2 * self.nodes + 1], 1).ravel()
+
+    def averaging(self) -> scipy.sparse.csr_matrix:
+        """
+        Build the matrix averaging unit element values over each leaf.
+
+        Returns
+        -------
+        scipy.sparse.csr_matrix
+            The (nleaves, nelx * nely) averaging matrix.
+
+        """
+        nel = self.element_leaf.size
+        return scipy.sparse.csr_matrix(
+            (1.0 / self.size[self.element_leaf]**2,
+             (self.element_leaf, numpy.arange(nel))),
+            shape=(self.nleaves, nel))
@@ -4,7 +4,6 @@ Solvers to solve topology optimization problems.
 Todo:
     * Make TopOptSolver an abstract class
     * Rename the current TopOptSolver to MMASolver(TopOptSolver)
-    * Create a TopOptSolver using originality criterion
 """
 from __future__ import division
 
@@ -12,7 +11,7 @@ import numpy
 import nlopt
 
 from topopt.problems import Problem
-from topopt.filters import Filter
+from topopt.filters import Filter, heaviside_projection
 from topopt.guis import GUI
 
 
@@ -44,6 +43,11 @@ class TopOptSolver:
         self.filter = filter
         self.gui = gui
 
+        # number of objective evaluations performed
+        self.iteration = 0
+        # objective of the last evaluation
+        self.last_obj = None
+
         n = problem.nelx * problem.nely
         self.opt = nlopt.opt(nlopt.LD_MMA, n)
         self.xPhys = numpy.ones(n)
@@ -69,6 +73,18 @@ class TopOptSolver:
         if self.active.size > 0:
             self.xPhys[self.active] = 1
 
+        # Robust formulation, off until set_robust is called
+        self.beta = None
+        self.thresholds = None
+        self.xTilde = None
+
+        # Penalties of the continuation stages still to come, and the
+        # iteration at which each stage started
+        self.penalties = []
+        self.stage_starts = [0]
+        # Tolerance of the final stage while the others run looser
+        self.final_ftol_rel = None
+
     def __str__(self):
         """Create a string representation of the solver."""
         return self.__class__.__name__
@@ -102,6 +118,82 @@ class TopOptSolver:
     def maxeval(self, ftol_rel):
         self.opt.set_maxeval(ftol_rel)
 
+    @property
+    def robust(self) -> bool:
+        """:obj:`bool`: Is the robust formulation used?"""
+        return self.thresholds is not None
+
+    @property
+    def stage_iterations(self) -> list:
+        """:obj:`list`: The number of iterations of each continuation stage."""
+        ends = self.stage_starts[1:] + [self.iteration]
+        return [end - start for start, end in zip(self.stage_starts, ends)]
+
+    @property
+    def filtered(self) -> numpy.ndarray:
+        """:obj:`numpy.ndarray`: The filtered variables before projection."""
+        return self.xTilde if self.robust else self.xPhys
+
+    def set_robust(self, beta: float = 8.0, eta: float = 0.5,
+                   delta: float = 0.15) -> None:
+        r"""
+        Optimize the worst of the eroded, intermediate and dilated designs.
+
+        The filtered variables are projected with thresholds
+        :math:`\eta + \delta`, :math:`\eta` and :math:`\eta - \delta`,
+        modelling a manufacturing process that erodes or dilates the
+        intermediate design, which becomes the physical design. The objective
+        is the largest of the three, and the volume is the one of the
+        intermediate design. The three designs are analysed together by
+        :meth:`topopt.problems.Problem.compute_objectives`.
+
+        Parameters
+        ----------
+        beta:
+            The sharpness of the projections.
+        eta:
+            The threshold of the intermediate design.
+        delta:
+            The shift of the eroded and dilated thresholds.
+
+        """
+        self.beta = beta
+        # The intermediate design is analysed last, so its displacements are
+        # the ones kept by the problem
+        self.thresholds = (eta + delta, eta - delta, eta)
+        self.xTilde = self.xPhys.copy()
+
+    def set_penalty_continuation(self, penalty: float, start: float = 1.0,
+                                 step: float = 0.5, ftol_rel: float = None) -> None:
+        """
+        Raise the SIMP penalty gradually instead of starting at its final value.
+
+        The optimization starts with the convex problem of penalty
+        ``start`` and raises the penalty by ``step`` each time a stage
+        converges, until it reaches ``penalty``. Each raise restarts the
+        optimizer, see :meth:`next_stage`.
+
+        Parameters
+        ----------
+        penalty:
+            The final penalty.
+        start:
+            The penalty of the first stage.
+        step:
+            The increase of the penalty between stages.
+        ftol_rel:
+            The relative tolerance for convergence of the stages before the
+            final one, which converges to the solver's own tolerance.
+
+        """
+        penalties = numpy.arange(start, penalty, step).tolist() + [penalty]
+        self.problem.penalty = penalties[0]
+        self.penalties = penalties[1:]
+
+        if ftol_rel is not None and self.penalties:
+            self.final_ftol_rel = self.ftol_rel
+            self.ftol_rel = ftol_rel
+
     def optimize(self, x: numpy.ndarray) -> numpy.ndarray:
         """
         Optimize the problem.
@@ -118,9 +210,42 @@ class TopOptSolver:
 
         """
         self.xPhys = x.copy()
-        x = self.opt.optimize(x)
+        # NLopt restarts for each stage of a continuation, all stages share
+        # the evaluation budget
+        maxeval, start = self.maxeval, self.iteration
+        try:
+            x = self.opt.optimize(x)
+            while self.iteration - start < maxeval and self.next_stage():
+                self.maxeval = maxeval - (self.iteration - start)
+                x = self.opt.optimize(x)
+        finally:
+            self.maxeval = maxeval
         return x
 
+    def next_stage(self) -> bool:
+        """
+        Start the next stage of a continuation after the current converged.
+
+        The penalty is raised first, see :meth:`set_penalty_continuation`,
+        and the filter sharpens the design at the final penalty.
+
+        Returns
+        -------
+        bool
+            Whether a new stage started, the optimization is over otherwise.
+
+        """
+        if self.penalties:
+            self.problem.penalty = self.penalties.pop(0)
+
+            if not self.penalties and self.final_ftol_rel is not None:
+                self.ftol_rel, self.final_ftol_rel = self.final_ftol_rel, None
+        elif not self.filter.sharpen(self.xPhys):
+            return False
+
+        self.stage_starts.append(self.iteration)
+        return True
+
     def filter_variables(self, x: numpy.ndarray) -> numpy.ndarray:
         """
         Filter the variables and impose values on passive/active variables.
@@ -136,11 +261,15 @@ class TopOptSolver:
             The filtered "physical" variables.
 
         """
-        self.filter.filter_variables(x, self.xPhys)
+        filtered = self.filtered
+        self.filter.filter_variables(x, filtered)
         if self.passive.size > 0:
-            self.xPhys[self.passive] = 0
+            filtered[self.passive] = 0
         if self.active.size > 0:
-            self.xPhys[self.active] = 1
+            filtered[self.active] = 1
+        if self.robust:
+            self.xPhys[:] = heaviside_projection(
+                self.xTilde, self.beta, self.thresholds[-1])
         return self.xPhys
 
     def objective_function(
@@ -165,16 +294,55 @@ class TopOptSolver:
         self.filter_variables(x)
 
         # Objective and sensitivity
-        obj = self.problem.compute_objective(self.xPhys, dobj)
+        if self.robust:
+            obj = self.robust_objective(dobj)
+        else:
+            obj = self.problem.compute_objective(self.xPhys, dobj)
+        self.iteration += 1
+
+        # Inexact analyses tighten as the objective settles
+        if self.last_obj is not None:
+            self.problem.adapt_solve_tolerance(
+                abs(obj - self.last_obj) / max(abs(obj), 1e-12))
+        self.last_obj = obj
 
         # Sensitivity filtering
-        self.filter.filter_objective_sensitivities(self.xPhys, dobj)
+        self.filter.filter_objective_sensitivities(self.filtered, dobj)
 
         # Display physical variables
         self.gui.update(self.xPhys)
 
         return obj
 
+    def robust_objective(self, dobj: numpy.ndarray) -> float:
+        """
+        Compute the worst objective of the projected designs.
+
+        Parameters
+        ----------
+        dobj:
+            The gradient of the objective with respect to the filtered
+            variables to compute.
+
+        Returns
+        -------
+        float
+            The largest objective value of the projected designs.
+
+        """
+        designs, derivatives = [], []
+        for eta in self.thresholds:
+            dx = numpy.empty(self.xTilde.shape)
+            designs.append(heaviside_projection(self.xTilde, self.beta, eta, dx))
+            derivatives.append(dx)
+
+        dobjs = [numpy.empty(dobj.shape) for _ in designs]
+        objs = self.problem.compute_objectives(designs, dobjs)
+
+        worst = int(numpy.argmax(objs))
+        numpy.multiply(dobjs[worst], derivatives[worst], out=dobj)
+        return objs[worst]
+
     def objective_function_fdiff(self, x: numpy.ndarray, dobj: numpy.ndarray,
                                  epsilon=1e-6) -> float:
         """
@@ -235,34 +403,586 @@ class TopOptSolver:
 
         # Volume sensitivities
         dv[:] = 1.0
+        if self.robust:
+            heaviside_projection(
+                self.xTilde, self.beta, self.thresholds[-1], dv)
 
         # Sensitivity filtering
-        self.filter.filter_volume_sensitivities(self.xPhys, dv)
+        self.filter.filter_volume_sensitivities(self.filtered, dv)
+
+        return self.xPhys.sum() - self.volfrac * x.size
+
+
+class OCSolver(TopOptSolver):
+    """
+    Solver for topology optimization problems using optimality criteria.
+
+    Unlike the NLopt based solver, the complete optimizer state is the current
+    design, the last objective value and the iteration count, so the
+    optimization can be advanced one iteration at a time with :meth:`step`.
+
+    Attributes
+    ----------
+    damping: float
+        The exponent of the optimality criteria update, smaller values take
+        more cautious steps.
+    min_density: float
+        The lower bound of the design variables, positive values keep
+        elements from being removed for good by the multiplicative update.
+    min_sensitivity: float
+        The smallest objective decrease an element is credited with, positive
+        values let the volume constraint be met when no element decreases the
+        objective.
+    """
+
+    damping = 0.5
+    min_density = 0.0
+    min_sensitivity = 0.0
+
+    def __init__(self, problem: Problem, volfrac: float, filter: Filter,
+                 gui: GUI, maxeval=2000, ftol_rel=1e-3, move=0.2):
+        """
+        Create a solver to solve the problem.
+
+        Parameters
+        ----------
+        problem: :obj:`topopt.problems.Problem`
+            The topology optimization problem to solve.
+        volfrac: float
+            The maximum fraction of the volume to use.
+        filter: :obj:`topopt.filters.Filter`
+            A filter for the solutions to reduce artefacts.
+        gui: :obj:`topopt.guis.GUI`
+            The graphical user interface to visualize intermediate results.
+        maxeval: int
+            The maximum number of evaluations to perform.
+        ftol: float
+            A floating point tolerance for relative change.
+        move: float
+            The maximum change of a design variable in one iteration.
+
+        """
+        super().__init__(problem, volfrac, filter, gui, maxeval, ftol_rel)
+        self.move = move
+        n = problem.nelx * problem.nely
+        self.x = numpy.ones(n)
+        self.obj = None
+        self.converged = False
+        self.dobj = numpy.empty(n)
+        self.dv = numpy.empty(n)
+
+    def start(self, x: numpy.ndarray) -> None:
+        """
+        Set the initial design of a steppable optimization.
+
+        Parameters
+        ----------
+        x:
+            The initial value for the design variables.
+
+        """
+        self.x = x.copy()
+        self.xPhys = x.copy()
+        self.converged = False
+
+    def step(self) -> bool:
+        """
+        Perform a single optimality criteria iteration.
+
+        Evaluates the objective at the current design and, unless the
+        optimization has converged, replaces it with the updated design.
+
+        Returns
+        -------
+        bool
+            Whether the optimization has converged.
+
+        """
+        obj = self.objective_function(self.x, self.dobj)
+        self.volume_function(self.x, self.dv)
+
+        if self.obj is not None:
+            change = abs(obj - self.obj) / max(abs(obj), 1e-12)
+            self.converged = change <= self.ftol_rel
+        self.obj = obj
+
+        if self.converged and self.iteration < self.maxeval and \
+                self.next_stage():
+            # The objective changes with the stage, so the next one starts
+            # by evaluating the current design again
+            self.obj = None
+            self.converged = False
+            return False
+
+        self.converged = self.converged or self.iteration >= self.maxeval
+
+        if not self.converged:
+            self.x = self.update(self.x, self.dobj, self.dv)
+        return self.converged
+
+    def update(self, x: numpy.ndarray, dobj: numpy.ndarray,
+               dv: numpy.ndarray) -> numpy.ndarray:
+        """
+        Compute the optimality criteria update of the design variables.
+
+        The Lagrange multiplier of the volume constraint is found by bisection
+        on the filtered densities.
+
+        Parameters
+        ----------
+        x:
+            The current design variables.
+        dobj:
+            The filtered gradient of the objective.
+        dv:
+            The filtered gradient of the volume constraint.
+
+        Returns
+        -------
+        numpy.ndarray
+            The updated design variables.
+
+        """
+        l1, l2 = 0.0, 1e9
+        lower = numpy.maximum(self.min_density, x - self.move)
+        upper = numpy.minimum(1.0, x + self.move)
+        ratio = numpy.maximum(self.min_sensitivity, -dobj) / numpy.maximum(1e-12, dv)
+        # Compared without dividing, the multiplier goes to zero when even the
+        # largest steps stay below the volume fraction
+        while l2 - l1 > 1e-3 * (l1 + l2):
+            lmid = 0.5 * (l2 + l1)
+            xnew = numpy.clip(x * (ratio / lmid)**self.damping, lower, upper)
+            if self.filter_variables(xnew).sum() > self.volfrac * x.size:
+                l1 = lmid
+            else:
+                l2 = lmid
+        return xnew
+
+    def optimize(self, x: numpy.ndarray) -> numpy.ndarray:
+        """
+        Optimize the problem.
+
+        Parameters
+        ----------
+        x:
+            The initial value for the design variables.
+
+        Returns
+        -------
+        numpy.ndarray
+            The optimal value of x found.
+
+        """
+        self.start(x)
+        while not self.step():
+            pass
+        return self.x
+
+
+class TrustRegionSolver(TopOptSolver):
+    r"""
+    Solver for compliance problems using a trust region Newton method.
+
+    Each iteration minimizes the quadratic model of the objective within a
+    trust region by truncated conjugate gradients (Steihaug), with exact
+    Hessian-vector products, see
+    :meth:`topopt.problems.ComplianceProblem.hessian_product`. Each product
+    solves one more system with the factor of the last analysis, so a
+    Newton step costs a single factorization. The variables at a bound the
+    gradient pushes against are held there, and the others move in the null
+    space of the volume constraint. The step is projected back onto the
+    bounds and the volume constraint with a backtracking search, then the
+    variables it clipped are held too and the model is minimized further
+    over the others. The step is accepted when the objective decreases by a
+    fair share of what the model predicted.
+
+    The design stays feasible, the initial design is projected onto the
+    volume constraint first. The filter has to be linear, like
+    :class:`topopt.filters.DensityBasedFilter`. As with the optimality
+    criteria, the whole optimizer state is explicit and the optimization
+    can be advanced one evaluation at a time with :meth:`step`.
+
+    Attributes
+    ----------
+    radius: float
+        The trust region radius.
+    hessian_products: int
+        The number of Hessian-vector products computed.
+    max_cg_iterations: int
+        The most conjugate gradient iterations of one pass.
+    max_passes: int
+        The most passes of one step, each holds the variables the last one
+        clipped at a bound.
+    max_halvings: int
+        The most step lengths the projected search of a pass tries.
+    cg_tolerance: float
+        The relative residual the conjugate gradients stop at.
+    """
+
+    max_cg_iterations = 10
+    max_passes = 3
+    max_halvings = 3
+    cg_tolerance = 0.1
+    initial_radius = 0.1
+    # Ratios of actual to predicted decrease that accept a step and that
+    # grow the trust region
+    accept_ratio = 0.1
+    expand_ratio = 0.75
+
+    def __init__(self, problem: Problem, volfrac: float, filter: Filter,
+                 gui: GUI, maxeval=2000, ftol_rel=1e-3):
+        """
+        Create a solver to solve the problem.
+
+        Parameters
+        ----------
+        problem: :obj:`topopt.problems.ComplianceProblem`
+            The topology optimization problem to solve.
+        volfrac: float
+            The maximum fraction of the volume to use.
+        filter: :obj:`topopt.filters.Filter`
+            A linear filter for the solutions to reduce artefacts.
+        gui: :obj:`topopt.guis.GUI`
+            The graphical user interface to visualize intermediate results.
+        maxeval: int
+            The maximum number of evaluations to perform.
+        ftol: float
+            A floating point tolerance for relative change.
+
+        """
+        super().__init__(problem, volfrac, filter, gui, maxeval, ftol_rel)
+        n = problem.nelx * problem.nely
+        self.x = numpy.ones(n)
+        self.trial = None
+        self.obj = None
+        self.predicted = None
+        self.boundary_step = False
+        self.converged = False
+        self.radius = self.initial_radius * numpy.sqrt(n)
+        self.hessian_products = 0
+        self.dobj = numpy.empty(n)
+        self.dv = numpy.empty(n)
+
+    def start(self, x: numpy.ndarray) -> None:
+        """
+        Set the initial design of a steppable optimization.
+
+        Parameters
+        ----------
+        x:
+            The initial value for the design variables.
+
+        """
+        self.volume_function(x, self.dv)
+        self.x = self.project(x, self.dv)
+        self.trial = self.x.copy()
+        self.xPhys = self.filter_variables(self.x).copy()
+        self.obj = None
+        self.predicted = None
+        self.converged = False
+
+    def step(self) -> bool:
+        """
+        Evaluate the pending design and compute the next one.
+
+        Returns
+        -------
+        bool
+            Whether the optimization has converged.
+
+        """
+        x = self.x
+        dobj = numpy.empty(x.shape)
+        obj = self.objective_function(self.trial, dobj)
+
+        # Designs analysed without a prediction, the first one, the one of a
+        # new stage and the accepted one again after a rejection, are taken
+        if self.predicted is None:
+            accepted, change = True, None
+        else:
+            ratio = (self.obj - obj) / self.predicted
+            accepted = ratio >= self.accept_ratio
+            change = abs(obj - self.obj) / max(abs(obj), 1e-12)
+
+            if ratio < 0.25:
+                self.radius *= 0.25
+            elif ratio > self.expand_ratio and self.boundary_step:
+                self.radius *= 2
+        self.predicted = None
+
+        if not accepted:
+            # The last factor is the one of the rejected design, so the
+            # accepted one is analysed again before the next step
+            self.x = x
+            self.trial = x
+            self.converged = self.iteration >= self.maxeval
+            return self.converged
+
+        self.x, self.obj = self.trial, obj
+        self.dobj[:] = dobj
+        self.volume_function(self.x, self.dv)
+        self.converged = change is not None and change <= self.ftol_rel
+
+        if self.converged and self.iteration < self.maxeval and \
+                self.next_stage():
+            # The objective changes with the stage, so the next one starts
+            # by evaluating the current design again
+            self.converged = False
+            return False
+
+        self.converged = self.converged or self.iteration >= self.maxeval
+
+        if not self.converged:
+            self.trial = self.update(self.x, self.dobj, self.dv)
+            self.converged = self.trial is None
+            if self.converged:
+                self.trial = self.x
+        return self.converged
+
+    def volume_function(self, x: numpy.ndarray, dv: numpy.ndarray) -> float:
+        """
+        Compute the volume constraint value and gradient.
+
+        Parameters
+        ----------
+        x:
+            The design variables for which to compute the volume constraint.
+        dv:
+            The gradient of the volume constraint to compute.
+
+        Returns
+        -------
+        float
+            The volume constraint value.
+
+        """
+        self.filter_variables(x)
+
+        # The steps keep the volume to first order, so the imposed densities
+        # of passive and active elements do not count
+        dv[:] = 1.0
+        if self.passive.size > 0:
+            dv[self.passive] = 0
+        if self.active.size > 0:
+            dv[self.active] = 0
+        self.filter.filter_volume_sensitivities(self.filtered, dv)
 
         return self.xPhys.sum() - self.volfrac * x.size
 
+    def hessian_product(self, v: numpy.ndarray) -> numpy.ndarray:
+        """
+        Multiply the Hessian of the objective in the design variables by v.
+
+        Parameters
+        ----------
+        v:
+            The direction to multiply by.
+
+        Returns
+        -------
+        numpy.ndarray
+            The product of the Hessian with v.
+
+        """
+        self.hessian_products += 1
+        dx = numpy.empty(v.shape)
+        self.filter.filter_variables(v, dx)
+        if self.passive.size > 0:
+            dx[self.passive] = 0
+        if self.active.size > 0:
+            dx[self.active] = 0
+        product = self.problem.hessian_product(self.xPhys, dx)
+        if self.passive.size > 0:
+            product[self.passive] = 0
+        if self.active.size > 0:
+            product[self.active] = 0
+        self.filter.filter_objective_sensitivities(self.xPhys, product)
+        return product
+
+    def update(self, x: numpy.ndarray, dobj: numpy.ndarray,
+               dv: numpy.ndarray) -> numpy.ndarray:
+        """
+        Compute the trust region step from the analysed design x.
+
+        Parameters
+        ----------
+        x:
+            The design variables of the last analysis.
+        dobj:
+            The gradient of the objective.
+        dv:
+            The gradient of the volume constraint.
+
+        Returns
+        -------
+        numpy.ndarray
+            The design variables to evaluate next, None when no step
+            decreases the model.
+
+        """
+        # Hold the variables at a bound the gradient of the Lagrangian
+        # pushes against, with the multiplier that fits the free ones best
+        free = (x > 0) & (x < 1)
+        for _ in range(2):
+            multiplier = -(dv[free] @ dobj[free]) / max(dv[free] @ dv[free], 1e-300)
+            gradient = dobj + multiplier * dv
+            free = ((x > 0) | (gradient < 0)) & ((x < 1) | (gradient > 0))
+
+        # The trust region shrinks until some step decreases the model
+        radius = self.radius
+        initial_free = free
+        while radius >= 1e-8 * numpy.sqrt(x.size):
+            # Each pass holds the variables the last one clipped at a bound
+            # and minimizes the model further over the others
+            free = initial_free
+            trial, s, Bs, self.predicted = None, numpy.zeros(x.shape), numpy.zeros(x.shape), 0.0
+            for _ in range(self.max_passes):
+                gradient = dobj + Bs
+                d = self.steihaug(gradient, self.null_space(free, dv), radius, s)
+                self.boundary_step = numpy.linalg.norm(d) > 0.9 * radius
+                # Projected search along the pass, clipping at the bounds can
+                # undo the decrease of the model so shorter steps are tried
+                # until it decreases by a fair share of the first order one
+                for t in 0.5**numpy.arange(self.max_halvings):
+                    candidate = self.project(x + s + t * (d - s), dv)
+                    step = candidate - x
+                    Bstep = self.hessian_product(step)
+                    predicted = -(dobj @ step + 0.5 * step @ Bstep)
+                    if predicted - self.predicted >= -0.01 * gradient @ (step - s) > 0:
+                        break
+                else:
+                    break
+                trial, s, Bs, self.predicted = candidate, step, Bstep, predicted
+                free = free & (trial > 0) & (trial < 1)
+            if trial is not None:
+                self.radius = radius
+                return trial
+            radius *= 0.25
+        return None
+
+    @staticmethod
+    def null_space(free: numpy.ndarray, dv: numpy.ndarray):
+        """
+        Build the projection onto the steps that keep the volume.
+
+        Parameters
+        ----------
+        free:
+            Whether each design variable may change.
+        dv:
+            The gradient of the volume constraint.
+
+        Returns
+        -------
+        callable
+            Projects a vector onto the free variables and the null space of
+            the volume constraint.
+
+        """
+        a = numpy.where(free, dv, 0)
+        aa = max(a @ a, 1e-300)
+
+        def project(v):
+            v = numpy.where(free, v, 0)
+            return v - a * (a @ v) / aa
+        return project
+
+    def steihaug(self, gradient: numpy.ndarray, null_space, radius: float,
+                 start: numpy.ndarray) -> numpy.ndarray:
+        """
+        Minimize the quadratic model within the trust region.
+
+        Parameters
+        ----------
+        gradient:
+            The gradient of the model at the start step.
+        null_space:
+            Projects a vector onto the directions the step may take.
+        radius:
+            The radius of the trust region.
+        start:
+            The step to improve.
+
+        Returns
+        -------
+        numpy.ndarray
+            The step.
+
+        """
+        d = start.copy()
+        r = -null_space(gradient)
+        p = r.copy()
+        rr = r @ r
+        tolerance = self.cg_tolerance**2 * rr
+        for _ in range(self.max_cg_iterations):
+            if rr <= tolerance or rr == 0:
+                break
+            Bp = self.hessian_product(p)
+            curvature = p @ Bp
+            alpha = rr / curvature if curvature > 0 else 0.0
+            if curvature <= 0 or numpy.linalg.norm(d + alpha * p) >= radius:
+                # Follow p to the boundary of the trust region
+                dp, pp = d @ p, p @ p
+                tau = (-dp + numpy.sqrt(dp**2 + pp * (radius**2 - d @ d))) / pp
+                return d + tau * p
+            d += alpha * p
+            r -= alpha * null_space(Bp)
+            rr, rr_old = r @ r, rr
+            p = r + (rr / rr_old) * p
+        return d
+
+    def project(self, x: numpy.ndarray, dv: numpy.ndarray) -> numpy.ndarray:
+        """
+        Project design variables onto the bounds and the volume constraint.
+
+        Parameters
+        ----------
+        x:
+            The design variables to project.
+        dv:
+            The gradient of the volume constraint.
+
+        Returns
+        -------
+        numpy.ndarray
+            The closest design variables using the allowed volume.
+
+        """
+        # The filter is linear, so the volume is the one of the active
+        # elements plus dv @ x and the bisection does not filter
+        target = self.volfrac * x.size - self.active.size
+        shift = 1.0 / max(dv.min(), 1e-3)
+        l1, l2 = -shift, shift
+        while l2 - l1 > 1e-12 * shift:
+            lmid = 0.5 * (l1 + l2)
+            xnew = numpy.clip(x - lmid * dv, 0.0, 1.0)
+            if dv @ xnew > target:
+                l1 = lmid
+            else:
+                l2 = lmid
+        return xnew
+
+    def optimize(self, x: numpy.ndarray) -> numpy.ndarray:
+        """
+        Optimize the problem.
+
+        Parameters
+        ----------
+        x:
+            The initial value for the design variables.
+
+        Returns
+        -------
+        numpy.ndarray
+            The optimal value of x found.
+
+        """
+        self.start(x)
+        while not self.step():
+            pass
+        return self.x
+
 
 # TODO: Seperate optimizer from TopOptSolver
 # class MMASolver(TopOptSolver):
 #     pass
-#
-#
-# TODO: Port over OC to TopOptSolver
-# class OCSolver(TopOptSolver):
-#     def oc(self, x, volfrac, dc, dv, g):
-#         """ Optimality criterion """
-#         l1 = 0
-#         l2 = 1e9
-#         move = 0.2
-#         # reshape to perform vector operations
-#         xnew = np.zeros(nelx * nely)
-#         while (l2 - l1) / (l1 + l2) > 1e-3:
-#             lmid = 0.5 * (l2 + l1)
-#             xnew[:] =  np.maximum(0.0, np.maximum(x - move, np.minimum(1.0,
-#                 np.minimum(x + move, x * np.sqrt(-dc / dv / lmid)))))
-#             gt = g + np.sum((dv * (xnew - x)))
-#             if gt > 0:
-#                 l1 = lmid
-#             else:
-#                 l2 = lmid
-#         return (xnew, gt)
@@ -34,16 +34,11 @@ class VonMisesStressCalculator:
 
     def build_indices(self):
         nelx, nely = self.problem.nelx, self.problem.nely
-        edofMat = numpy.zeros((8, nelx * nely), dtype=int)
-        for elx in range(nelx):
-            for ely in range(nely):
-                el = ely + elx * nely  # Element index
-                n1 = (nely + 1) * elx + ely  # Left nodes
-                n2 = (nely + 1) * (elx + 1) + ely  # Right nodes
-                edofMat[:, el] = numpy.array([
-                    2 * n1 + 2, 2 * n1 + 3, 2 * n2 + 2, 2 * n2 + 3, 2 * n2,
-                    2 * n2 + 1, 2 * n1, 2 * n1 + 1])
-        return edofMat
+        elx, ely = numpy.divmod(numpy.arange(nelx * nely), nely)
+        n1 = (nely + 1) * elx + ely  # Left nodes
+        n2 = n1 + nely + 1  # Right nodes
+        return numpy.array([2 * n1 + 2, 2 * n1 + 3, 2 * n2 + 2, 2 * n2 + 3,
+                            2 * n2, 2 * n2 + 1, 2 * n1, 2 * n1 + 1])
 
     def penalized_densities(self, x):
         """ Compute the penalized densties. """
@@ -57,16 +52,60 @@ class VonMisesStressCalculator:
             self.problem.Emin, self.problem.Emax, self.problem.penalty)
         return (Emax - Emin) * penalty * x**(penalty - 1)
 
-    def calculate_principle_stresses(self, x, side=1):
+    def element_stresses(self, x, u, side=1):
         """
-        Calculate the principle stresses in the x, y, and shear directions.
+        Calculate the stresses in the x, y, and shear directions of every
+        element and load case from the displacements u, shaped
+        (3, nelements, nloads).
         """
-        u = self.problem.compute_displacements(x)
-        rho = self.penalized_densities(x)
         EB = self.E(self.problem.nu).dot(self.B(side))
-        stress = sum([EB.dot(u[:, i][self.edofMat])
-                      for i in range(u.shape[1])])
-        stress *= rho / float(u.shape[1])
+        stress = numpy.tensordot(EB, u[self.edofMat], axes=1)
+        stress *= self.penalized_densities(x)[:, numpy.newaxis]
+        return stress
+
+    @staticmethod
+    def von_mises(s11, s22, s12):
+        """ Compute the Von Mises stress from the stress components. """
+        return numpy.sqrt(s11**2 - s11 * s22 + s22**2 + 3 * s12**2)
+
+    @staticmethod
+    def principal_stresses(s11, s22, s12):
+        """
+        Compute the largest and smallest principal stresses from the stress
+        components.
+        """
+        center = 0.5 * (s11 + s22)
+        radius = numpy.sqrt((0.5 * (s11 - s22))**2 + s12**2)
+        return center + radius, center - radius
+
+    def stress_field(self, x, u, side=1):
+        """
+        Calculate the Von Mises stress and the principal stresses of every
+        element from already solved displacements u, without another solve.
+        With several load cases each element reports the load case with the
+        largest Von Mises stress, and without load cases every stress is
+        zero. Returns an array shaped (3, nelements) with the Von Mises,
+        largest and smallest principal stresses.
+        """
+        if u.shape[1] == 0:
+            return numpy.zeros((3, self.edofMat.shape[1]))
+
+        s11, s22, s12 = self.element_stresses(x, u, side)
+        vm_stress = self.von_mises(s11, s22, s12)
+        case = numpy.argmax(vm_stress, axis=1)[:, numpy.newaxis]
+        s11, s22, s12 = (numpy.take_along_axis(s, case, 1)[:, 0]
+                         for s in (s11, s22, s12))
+        s1, s2 = self.principal_stresses(s11, s22, s12)
+        return numpy.array([self.von_mises(s11, s22, s12), s1, s2])
+
+    def calculate_principle_stresses(self, x, side=1, u=None):
+        """
+        Calculate the principle stresses in the x, y, and shear directions.
+        The displacements are computed unless they are given in u.
+        """
+        if u is None:
+            u = self.problem.compute_displacements(x)
+        stress = self.element_stresses(x, u, side).mean(axis=2)
         return numpy.hsplit(stress.T, 3)
 
     def calculate_stress(self, x, side=1):
@@ -74,7 +113,7 @@ class VonMisesStressCalculator:
         Calculate the Von Mises stress given the densities x.
         """
         s11, s22, s12 = self.calculate_principle_stresses(x, side)
-        vm_stress = numpy.sqrt(s11**2 - s11 * s22 + s22**2 + 3 * s12**2)
+        vm_stress = self.von_mises(s11, s22, s12)
         return vm_stress.squeeze()
 
     def calculate_diff_stress(self, x, side=1, p=2):